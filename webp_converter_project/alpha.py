@@ -0,0 +1,120 @@
+"""Alpha-channel clean-up: drop alpha nobody uses, blank RGB nobody sees.
+
+Renderers often write RGBA frames that are opaque everywhere, or leave
+arbitrary colour (noise, unpremultiplied leftovers) under pixels whose alpha
+is 0. Invisible colour still has to be compressed, and it changes from frame
+to frame, so libwebp's animation encoder sees changes where nothing visible
+moved and encodes larger sub-frames. clean_frame() hands opaque frames on as
+RGB and sets every alpha=0 pixel to (0, 0, 0, 0), using one vectorized pass
+over the frame's pixels.
+
+In-process encoders clean each frame on the decode threads right after it
+is read, so it costs no extra decode. img2webp reads its frames from disk,
+so for it scan_alpha() checks the sequence first and cleaned copies are only
+written when some transparent pixel actually has colour.
+
+Cleaning changes pixels that cannot be seen, which only matters when the
+RGB under transparent areas is itself wanted (e.g. for unpremultiplied
+compositing); ConversionEngine(exact=True) keeps it.
+"""
+import os
+import importlib.util
+
+from prefetch import FramePrefetcher, load_frame
+from resize import scale_frames_multi
+from scheduler import read_png_header
+
+NUMPY_AVAILABLE = (importlib.util.find_spec("numpy") is not None
+                   and importlib.util.find_spec("PIL") is not None)
+
+# Alpha in the top byte of a little-endian RGBA pixel read as uint32
+OPAQUE = 0xFF000000
+HIDDEN_MAX = 0x00FFFFFF
+
+
+def may_have_alpha(path):
+    """True unless the PNG header rules out transparency."""
+    try:
+        color_type = read_png_header(path)[3]
+    except (OSError, ValueError):
+        return True
+    # Grey and RGB can still carry a tRNS chunk, palettes usually do
+    return color_type in (3, 4, 6)
+
+
+def _pixels(im):
+    import numpy as np
+    return np.asarray(im).view("<u4")[..., 0]
+
+
+def _has_hidden_colour(px):
+    # 1..HIDDEN_MAX is alpha 0 with some colour; subtracting 1 wraps 0
+    # (transparent black) round to the top, so one comparison finds them
+    return bool(((px - 1) < HIDDEN_MAX).any())
+
+
+def clean_frame(im):
+    """An opaque RGBA frame as RGB; otherwise the frame with its alpha=0
+    pixels blanked. Other modes are returned unchanged."""
+    if im.mode != "RGBA":
+        return im
+    px = _pixels(im)
+    if px.min() >= OPAQUE:
+        return im.convert("RGB")
+    if not _has_hidden_colour(px):
+        return im
+    from PIL import Image
+    px = px.copy()
+    px[px <= HIDDEN_MAX] = 0
+    return Image.frombuffer("RGBA", im.size, px, "raw", "RGBA", 0, 1)
+
+
+def frame_loader(load=None):
+    """Wrap a frame loader (default prefetch.load_frame) to clean frames."""
+    load = load or load_frame
+    return lambda path: clean_frame(load(path))
+
+
+class AlphaReport:
+    """How many of a sequence's frames are opaque (RGBA with alpha 255
+    everywhere) and how many have colour under transparent pixels."""
+    def __init__(self, frames, opaque, hidden_colour):
+        self.frames = frames
+        self.opaque = opaque
+        self.hidden_colour = hidden_colour
+
+    def to_dict(self):
+        return {"frames": self.frames, "opaque": self.opaque, "hidden_colour": self.hidden_colour}
+
+
+def _frame_stats(path):
+    # Runs on the decode threads: (opaque, hidden colour)
+    if not may_have_alpha(path):
+        return False, False
+    im = load_frame(path)
+    if im.mode != "RGBA":
+        return False, False
+    px = _pixels(im)
+    if px.min() >= OPAQUE:
+        return True, False
+    return False, _has_hidden_colour(px)
+
+
+def scan_alpha(folder_path, png_files, workers=None, lookahead=None, should_stop=None):
+    """Return an AlphaReport for the sequence. Frames whose PNG header rules
+    out alpha are not decoded."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Alpha clean-up needs numpy and Pillow (pip install numpy pillow)")
+    opaque = hidden = 0
+    paths = [os.path.join(folder_path, f) for f in png_files]
+    for is_opaque, has_hidden in FramePrefetcher(paths, load=_frame_stats, workers=workers,
+                                                 lookahead=lookahead, should_stop=should_stop):
+        opaque += is_opaque
+        hidden += has_hidden
+    return AlphaReport(len(paths), opaque, hidden)
+
+
+def write_frames(folder_path, png_files, out_dir, workers=None, should_stop=None):
+    """Write a cleaned copy of every frame into out_dir, for img2webp."""
+    scale_frames_multi([(None, out_dir)], folder_path, png_files, workers, should_stop,
+                       load=frame_loader())
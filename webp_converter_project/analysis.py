@@ -0,0 +1,113 @@
+"""Inter-frame change analysis used to pick keyframe and mixed-mode settings.
+
+Every pair of consecutive frames is compared with NumPy to get the fraction
+of pixels that changed and the bounding box of the change. From that the
+sequence gets keyframe bounds (-kmin/-kmax) and whether to let libwebp pick
+lossy or lossless per frame (-mixed):
+
+* mostly static sequences get a long keyframe interval, so small changes are
+  stored as small sub-frames instead of periodic full frames;
+* sequences where nearly every pixel changes every frame make every frame a
+  keyframe, which skips libwebp's keyframe-vs-sub-frame trial encodes;
+* lossy sequences with small change regions use mixed mode, since small flat
+  rectangles are often cheaper lossless.
+
+Cropping each frame to its changed rectangle is done by libwebp's animation
+encoder itself (both img2webp and Pillow use it), so only the settings
+above need to be passed on.
+"""
+import os
+
+from archive import open_frame
+from prefetch import FramePrefetcher
+
+try:
+    import numpy as np
+    from PIL import Image
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Change area (as a fraction of the canvas) below which a sequence is "static"
+STATIC_AREA = 0.1
+# ... and above which every frame is effectively a new picture
+BUSY_AREA = 0.9
+# Longest keyframe interval used for static sequences
+MAX_KEYFRAME_INTERVAL = 150
+# Largest mean change area at which lossy sequences use -mixed
+MIXED_AREA = 0.25
+
+
+def load_array(path):
+    with open_frame(path) as f, Image.open(f) as im:
+        return np.asarray(im.convert("RGBA"))
+
+
+def frame_delta(prev, cur):
+    """Return (changed pixel fraction, bounding box) between two HxWx4
+    arrays. The box is (left, top, right, bottom) or None if identical."""
+    if prev.shape != cur.shape:
+        h, w = cur.shape[:2]
+        return 1.0, (0, 0, w, h)
+    changed = np.any(prev != cur, axis=2)
+    count = int(np.count_nonzero(changed))
+    if not count:
+        return 0.0, None
+    rows = np.flatnonzero(changed.any(axis=1))
+    cols = np.flatnonzero(changed.any(axis=0))
+    box = (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+    return count / changed.size, box
+
+
+class SequenceAnalysis:
+    """ratios[i] and boxes[i] describe the change from frame i to i+1."""
+    def __init__(self, width, height, ratios, boxes):
+        self.width = width
+        self.height = height
+        self.ratios = ratios
+        self.boxes = boxes
+
+    def box_areas(self):
+        canvas = float(self.width * self.height) or 1.0
+        return [0.0 if b is None else (b[2] - b[0]) * (b[3] - b[1]) / canvas for b in self.boxes]
+
+    @property
+    def mean_box_area(self):
+        areas = self.box_areas()
+        return sum(areas) / len(areas) if areas else 0.0
+
+    @property
+    def mean_ratio(self):
+        return sum(self.ratios) / len(self.ratios) if self.ratios else 0.0
+
+    def encoder_options(self, lossless):
+        """kmin/kmax/mixed for EncodeJob; None leaves libwebp's default."""
+        frames = len(self.ratios) + 1
+        area = self.mean_box_area
+        kmin = kmax = None
+        if frames > 1 and self.mean_ratio >= BUSY_AREA:
+            kmin, kmax = 0, 1
+        elif frames > 2 and area < STATIC_AREA:
+            kmax = min(frames, MAX_KEYFRAME_INTERVAL)
+            # libwebp needs kmin >= kmax / 2 + 1
+            kmin = kmax // 2 + 1
+        mixed = not lossless and area < MIXED_AREA
+        return {"kmin": kmin, "kmax": kmax, "mixed": mixed}
+
+
+def analyze_sequence(folder_path, png_files, workers=None, lookahead=None, should_stop=None):
+    """Decode the whole sequence once and measure every inter-frame change."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Frame analysis needs numpy and Pillow (pip install numpy pillow)")
+    paths = [os.path.join(folder_path, f) for f in png_files]
+    ratios, boxes = [], []
+    prev = None
+    for cur in FramePrefetcher(paths, load=load_array, workers=workers, lookahead=lookahead,
+                               should_stop=should_stop):
+        if prev is not None:
+            ratio, box = frame_delta(prev, cur)
+            ratios.append(ratio)
+            boxes.append(box)
+        prev = cur
+    height, width = prev.shape[:2] if prev is not None else (0, 0)
+    return SequenceAnalysis(width, height, ratios, boxes)
@@ -0,0 +1,331 @@
+"""Read PNG sequences straight out of ZIP and TAR archives.
+
+Renders are often delivered zipped. Instead of unpacking thousands of frames
+to disk first, an archive is accepted wherever a folder is: the archive
+itself, or a folder inside it, is addressed by joining the member path onto
+the archive's path (renders/shot010.zip/beauty/0001.png). open_frame(),
+listdir() and frame_signature() take such paths as well as ordinary ones,
+and everything that reads frames (prefetch.load_frame,
+scheduler.read_png_header, ...) goes through them.
+
+Archives are memory-mapped and indexed once: a ZIP's central directory or a
+TAR's headers are read from the map, then members are read from it in place.
+Stored members (the usual case, PNGs do not compress further) are plain
+slices of the map, so the decode threads read them in parallel without
+locking or copying; deflated ZIP members are inflated on the reading thread.
+Compressed TARs (.tar.gz, ...) have no random access and are not supported.
+
+img2webp can only read files, so engine.py copies the frames of archived
+sequences to a scratch folder for it (copy_frames); in-process encoders read
+them where they are.
+"""
+import io
+import os
+import mmap
+import shutil
+import struct
+import threading
+import functools
+import collections
+import concurrent.futures
+
+ARCHIVE_SUFFIXES = (".zip", ".tar")
+
+# Archives kept open (mapped and indexed) at a time
+MAX_OPEN_ARCHIVES = 32
+
+ZIP_LOCAL_HEADER = struct.Struct("<4s22xHH")
+
+
+def has_archive_suffix(name):
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_archive(path):
+    return has_archive_suffix(path) and os.path.isfile(path)
+
+
+def strip_archive_suffix(name):
+    """shot010.zip -> shot010, for naming outputs after archives."""
+    return os.path.splitext(name)[0] if has_archive_suffix(name) else name
+
+
+@functools.lru_cache(maxsize=1024)
+def _archive_prefixes(path):
+    """(archive, member) for every way of reading path as a member of a
+    file with an archive suffix, deepest archive first. Only the string is
+    looked at; the caller checks which archive actually exists."""
+    found = []
+    names = []
+    while True:
+        if has_archive_suffix(path):
+            found.append((path, "/".join(reversed(names))))
+        parent, name = os.path.split(path)
+        if not name or parent == path:
+            return tuple(found)
+        names.append(name)
+        path = parent
+
+
+def _split(path):
+    for archive, member in _archive_prefixes(path):
+        if os.path.isfile(archive):
+            return archive, member
+    return None
+
+
+def split_path(path):
+    """(archive file, member path with "/" separators) for a path at or
+    below an archive, or None for an ordinary path."""
+    lowered = path.lower()
+    if not any(suffix in lowered for suffix in ARCHIVE_SUFFIXES):
+        return None
+    return _split(os.path.normpath(os.path.abspath(path)))
+
+
+def in_archive(path):
+    return split_path(path) is not None
+
+
+class _MapFile(io.RawIOBase):
+    """Read-only, seekable file over a buffer: an archive's memory map or
+    one member's slice of it."""
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, b):
+        data = self._view[self._pos:self._pos + len(b)]
+        n = len(data)
+        memoryview(b).cast("B")[:n] = data
+        self._pos += n
+        return n
+
+    def readall(self):
+        data = bytes(self._view[self._pos:])
+        self._pos += len(data)
+        return data
+
+
+class _Archive:
+    """A memory-mapped archive: members maps member paths to whatever
+    open() needs, dirs maps folder paths ("" is the top) to their
+    (file names, subfolder names)."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise OSError(f"Not a ZIP or TAR archive: {path}")
+        self._view = memoryview(self._map)
+        self.members = {}
+        self.dirs = {"": ([], [])}
+        self._index()
+        for names in self.dirs.values():
+            names[0].sort()
+            names[1].sort()
+
+    def _add(self, name, entry):
+        name = name.replace("\\", "/").strip("/")
+        while name.startswith("./"):
+            name = name[2:]
+        if not name:
+            return
+        self.members[name] = entry
+        parent, _, leaf = name.rpartition("/")
+        folder, child = parent, None
+        while True:
+            # New folders are listed in their parent, which may be new too
+            known = folder in self.dirs
+            subdirs = self.dirs.setdefault(folder, ([], []))[1]
+            if child:
+                subdirs.append(child)
+            if known or not folder:
+                break
+            folder, _, child = folder.rpartition("/")
+        self.dirs[parent][0].append(leaf)
+
+    def _member(self, member):
+        try:
+            return self.members[member]
+        except KeyError:
+            raise FileNotFoundError(f"No such file in {self.path}: {member}")
+
+    def _slice(self, start, size):
+        if start + size > len(self._view):
+            raise OSError(f"Truncated archive: {self.path}")
+        return _MapFile(self._view[start:start + size])
+
+
+class ZipArchive(_Archive):
+    def _index(self):
+        import zipfile
+        try:
+            self._zip = zipfile.ZipFile(_MapFile(self._view))
+        except zipfile.BadZipFile as e:
+            raise OSError(f"Cannot read {self.path}: {e}")
+        for info in self._zip.infolist():
+            if not info.is_dir():
+                self._add(info.filename, info)
+
+    def open(self, member):
+        import zipfile
+        info = self._member(member)
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 1:
+            # Inflated on the calling thread; the map is only read under zipfile's lock
+            return self._zip.open(info)
+        start = info.header_offset
+        magic, name_len, extra_len = ZIP_LOCAL_HEADER.unpack_from(self._view, start)
+        if magic != b"PK\x03\x04":
+            raise OSError(f"Bad ZIP entry in {self.path}: {member}")
+        return self._slice(start + ZIP_LOCAL_HEADER.size + name_len + extra_len, info.file_size)
+
+    def signature(self, member):
+        info = self._member(member)
+        return f"{info.file_size}\0{info.CRC:08x}"
+
+    def size(self, member):
+        return self._member(member).file_size
+
+
+class TarArchive(_Archive):
+    def _index(self):
+        import tarfile
+        try:
+            with tarfile.open(fileobj=_MapFile(self._view), mode="r:") as tar:
+                for info in tar:
+                    if info.isreg() and not info.sparse:
+                        self._add(info.name, (info.offset_data, info.size, info.mtime))
+        except tarfile.ReadError as e:
+            raise OSError(f"Cannot read {self.path} (compressed TARs are not supported, "
+                          f"use .tar or .zip): {e}")
+
+    def open(self, member):
+        offset, size, _ = self._member(member)
+        return self._slice(offset, size)
+
+    def signature(self, member):
+        _, size, mtime = self._member(member)
+        return f"{size}\0{mtime}"
+
+    def size(self, member):
+        return self._member(member)[1]
+
+
+_lock = threading.Lock()
+_archives = collections.OrderedDict()
+
+
+def _archive(path):
+    """The opened archive at path, reopened if the file has changed."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _lock:
+        entry = _archives.get(path)
+        if entry and entry[0] == stamp:
+            _archives.move_to_end(path)
+            return entry[1]
+    archive = (ZipArchive if path.lower().endswith(".zip") else TarArchive)(path)
+    with _lock:
+        _archives[path] = (stamp, archive)
+        _archives.move_to_end(path)
+        # Readers still using an evicted archive keep its map alive
+        while len(_archives) > MAX_OPEN_ARCHIVES:
+            _archives.popitem(last=False)
+    return archive
+
+
+def open_frame(path):
+    """Open a frame for reading in binary mode, in or out of an archive."""
+    found = split_path(path)
+    if found is None:
+        return open(path, "rb")
+    archive, member = found
+    return _archive(archive).open(member)
+
+
+def frame_signature(path):
+    """A string that changes when the frame at path does (size and mtime
+    for files; size and CRC or mtime for archive members)."""
+    found = split_path(path)
+    if found is None:
+        st = os.stat(path)
+        return f"{st.st_size}\0{st.st_mtime_ns}"
+    archive, member = found
+    return _archive(archive).signature(member)
+
+
+def frame_size(path):
+    """os.path.getsize that also takes paths inside archives."""
+    found = split_path(path)
+    if found is None:
+        return os.path.getsize(path)
+    archive, member = found
+    return _archive(archive).size(member)
+
+
+def scan_dir(path):
+    """(file names, subfolder paths) of a folder in an archive (or of the
+    archive itself), like discover._scan."""
+    archive, member = split_path(path)
+    try:
+        files, subdirs = _archive(archive).dirs[member]
+    except KeyError:
+        raise FileNotFoundError(f"No such folder in {archive}: {member}")
+    return list(files), [os.path.join(path, name) for name in subdirs]
+
+
+def listdir(path):
+    """os.listdir that also lists archives and folders inside them."""
+    if split_path(path) is None:
+        return os.listdir(path)
+    files, subdirs = scan_dir(path)
+    return files + [os.path.basename(d) for d in subdirs]
+
+
+def _copy_frame(src, dst):
+    if split_path(src) is None:
+        # Keeps the mtime, so copies have the same resize-cache key
+        shutil.copy2(src, dst)
+        return
+    with open_frame(src) as f, open(dst, "wb") as out:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            out.write(chunk)
+
+
+def copy_frames(folder_path, png_files, out_dir, workers=None, should_stop=None):
+    """Copy png_files of a folder, in an archive or not, into out_dir as
+    they are (no decode), many at once."""
+    from prefetch import PrefetchCancelled
+    os.makedirs(out_dir, exist_ok=True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or 8) as executor:
+        futures = [executor.submit(_copy_frame, os.path.join(folder_path, name), os.path.join(out_dir, name))
+                   for name in png_files]
+        try:
+            for fut in futures:
+                if should_stop and should_stop():
+                    raise PrefetchCancelled()
+                fut.result()
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
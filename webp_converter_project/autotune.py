@@ -0,0 +1,196 @@
+"""Pick a quality setting that meets a target file size and/or SSIM.
+
+Rather than re-running whole encodes by hand, a few short runs of frames are
+sampled from the sequence and trial-encoded at several qualities in
+parallel. Trial sizes are extrapolated to the full frame count, a second
+round narrows in on the best bracket, and only then is the full sequence
+encoded once.
+"""
+import os
+import bisect
+import shutil
+import tempfile
+import logging
+import concurrent.futures
+
+from archive import open_frame
+from encoders import EncodeJob
+from scheduler import available_cpus
+
+try:
+    import numpy as np
+    from PIL import Image
+    SSIM_AVAILABLE = True
+except ImportError:
+    SSIM_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+# 100 is lossless in this app, the others are lossy -q values
+COARSE_QUALITIES = (100, 95, 85, 75, 60, 45, 30, 15)
+SAMPLE_FRAMES = 24
+SAMPLE_RUNS = 4
+
+
+def sample_frames(png_files, durations, max_frames=SAMPLE_FRAMES, runs=SAMPLE_RUNS):
+    """Pick `runs` evenly spaced runs of consecutive frames (consecutive, so
+    inter-frame compression is represented). Returns (files, durations)."""
+    if len(png_files) <= max_frames:
+        return list(png_files), list(durations)
+    run_len = max(1, max_frames // runs)
+    span = len(png_files) - run_len
+    files, durs = [], []
+    for r in range(runs):
+        start = span * r // max(1, runs - 1)
+        files += png_files[start:start + run_len]
+        durs += durations[start:start + run_len]
+    return files, durs
+
+
+def ssim(a, b):
+    """Mean SSIM of two same-sized greyscale arrays over 8x8 blocks."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    h, w = (a.shape[0] // 8) * 8, (a.shape[1] // 8) * 8
+    if not h or not w:
+        return 1.0 if np.array_equal(a, b) else 0.0
+    a = a[:h, :w].reshape(h // 8, 8, w // 8, 8).astype(np.float64)
+    b = b[:h, :w].reshape(h // 8, 8, w // 8, 8).astype(np.float64)
+    mu_a, mu_b = a.mean(axis=(1, 3)), b.mean(axis=(1, 3))
+    var_a, var_b = a.var(axis=(1, 3)), b.var(axis=(1, 3))
+    cov = (a * b).mean(axis=(1, 3)) - mu_a * mu_b
+    s = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(s.mean())
+
+
+def sequence_ssim(folder_path, png_files, durations, webp_file, resize=None):
+    """Mean SSIM of each frame of webp_file against the source frame shown
+    at the same time (libwebp merges identical frames, so the counts can
+    differ). resize (resize.ResizeSpec) is applied to the source frames so
+    they match what was encoded."""
+    starts = []
+    t = 0
+    for d in durations:
+        starts.append(t)
+        t += d
+    scores = []
+    with Image.open(webp_file) as anim:
+        t = 0
+        for i in range(getattr(anim, "n_frames", 1)):
+            anim.seek(i)
+            frame = anim.convert("RGBA")  # also loads the frame's duration into info
+            src_index = max(0, bisect.bisect_right(starts, t) - 1)
+            t += anim.info.get("duration", 0)
+            with open_frame(os.path.join(folder_path, png_files[src_index])) as f, Image.open(f) as src:
+                src = src.convert("RGBA")
+            if resize:
+                src = resize.apply(src)
+            ref = np.asarray(src.convert("L"))
+            scores.append(ssim(ref, np.asarray(frame.convert("L"))))
+    return sum(scores) / len(scores) if scores else 1.0
+
+
+def _trial(encoder, folder_path, files, durations, quality, loop, output_file, want_ssim,
+           analysis, options):
+    options = dict(options or {})
+    if analysis:
+        options.update(analysis.encoder_options(lossless=quality == 100))
+    job = EncodeJob(folder_path, files, output_file, durations, quality, loop, **options)
+    if not encoder.encode(job):
+        return quality, None, None
+    size = os.path.getsize(output_file)
+    score = sequence_ssim(folder_path, files, durations, output_file, job.resize) if want_ssim else None
+    return quality, size, score
+
+
+class TuneResult:
+    def __init__(self, quality, predicted_size, ssim, trials):
+        self.quality = quality
+        self.predicted_size = predicted_size
+        self.ssim = ssim
+        self.trials = trials
+
+
+class QualityTuner:
+    """target_size is in bytes, target_ssim in 0..1; either or both."""
+    def __init__(self, encoder, target_size=None, target_ssim=None, workers=None):
+        if target_size is None and target_ssim is None:
+            raise ValueError("Give a target size and/or a target SSIM")
+        if target_ssim is not None and not SSIM_AVAILABLE:
+            raise RuntimeError("SSIM targets need numpy and Pillow (pip install numpy pillow)")
+        self.encoder = encoder
+        self.target_size = target_size
+        self.target_ssim = target_ssim
+        self.workers = workers or available_cpus()
+
+    def _executor(self):
+        # In-process encoders may hold the GIL, so give each trial its own
+        # process; subprocess backends only need a thread to wait on.
+        if self.encoder.in_process:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+
+    def _run_trials(self, executor, tmp_dir, folder_path, files, durations, loop, qualities, scale,
+                    analysis, options):
+        futures = [executor.submit(_trial, self.encoder, folder_path, files, durations, q, loop,
+                                   os.path.join(tmp_dir, f"q{q}.webp"), self.target_ssim is not None,
+                                   analysis, options)
+                   for q in qualities]
+        trials = {}
+        for fut in concurrent.futures.as_completed(futures):
+            q, size, score = fut.result()
+            if size is not None:
+                trials[q] = (int(size * scale), score)
+        return trials
+
+    def _acceptable(self, trial):
+        size, score = trial
+        if self.target_size is not None and size > self.target_size:
+            return False
+        if self.target_ssim is not None and score < self.target_ssim:
+            return False
+        return True
+
+    def _pick(self, trials):
+        ok = [q for q, t in trials.items() if self._acceptable(t)]
+        if not ok:
+            # Nothing passes: get as close as we can, treating the size
+            # budget as the hard limit when there is one
+            if self.target_size is None:
+                return max(trials, key=lambda q: (trials[q][1], q))
+            return min(trials, key=lambda q: trials[q][0])
+        if self.target_ssim is not None:
+            # Smallest file that looks good enough. Not simply the lowest
+            # quality: lossless often beats low lossy settings on flat art.
+            return min(ok, key=lambda q: (trials[q][0], -q))
+        return max(ok)
+
+    def tune(self, folder_path, png_files, durations, loop, analysis=None, options=None):
+        """analysis (analysis.SequenceAnalysis) and options (extra EncodeJob
+        arguments) give the trials the same settings as the final encode."""
+        files, durs = sample_frames(png_files, durations)
+        scale = len(png_files) / len(files)
+        tmp_dir = tempfile.mkdtemp(prefix="webp_tune_")
+        try:
+            with self._executor() as executor:
+                trials = self._run_trials(executor, tmp_dir, folder_path, files, durs, loop,
+                                          COARSE_QUALITIES, scale, analysis, options)
+                if not trials:
+                    raise RuntimeError("All trial encodes failed")
+                best = self._pick(trials)
+                # Refine between the pick and its neighbouring coarse lossy
+                # qualities (lossless has no neighbours to refine towards).
+                if best != 100:
+                    lossy = sorted(q for q in COARSE_QUALITIES if q != 100)
+                    i = lossy.index(best) if best in lossy else 0
+                    lo = lossy[i - 1] if i > 0 else 0
+                    hi = lossy[i + 1] if i + 1 < len(lossy) else 99
+                    fine = sorted({q for q in range(lo + 1, hi, max(1, (hi - lo) // 6))} - set(trials))
+                    trials.update(self._run_trials(executor, tmp_dir, folder_path, files, durs, loop,
+                                                   fine, scale, analysis, options))
+                    best = self._pick(trials)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        size, score = trials[best]
+        log.debug("Tuned %s to q%d (predicted %d bytes, ssim %s) from %d trials",
+                  folder_path, best, size, score, len(trials))
+        return TuneResult(best, size, score, len(trials))
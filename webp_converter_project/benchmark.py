@@ -0,0 +1,398 @@
+"""Benchmark harness for the conversion pipeline.
+
+    python benchmark.py run --suite quick -o before.json
+    python benchmark.py run --suite quick -o after.json
+    python benchmark.py compare before.json after.json
+    python benchmark.py startup
+
+Synthetic PNG sequences are written with a tiny stdlib-only PNG writer from a
+fixed seed, so every machine benchmarks byte-identical input. Each case runs
+in its own subprocess so wall time, CPU time (including img2webp children)
+and peak RSS belong to that case alone.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import random
+import argparse
+import platform
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# --- SYNTHETIC SEQUENCES
+
+MOTIONS = ("static", "slide", "noise")
+
+
+def write_png(path, width, height, pixels, alpha):
+    """Write 8-bit RGB(A) pixels (bytes, row-major) as a PNG."""
+    channels = 4 if alpha else 3
+    stride = width * channels
+    raw = b"".join(b"\x00" + pixels[y * stride:(y + 1) * stride] for y in range(height))
+
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6 if alpha else 2, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+                + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+class SequenceSpec:
+    def __init__(self, name, width, height, frames, alpha=False, motion="slide", hold=1, seed=0):
+        if motion not in MOTIONS:
+            raise ValueError(f"motion must be one of {MOTIONS}")
+        self.name = name
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.alpha = alpha
+        self.motion = motion
+        self.hold = max(1, hold)
+        self.seed = seed
+
+    def key(self):
+        return (f"{self.name}_{self.width}x{self.height}_{self.frames}f_"
+                f"{'rgba' if self.alpha else 'rgb'}_{self.motion}_h{self.hold}_s{self.seed}")
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def render(self, index, rng, background):
+        channels = 4 if self.alpha else 3
+        pixels = bytearray(background * (self.width * self.height))
+        if self.motion == "noise":
+            # Incompressible grain over the middle quarter of the frame
+            # (full-frame noise makes lossless animation encoding crawl)
+            w, h = self.width // 2, self.height // 2
+            x0, y0 = self.width // 4, self.height // 4
+            for y in range(y0, y0 + h):
+                start = (y * self.width + x0) * channels
+                pixels[start:start + w * channels] = rng.randbytes(w * channels)
+        if self.motion == "slide":
+            # A solid box travelling left to right over a static backdrop
+            box_w = max(1, self.width // 8)
+            box_h = max(1, self.height // 4)
+            x0 = (index * max(1, self.width // 64)) % max(1, self.width - box_w)
+            y0 = (self.height - box_h) // 2
+            colour = bytes((255, 120, 0, 255)[:channels]) * box_w
+            for y in range(y0, y0 + box_h):
+                start = (y * self.width + x0) * channels
+                pixels[start:start + box_w * channels] = colour
+        return bytes(pixels)
+
+    def generate(self, folder, seed_offset=0):
+        """Write the sequence into folder (skipped if it is already there)."""
+        marker = os.path.join(folder, ".complete")
+        if os.path.isfile(marker):
+            return folder
+        os.makedirs(folder, exist_ok=True)
+        rng = random.Random(self.seed + seed_offset)
+        background = bytes((30, 30, 60, 128 if self.alpha else 255)[:4 if self.alpha else 3])
+        pixels = None
+        for i in range(self.frames):
+            if pixels is None or i % self.hold == 0:
+                pixels = self.render(i // self.hold, rng, background)
+            write_png(os.path.join(folder, f"frame_{i:05d}.png"), self.width, self.height,
+                      pixels, self.alpha)
+        open(marker, "w").close()
+        return folder
+
+
+SUITES = {
+    "quick": [
+        SequenceSpec("ui", 320, 240, 60, alpha=True, motion="slide", hold=4),
+        SequenceSpec("noise", 160, 120, 12, motion="noise"),
+    ],
+    "full": [
+        SequenceSpec("ui", 640, 360, 240, alpha=True, motion="slide", hold=6),
+        SequenceSpec("slide", 1280, 720, 120, motion="slide"),
+        SequenceSpec("static", 1280, 720, 120, alpha=True, motion="static"),
+        SequenceSpec("noise", 320, 240, 24, motion="noise"),
+        SequenceSpec("hd", 1920, 1080, 48, alpha=True, motion="slide", hold=2),
+    ],
+}
+
+# --- RUNNING
+
+
+def measure_case(case):
+    """Run one case in this process and return its metrics (used by run-case)."""
+    from engine import ConversionEngine
+
+    folders = case["folders"]
+    engine = ConversionEngine(encoder=case["encoder"], max_workers=case["workers"],
+                              dedupe=case.get("dedupe", False))
+    os.makedirs(case["output_dir"], exist_ok=True)
+    cpu_start = _cpu_time()
+    wall_start = time.perf_counter()
+    results = engine.convert(folders, case["output_dir"], case["fps"], case["quality"])
+    wall = time.perf_counter() - wall_start
+    cpu = _cpu_time() - cpu_start
+    frames = sum(r.frames + r.dropped_frames for r in results)
+    return {
+        "status": "ok" if all(r.success for r in results) else "failed",
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        "frames": frames,
+        "fps": round(frames / wall, 2) if wall > 0 else None,
+        "output_bytes": sum(r.bytes_written for r in results),
+    }
+
+
+def _cpu_time():
+    try:
+        import resource
+    except ImportError:
+        # Windows: no rusage, and img2webp child time is not visible
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS; report MiB
+    scale = 1024 ** 2 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / scale, 1)
+
+
+def run_suite(args):
+    from encoders import get_encoder
+
+    work_dir = os.path.abspath(args.work_dir)
+    specs = SUITES[args.suite]
+    records = []
+    for spec in specs:
+        folders = [spec.generate(os.path.join(work_dir, "input", f"{spec.key()}_{i}"), seed_offset=i)
+                   for i in range(args.sequences)]
+        for encoder in args.encoders:
+            if not get_encoder(encoder).available():
+                print(f"skipping {encoder}: not available", file=sys.stderr)
+                continue
+            for quality in args.qualities:
+                for workers in args.workers:
+                    case = {
+                        "folders": folders,
+                        "output_dir": os.path.join(work_dir, "output", f"{spec.key()}_{encoder}_q{quality}_w{workers}"),
+                        "encoder": encoder,
+                        "quality": quality,
+                        "workers": workers,
+                        "fps": 25,
+                        "dedupe": args.dedupe,
+                    }
+                    metrics = _run_case_subprocess(case)
+                    record = {"case": spec.key(), "sequence": spec.to_dict(), "sequences": args.sequences,
+                              "encoder": encoder, "quality": quality, "workers": workers,
+                              "dedupe": args.dedupe, **metrics}
+                    records.append(record)
+                    print(f"{spec.key():<40} {encoder:<8} q{quality:<3} w{workers:<2} "
+                          f"{metrics.get('wall_s', 0):>8.3f}s {metrics.get('fps') or 0:>8.1f} fps "
+                          f"{metrics.get('output_bytes', 0):>10} B  {metrics['status']}", file=sys.stderr)
+    return {
+        "meta": {
+            "suite": args.suite,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": records,
+    }
+
+
+def _run_case_subprocess(case):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "run-case"],
+                          input=json.dumps(case), capture_output=True, text=True, cwd=HERE)
+    if proc.returncode != 0:
+        return {"status": "error", "error": proc.stderr.strip()[-2000:]}
+    return json.loads(proc.stdout)
+
+
+# --- STARTUP
+
+# Must not be imported by a headless run; PIL is only allowed for the pillow encoder
+HEAVY_MODULES = ("tkinter", "numpy", "PIL")
+STARTUP_SEQUENCE = SequenceSpec("startup", 32, 32, 4)
+
+
+def _time_command(command, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(command, capture_output=True, text=True, cwd=HERE)
+        times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            return {"status": "error", "error": proc.stderr.strip()[-2000:]}
+    times.sort()
+    return {"status": "ok", "best_ms": round(times[0] * 1000, 1),
+            "median_ms": round(times[len(times) // 2] * 1000, 1)}
+
+
+def measure_startup(args):
+    """Cold-start cost of a scripted conversion, each run in a fresh process:
+    the bare interpreter, importing the entry point, and converting a tiny
+    sequence end to end through main.py."""
+    work_dir = os.path.abspath(args.work_dir)
+    folder = STARTUP_SEQUENCE.generate(os.path.join(work_dir, "input", STARTUP_SEQUENCE.key()))
+    output = os.path.join(work_dir, "output", "startup.webp")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    convert_args = [folder, "-o", output, "--encoder", args.encoder]
+    commands = {
+        "interpreter": [sys.executable, "-c", "pass"],
+        "import": [sys.executable, "-c", "import main, cli, engine"],
+        "convert": [sys.executable, os.path.join(HERE, "main.py")] + convert_args,
+    }
+    records = []
+    for name, command in commands.items():
+        metrics = _time_command(command, args.runs)
+        records.append({"case": name, **metrics})
+        print(f"{name:<12} {metrics.get('best_ms', 0):>8.1f} ms best "
+              f"{metrics.get('median_ms', 0):>8.1f} ms median  {metrics['status']}", file=sys.stderr)
+
+    # Which heavy modules did a headless conversion pull in?
+    probe = ("import sys, main; main.main(sys.argv[1:]); "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-c", probe] + convert_args,
+                          capture_output=True, text=True, cwd=HERE)
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    unexpected = [m for m in loaded if not (m == "PIL" and args.encoder == "pillow")]
+    if unexpected:
+        print(f"headless run imported {', '.join(unexpected)}", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "encoder": args.encoder,
+            "runs": args.runs,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": records,
+        "heavy_modules": loaded,
+        "unexpected_modules": unexpected,
+    }
+
+
+# --- COMPARING
+
+def result_key(record):
+    return (record["case"], record["encoder"], record["quality"], record["workers"], record.get("dedupe", False))
+
+
+def compare(base, new, threshold=0.10):
+    """Return (rows, regressions). A regression is a case whose wall time or
+    output size grew by more than threshold (a fraction), or that stopped
+    succeeding."""
+    base_by_key = {result_key(r): r for r in base["results"]}
+    rows = []
+    regressions = []
+    for record in new["results"]:
+        old = base_by_key.get(result_key(record))
+        if not old:
+            continue
+        row = {"key": result_key(record), "notes": []}
+        for metric in ("wall_s", "cpu_s", "peak_rss_mb", "output_bytes"):
+            a, b = old.get(metric), record.get(metric)
+            row[metric] = (a, b, (b - a) / a if a and b is not None else None)
+        if old.get("status") == "ok" and record.get("status") != "ok":
+            row["notes"].append("now failing")
+        for metric in ("wall_s", "output_bytes"):
+            change = row[metric][2]
+            if change is not None and change > threshold:
+                row["notes"].append(f"{metric} +{change:.0%}")
+        if row["notes"]:
+            regressions.append(row)
+        rows.append(row)
+    return rows, regressions
+
+
+def _format_change(value):
+    a, b, change = value
+    if change is None:
+        return f"{a} -> {b}"
+    return f"{a} -> {b} ({change:+.1%})"
+
+
+def compare_files(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows, regressions = compare(base, new, args.threshold)
+    for row in rows:
+        case, encoder, quality, workers, _ = row["key"]
+        flag = "REGRESSION " + ", ".join(row["notes"]) if row["notes"] else "ok"
+        print(f"{case:<40} {encoder:<8} q{quality:<3} w{workers:<2} wall {_format_change(row['wall_s'])}"
+              f"  size {_format_change(row['output_bytes'])}  {flag}")
+    print(f"{len(regressions)} regression(s) in {len(rows)} comparable case(s)")
+    return 1 if regressions else 0
+
+
+# --- ENTRY POINT
+
+def _int_list(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PNG sequence to WebP conversion.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run a benchmark suite")
+    run.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    run.add_argument("--encoders", type=lambda t: t.split(","), default=["img2webp", "pillow"])
+    run.add_argument("--qualities", type=_int_list, default=[100, 80])
+    run.add_argument("--workers", type=_int_list, default=[1, os.cpu_count() or 1])
+    run.add_argument("--sequences", type=int, default=2, help="copies of each sequence per batch")
+    run.add_argument("--dedupe", action="store_true")
+    run.add_argument("--work-dir", default=os.path.join(HERE, "bench_work"))
+    run.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+
+    cmp_parser = sub.add_parser("compare", help="compare two result files")
+    cmp_parser.add_argument("base")
+    cmp_parser.add_argument("new")
+    cmp_parser.add_argument("--threshold", type=float, default=0.10,
+                            help="relative increase that counts as a regression (default: 0.10)")
+
+    startup = sub.add_parser("startup", help="measure cold start of a headless conversion")
+    startup.add_argument("--encoder", default="img2webp", choices=["img2webp", "pillow"])
+    startup.add_argument("--runs", type=int, default=10)
+    startup.add_argument("--work-dir", default=os.path.join(HERE, "bench_work"))
+    startup.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+
+    sub.add_parser("run-case", help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+    if args.command == "run-case":
+        print(json.dumps(measure_case(json.load(sys.stdin))))
+        return 0
+    if args.command == "compare":
+        return compare_files(args)
+    if args.command == "startup":
+        results = measure_startup(args)
+    else:
+        results = run_suite(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 1 if results.get("unexpected_modules") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
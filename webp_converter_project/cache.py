@@ -0,0 +1,171 @@
+"""Content-addressed output cache.
+
+A job's key covers its frame list (names, sizes, mtimes, or full content
+hashes) and every encoder setting. When the key matches what produced the
+existing output file the job is skipped outright; otherwise a copy kept in
+the cache directory is restored if there is one. The cache directory is
+trimmed least-recently-used first once it grows past max_bytes.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+from archive import frame_signature
+from dedupe import hash_frames
+
+MANIFEST_NAME = "manifest.json"
+
+
+def default_cache_dir():
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "webpify")
+
+
+def _copy_file(src, dst):
+    """Copy src over dst through a private temporary file next to dst, so
+    dst is never partial and concurrent copies to it do not collide."""
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(dst)}.", suffix=".tmp",
+                               dir=os.path.dirname(dst))
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class OutputCache:
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 ** 3, content_hash=False):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        self._manifest = self._load_manifest()
+        self._dirty = False
+        self._total_bytes = None
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """Write the manifest back to disk; call once a batch is finished."""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp = self._manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f)
+            os.replace(tmp, self._manifest_path)
+            self._dirty = False
+
+    def job_key(self, folder_path, png_files, settings):
+        h = hashlib.sha256()
+        h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        paths = [os.path.join(folder_path, f) for f in png_files]
+        if self.content_hash:
+            for name, digest in zip(png_files, hash_frames(paths)):
+                h.update(name.encode("utf-8"))
+                h.update(digest)
+        else:
+            for name, path in zip(png_files, paths):
+                h.update(f"{name}\0{frame_signature(path)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def _object_path(self, key):
+        return os.path.join(self.objects_dir, key + ".webp")
+
+    def lookup(self, key, output_file):
+        """Make output_file hold the result for key if we can. Returns True on a hit."""
+        output_file = os.path.abspath(output_file)
+        with self._lock:
+            entry = self._manifest.get(output_file)
+        if entry and entry["key"] == key and self._unchanged(output_file, entry):
+            return True
+        cached = self._object_path(key)
+        if not os.path.isfile(cached):
+            return False
+        try:
+            _copy_file(cached, output_file)
+            os.utime(cached)  # LRU bookkeeping
+        except OSError:
+            return False
+        self._remember(key, output_file)
+        return True
+
+    def store(self, key, output_file):
+        output_file = os.path.abspath(output_file)
+        try:
+            _copy_file(output_file, self._object_path(key))
+            size = os.path.getsize(output_file)
+        except OSError:
+            return
+        self._remember(key, output_file)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            full = self._total_bytes is None or self._total_bytes > self.max_bytes
+        if full:
+            self.evict()
+
+    def _remember(self, key, output_file):
+        st = os.stat(output_file)
+        with self._lock:
+            self._manifest[output_file] = {"key": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            self._dirty = True
+
+    def evict(self):
+        """Delete least-recently-used cache objects until under max_bytes.
+
+        Manifest entries for deleted objects are dropped too, unless their
+        output file is still the one recorded: that one can still be
+        skipped without the cached copy."""
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.objects_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(".webp"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+                        total += st.st_size
+            entries.sort()
+            evicted = set()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    evicted.add(os.path.basename(path)[:-len(".webp")])
+                except OSError:
+                    pass
+            self._total_bytes = total
+            for output_file, entry in list(self._manifest.items()):
+                if entry["key"] in evicted and not self._unchanged(output_file, entry):
+                    del self._manifest[output_file]
+                    self._dirty = True
+
+    @staticmethod
+    def _unchanged(output_file, entry):
+        try:
+            st = os.stat(output_file)
+        except OSError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
@@ -0,0 +1,468 @@
+"""Command-line front end for the conversion engine (no tkinter needed).
+
+    python cli.py shot010 shot020 -o out/ --fps 25 --quality 90 --loop
+    python cli.py -r /renders/show -o out/ --include "*/beauty" --min-frames 24
+    python cli.py shot010 -o out/ --variant master:q=100 --variant web:q=75,max_width=960
+    python cli.py --watch /renders/drop -o out/ --settle 30
+    python cli.py -r /mnt/renders -o /mnt/out --serve 8765      (then on each node:)
+    python cli.py --worker http://coordinator:8765
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from cache import OutputCache
+from discover import discover_sequences
+from encoders import ENCODERS
+from journal import JobJournal
+from engine import ConversionEngine, ConversionError, FolderResult, parse_fps, plan_outputs
+from prefetch import DEFAULT_DECODE_WORKERS, DEFAULT_LOOKAHEAD
+from resize import FILTERS, ResizeSpec, ScaledFrameCache
+from scheduler import parse_size
+from staging import StagingArea
+from variants import parse_variant
+
+CLEAR_LINE = "\r\033[K"
+
+
+def parse_segments(value):
+    if value == "auto":
+        return value
+    try:
+        count = int(value)
+        if count < 1:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a positive number or 'auto'")
+    return count
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    try:
+        port = int(port)
+        if not 0 <= port < 65536:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected [HOST:]PORT")
+    return host, port
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert PNG sequence folders to animated WebP.")
+    parser.add_argument("folders", nargs="*", help="folders containing PNG frames, or ZIP/TAR archives of them")
+    parser.add_argument("-o", "--output",
+                        help="output .webp file (single folder) or output folder "
+                             "(with --watch: always a folder, created if missing)")
+    parser.add_argument("--fps", default=25, help="frames per second (default: 25)")
+    parser.add_argument("-q", "--quality", type=int, default=100,
+                        help="0=low, 100=lossless (default: 100)")
+    parser.add_argument("--loop", action="store_true", help="loop the animation forever")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="treat the folders as roots and convert every PNG sequence folder below them")
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="with -r, only convert folders whose name or path below the root "
+                             "matches PATTERN, e.g. 'beauty' or 'shot*/v*' (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="with -r, skip folders matching PATTERN and everything below them (repeatable)")
+    parser.add_argument("--min-frames", type=int, default=1,
+                        help="ignore folders with fewer PNG frames than this (default: 1)")
+    parser.add_argument("--target-size", type=parse_size, default=None, metavar="SIZE",
+                        help="pick the best quality that keeps each file under SIZE, e.g. 2M "
+                             "(overrides --quality)")
+    parser.add_argument("--target-ssim", type=float, default=None, metavar="0-1",
+                        help="pick the lowest quality whose SSIM is at least this, e.g. 0.95 "
+                             "(needs numpy; overrides --quality)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parallel folders (default: number of CPUs)")
+    parser.add_argument("--memory-budget", type=parse_size, default=None,
+                        help="memory for concurrent jobs, e.g. 8G (default: half of RAM)")
+    parser.add_argument("--segments", type=parse_segments, default=1, metavar="N|auto",
+                        help="encode each sequence as N segments in parallel and join them "
+                             "(auto: share the CPUs between the folders; default: 1)")
+    parser.add_argument("--encoder", choices=["auto"] + sorted(ENCODERS), default="auto",
+                        help="encoder backend (default: img2webp if found, else pillow)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="merge runs of identical frames into one longer frame")
+    parser.add_argument("--dedupe-threshold", type=int, default=None, metavar="0-255",
+                        help="also merge frames whose pixels differ by at most this much (needs Pillow)")
+    parser.add_argument("--max-width", type=int, default=None,
+                        help="scale frames down to at most this wide, keeping the aspect ratio")
+    parser.add_argument("--max-height", type=int, default=None,
+                        help="scale frames down to at most this tall, keeping the aspect ratio")
+    parser.add_argument("--scale", type=float, default=None,
+                        help="scale frames by this factor, e.g. 0.5")
+    parser.add_argument("--resize-filter", choices=FILTERS, default="lanczos", help="resampling filter (default: lanczos)")
+    parser.add_argument("--variant", action="append", default=[], metavar="NAME[:SETTINGS]",
+                        help="write one more output per folder, <name>_NAME.webp, from the same decoded "
+                             "frames; SETTINGS is a comma-separated list of q, scale, max_width, "
+                             "max_height, filter, fps and loop (0/1), e.g. 'thumb:q=60,max_width=320,fps=12' "
+                             "(repeatable; replaces the plain output)")
+    parser.add_argument("--analyze", action="store_true",
+                        help="measure frame-to-frame changes to pick keyframe spacing and mixed "
+                             "lossy/lossless mode per sequence (needs numpy)")
+    parser.add_argument("--clean-alpha", action="store_true",
+                        help="drop the alpha channel of opaque frames and blank the colour under fully "
+                             "transparent pixels, for smaller and faster lossless encodes (needs numpy)")
+    parser.add_argument("--exact", action="store_true",
+                        help="keep the colour of fully transparent pixels (img2webp only)")
+    parser.add_argument("--palette", choices=("exact", "lossy"), default=None,
+                        help="encode sequences whose frames fit one shared 256-colour palette losslessly "
+                             "through it; 'lossy' also merges rare colours (anti-aliasing) into the "
+                             "palette of flat-colour sequences (needs numpy)")
+    parser.add_argument("--cache", action="store_true",
+                        help="skip folders whose frames and settings are unchanged since the last run, "
+                             "and keep resized frames for later runs")
+    parser.add_argument("--cache-dir", default=None, help="cache location (implies --cache)")
+    parser.add_argument("--cache-size", type=parse_size, default="2G",
+                        help="evict least-recently-used cached outputs past this size (default: 2G)")
+    parser.add_argument("--frame-cache-size", type=parse_size, default="2G",
+                        help="evict least-recently-used resized frames past this size, on top of "
+                             "--cache-size (default: 2G)")
+    parser.add_argument("--cache-hash", action="store_true",
+                        help="key the cache on frame contents rather than sizes and mtimes")
+    parser.add_argument("--stage", nargs="?", const="", default=None, metavar="DIR",
+                        help="copy each folder's frames to local scratch (DIR, default: the temp folder) "
+                             "before encoding and move finished outputs into place in one step; "
+                             "for frames and outputs on network shares")
+    parser.add_argument("--stage-size", type=parse_size, default="10G",
+                        help="most frame bytes staged at once; larger folders are read in place "
+                             "(default: 10G)")
+    parser.add_argument("--decode-workers", type=int, default=DEFAULT_DECODE_WORKERS,
+                        help=f"PNG decode threads per job, in-process encoders only (default: {DEFAULT_DECODE_WORKERS})")
+    parser.add_argument("--lookahead", type=int, default=DEFAULT_LOOKAHEAD,
+                        help=f"max decoded frames buffered per job (default: {DEFAULT_LOOKAHEAD})")
+    parser.add_argument("--watch", action="append", default=[], metavar="ROOT",
+                        help="keep running and convert sequence folders under ROOT as they finish "
+                             "(repeatable; without -o outputs go next to each folder)")
+    parser.add_argument("--watch-existing", action="store_true",
+                        help="also convert folders that are already complete when watching starts")
+    parser.add_argument("--settle", type=float, default=10.0,
+                        help="seconds a folder must stay unchanged before it is converted (default: 10)")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="seconds between watch scans (default: 2)")
+    parser.add_argument("--serve", type=parse_address, default=None, metavar="[HOST:]PORT",
+                        help="don't convert here: serve the batch to --worker processes, which must "
+                             "see the folders and output under the same paths")
+    parser.add_argument("--local-workers", type=int, default=0, metavar="N",
+                        help="with --serve, also start N workers on this machine")
+    parser.add_argument("--worker", default=None, metavar="URL",
+                        help="convert jobs from the coordinator at URL until it has none left")
+    parser.add_argument("--heartbeat", type=float, default=5.0,
+                        help="with --serve, seconds between worker heartbeats; jobs of workers "
+                             "silent for four heartbeats are handed out again (default: 5)")
+    parser.add_argument("--journal", default=None, metavar="FILE",
+                        help="record job states in FILE; re-running the batch skips finished folders")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="retry failed folders this many times (default: 2)")
+    parser.add_argument("--retry-delay", type=float, default=2.0,
+                        help="seconds before the first retry, doubling each time (default: 2)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="skip checking each output's frames, timing and loop count")
+    parser.add_argument("--img2webp", default=None, help="path to the img2webp binary")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def engine_options(args):
+    """The settings that decide what the outputs look like, as plain JSON
+    values, so a coordinator (--serve) can hand them to its workers."""
+    resize = None
+    if args.max_width or args.max_height or args.scale:
+        resize = {"max_width": args.max_width, "max_height": args.max_height,
+                  "scale": args.scale, "resample": args.resize_filter}
+    return {
+        "encoder": args.encoder,
+        "dedupe": args.dedupe or args.dedupe_threshold is not None,
+        "dedupe_threshold": args.dedupe_threshold,
+        "target_size": args.target_size,
+        "target_ssim": args.target_ssim,
+        "analyze": args.analyze,
+        "clean_alpha": args.clean_alpha,
+        "exact": args.exact,
+        "palette": args.palette,
+        "resize": resize,
+        "segments": args.segments,
+        "verify": not args.no_verify,
+        "retries": args.retries,
+        "retry_delay": args.retry_delay,
+        "variants": args.variant,
+    }
+
+
+def engine_parts(options):
+    """The ResizeSpec and OutputVariants of engine_options(); raises
+    ValueError or RuntimeError for settings that cannot work."""
+    resize = ResizeSpec(**options["resize"]) if options["resize"] else None
+    variants = [parse_variant(v) for v in options["variants"]]
+    if variants and (options["target_size"] is not None or options["target_ssim"] is not None):
+        raise ValueError("A target size or SSIM cannot be combined with output variants")
+    if options["palette"] and (variants or options["target_size"] is not None
+                               or options["target_ssim"] is not None):
+        raise ValueError("A shared palette cannot be combined with output variants or a target size or SSIM")
+    return resize, variants
+
+
+def build_engine(options, args, journal=None):
+    """A ConversionEngine for engine_options(); the img2webp path, worker and
+    memory limits, cache, staging and decode settings are this machine's own
+    (args)."""
+    resize, variants = engine_parts(options)
+    cache = frame_cache = None
+    if args.cache or args.cache_dir:
+        cache = OutputCache(args.cache_dir, max_bytes=args.cache_size, content_hash=args.cache_hash)
+        if resize:
+            frame_cache = ScaledFrameCache(os.path.join(cache.cache_dir, "frames"),
+                                           max_bytes=args.frame_cache_size)
+    staging = None
+    if args.stage is not None:
+        staging = StagingArea(args.stage or None, max_bytes=args.stage_size)
+    return ConversionEngine(encoder=options["encoder"], img2webp_path=args.img2webp,
+                            max_workers=args.workers,
+                            memory_budget=args.memory_budget,
+                            dedupe=options["dedupe"],
+                            dedupe_threshold=options["dedupe_threshold"],
+                            cache=cache,
+                            decode_workers=args.decode_workers,
+                            lookahead=args.lookahead,
+                            target_size=options["target_size"],
+                            target_ssim=options["target_ssim"],
+                            analyze=options["analyze"],
+                            clean_alpha=options["clean_alpha"],
+                            exact=options["exact"],
+                            palette=options["palette"],
+                            staging=staging,
+                            resize=resize,
+                            frame_cache=frame_cache,
+                            segments=options["segments"],
+                            verify=options["verify"],
+                            journal=journal,
+                            retries=options["retries"],
+                            retry_delay=options["retry_delay"],
+                            variants=variants)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.worker:
+        logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                            format="%(levelname)s %(message)s")
+        return run_worker(args)
+    if args.serve and args.watch:
+        parser.error("--serve cannot be combined with --watch")
+    if args.serve and args.journal:
+        parser.error("--journal is not supported with --serve")
+    if not args.watch and not args.folders:
+        parser.error("give at least one folder or --watch ROOT")
+    if not args.watch and not args.output:
+        parser.error("-o/--output is required")
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format="%(levelname)s %(message)s")
+
+    options = engine_options(args)
+    journal = engine = None
+    if args.serve:
+        # The engines are built by the workers; only check the settings here
+        try:
+            engine_parts(options)
+        except (RuntimeError, ValueError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+    else:
+        try:
+            if args.journal:
+                journal = JobJournal(args.journal)
+            engine = build_engine(options, args, journal)
+        except (ConversionError, RuntimeError, ValueError, OSError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+    folders, frame_lists = args.folders, None
+    if args.recursive and not args.watch:
+        frame_lists = discover_sequences(args.folders, include=args.include, exclude=args.exclude,
+                                         min_frames=args.min_frames)
+        folders = list(frame_lists)
+        if not folders:
+            print("error: no PNG sequence folders found", file=sys.stderr)
+            return 1
+        if not args.json:
+            print(f"found {len(folders)} sequence folder(s)", file=sys.stderr)
+    folder_loops = {f: args.loop for f in folders}
+
+    live = sys.stderr.isatty() and not args.json
+    tuned_quality = options["target_size"] is not None or options["target_ssim"] is not None
+
+    def on_result(result, completed, total):
+        if not args.json:
+            status = "cached" if result.cached else "resumed" if result.resumed else result.status
+            dropped = f" ({result.dropped_frames} duplicate frames merged)" if result.dropped_frames else ""
+            rate = f" {result.fps:.0f} fps" if result.success and not (result.cached or result.resumed) else ""
+            if result.attempts > 1:
+                rate += f" after {result.attempts} attempts"
+            tuned = f" q{result.quality}" if tuned_quality and result.quality is not None else ""
+            outputs = ", ".join(result.outputs) if args.variant else result.output_file
+            node = f" on {result.node}" if result.node else ""
+            print(f"{CLEAR_LINE if live else ''}[{completed}/{total}] {status:<9} {result.folder} -> "
+                  f"{outputs}{dropped}{tuned}{rate}{node}", file=sys.stderr)
+
+    def on_progress(event):
+        if live:
+            print(f"{CLEAR_LINE}{event.summary()} · {event.bytes_written / 1024 ** 2:.1f} MB",
+                  end="", file=sys.stderr, flush=True)
+
+    if args.watch:
+        return run_watch(engine, args, on_result)
+
+    try:
+        if args.serve:
+            results = run_coordinator(args, options, folders, frame_lists, folder_loops, on_result)
+        else:
+            results = engine.convert(folders, args.output, args.fps, args.quality,
+                                     folder_loops=folder_loops, on_result=on_result,
+                                     on_progress=on_progress, frame_lists=frame_lists)
+    except ConversionError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        # Under --serve there is no local engine: this is a second Ctrl-C
+        # while run_coordinator was already shutting down
+        if engine:
+            engine.cancel()
+        return 130
+    if live:
+        print(CLEAR_LINE, end="", file=sys.stderr)
+
+    if args.json:
+        json.dump([r.to_dict() for r in results], sys.stdout, indent=2)
+        print()
+    return 0 if all(r.success for r in results) else 1
+
+
+def run_watch(engine, args, on_result):
+    from watch import WatchService
+
+    if args.output:
+        # Every poll may find one folder or several; either way the
+        # outputs go into this directory, never onto a single file
+        try:
+            os.makedirs(args.output, exist_ok=True)
+        except OSError as e:
+            print(f"error: --watch needs -o to be a folder: {e}", file=sys.stderr)
+            return 2
+
+    def on_ready(folders):
+        if not args.json:
+            print(f"ready: {len(folders)} folder(s)", file=sys.stderr)
+
+    def on_watch_result(result, completed, total):
+        on_result(result, completed, total)
+        if args.json:
+            print(json.dumps(result.to_dict()), flush=True)
+
+    service = WatchService(engine, args.watch, args.output, args.fps, args.quality, loop=args.loop,
+                           settle=args.settle, interval=args.interval, min_frames=args.min_frames,
+                           on_ready=on_ready, on_result=on_watch_result,
+                           skip_existing=not args.watch_existing)
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        service.stop()
+        engine.cancel()
+    return 0
+
+
+def local_worker_command(url, args):
+    """Command line for a worker process on this machine, passing on the
+    machine-specific settings."""
+    if getattr(sys, "frozen", False):
+        command = [sys.executable]
+    else:
+        command = [sys.executable, os.path.abspath(__file__)]
+    command += ["--worker", url, "--decode-workers", str(args.decode_workers),
+                "--lookahead", str(args.lookahead)]
+    if args.img2webp:
+        command += ["--img2webp", args.img2webp]
+    if args.memory_budget:
+        command += ["--memory-budget", str(args.memory_budget)]
+    if args.cache or args.cache_dir:
+        command += ["--cache", "--cache-size", str(args.cache_size),
+                    "--frame-cache-size", str(args.frame_cache_size)]
+        if args.cache_dir:
+            command += ["--cache-dir", args.cache_dir]
+        if args.cache_hash:
+            command.append("--cache-hash")
+    if args.stage is not None:
+        # The local workers share this machine's staging space
+        command += ["--stage", args.stage,
+                    "--stage-size", str(args.stage_size // max(args.local_workers, 1))]
+    if args.verbose:
+        command.append("-v")
+    return command
+
+
+def run_coordinator(args, options, folders, frame_lists, folder_loops, on_result):
+    import subprocess
+    from distributed import Coordinator
+
+    outputs = plan_outputs(folders, args.output)
+    fps = parse_fps(args.fps)
+    if not 0 <= args.quality <= 100:
+        raise ConversionError("Quality must be between 0 and 100")
+    jobs = [{"id": i, "folder": os.path.abspath(folder), "output_file": os.path.abspath(outputs[i]),
+             "png_files": frame_lists.get(folder) if frame_lists else None,
+             "fps": fps, "quality": args.quality, "loop": folder_loops[folder]}
+            for i, folder in enumerate(folders)]
+    host, port = args.serve
+    coordinator = Coordinator(jobs, options, host=host, port=port, heartbeat=args.heartbeat,
+                              on_result=on_result)
+    try:
+        coordinator.start()
+    except OSError as e:
+        raise ConversionError(f"Cannot serve on {host or '*'}:{port}: {e}")
+    if not args.json:
+        print(f"serving {len(jobs)} job(s) on {coordinator.url}", file=sys.stderr)
+    workers = [subprocess.Popen(local_worker_command(coordinator.local_url, args))
+               for _ in range(args.local_workers)]
+    try:
+        try:
+            results = coordinator.wait()
+        except KeyboardInterrupt:
+            # Local workers get the interrupt too and hand their jobs back
+            coordinator.cancel()
+            results = coordinator.wait(timeout=coordinator.lease_timeout)
+        for process in workers:
+            try:
+                process.wait(timeout=coordinator.lease_timeout)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+        coordinator.drain(coordinator.lease_timeout)
+    finally:
+        coordinator.stop()
+    return [r or FolderResult(i, job["folder"], job["output_file"], "cancelled")
+            for i, (r, job) in enumerate(zip(results, jobs))]
+
+
+def run_worker(args):
+    from distributed import Worker
+
+    worker = Worker(args.worker, lambda options: build_engine(options, args))
+    try:
+        count = worker.run()
+    except (ConversionError, RuntimeError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    except OSError as e:
+        print(f"error: lost the coordinator at {args.worker}: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        worker.stop()
+        return 130
+    logging.getLogger(__name__).info("%s converted %d folder(s)", worker.name, count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Duplicate / near-duplicate frame coalescing.
+
+Runs of identical consecutive frames are merged into the first frame of the
+run, which then stays on screen for the summed duration. Files are hashed in
+parallel (hashlib releases the GIL), so the pre-pass is mostly I/O bound.
+"""
+import os
+import hashlib
+import importlib.util
+import concurrent.futures
+
+from archive import open_frame
+from prefetch import FramePrefetcher
+from scheduler import available_cpus
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+
+def hash_file(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open_frame(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.digest()
+
+
+def hash_frames(paths, workers=None):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or available_cpus()) as executor:
+        return list(executor.map(hash_file, paths))
+
+
+def _load(path):
+    from PIL import Image
+    with open_frame(path) as f, Image.open(f) as im:
+        return im.convert("RGBA")
+
+
+def frames_match(a, b, threshold):
+    """True if no channel of any pixel differs by more than threshold (0-255)."""
+    if a.size != b.size:
+        return False
+    from PIL import ImageChops
+    extrema = ImageChops.difference(a, b).getextrema()
+    return all(hi <= threshold for _, hi in extrema)
+
+
+class CoalesceResult:
+    def __init__(self, png_files, durations, dropped):
+        self.png_files = png_files
+        self.durations = durations
+        self.dropped = dropped
+
+
+def coalesce_frames(folder_path, png_files, durations, threshold=None, workers=None):
+    """Merge runs of duplicate consecutive frames.
+
+    Frames whose files hash the same are always merged. With a threshold
+    (needs Pillow) frames are also decoded and merged while they stay within
+    threshold of the first frame of the run; comparing against the run start
+    rather than the previous frame keeps slow fades from collapsing.
+    """
+    if not png_files:
+        return CoalesceResult([], [], 0)
+    workers = workers or available_cpus()
+    paths = [os.path.join(folder_path, f) for f in png_files]
+    hashes = hash_frames(paths, workers)
+    if threshold is not None and not PIL_AVAILABLE:
+        raise RuntimeError("Near-duplicate detection needs Pillow (pip install pillow)")
+
+    kept_files = [png_files[0]]
+    kept_durations = [durations[0]]
+    run_hash = hashes[0]
+
+    if threshold is None:
+        for i in range(1, len(png_files)):
+            if hashes[i] == run_hash:
+                kept_durations[-1] += durations[i]
+            else:
+                run_hash = hashes[i]
+                kept_files.append(png_files[i])
+                kept_durations.append(durations[i])
+        return CoalesceResult(kept_files, kept_durations, len(png_files) - len(kept_files))
+
+    # Only frames whose bytes differ from their predecessor need decoding
+    decode = [i for i in range(1, len(paths)) if hashes[i] != hashes[i - 1]]
+    images = iter(FramePrefetcher([paths[i] for i in decode], load=_load, workers=workers,
+                                  lookahead=workers * 2))
+    run_image = _load(paths[0])
+    for i in range(1, len(png_files)):
+        image = next(images) if hashes[i] != hashes[i - 1] else None
+        if hashes[i] == run_hash:
+            kept_durations[-1] += durations[i]
+            continue
+        if image is None:
+            # Same bytes as the previous frame, which was merged into the run
+            kept_durations[-1] += durations[i]
+            continue
+        if frames_match(run_image, image, threshold):
+            kept_durations[-1] += durations[i]
+            continue
+        run_hash = hashes[i]
+        run_image = image
+        kept_files.append(png_files[i])
+        kept_durations.append(durations[i])
+    return CoalesceResult(kept_files, kept_durations, len(png_files) - len(kept_files))
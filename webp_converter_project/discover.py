@@ -0,0 +1,98 @@
+"""Find PNG sequence folders anywhere under one or more root folders.
+
+Render trees nest sequences several levels deep (show/shot/version/pass),
+and on network storage each directory listing is a round trip, so the walk
+lists many directories at once on a thread pool instead of one after
+another like os.walk. Every directory is listed exactly once; the sorted
+PNG names found on the way are returned with the folders so the engine does
+not have to list them again. ZIP and TAR archives are searched like folders
+(see archive.py).
+"""
+import os
+import fnmatch
+import logging
+import concurrent.futures
+
+from archive import has_archive_suffix, in_archive, scan_dir
+from prefetch import PrefetchCancelled
+
+log = logging.getLogger(__name__)
+
+# Listing is latency-bound, not CPU-bound, so use more threads than cores
+DEFAULT_SCAN_WORKERS = 16
+
+
+def _matches(patterns, rel_path, name):
+    """Patterns match either the folder name or its path below the root,
+    always written with forward slashes ("shot*", "*/v0*/beauty")."""
+    return any(fnmatch.fnmatchcase(rel_path, p) or fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+def _scan(path):
+    """List one directory: (PNG names, subdirectory paths)."""
+    if in_archive(path):
+        files, subdirs = scan_dir(path)
+        return [f for f in files if f.lower().endswith(".png")], subdirs
+    pngs, subdirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                # Symlinked directories are not followed, so cycles cannot occur
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(".png"):
+                    pngs.append(entry.name)
+                elif has_archive_suffix(entry.name) and entry.is_file():
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+    return pngs, subdirs
+
+
+def discover_sequences(roots, include=None, exclude=None, min_frames=1, workers=None,
+                       should_stop=None):
+    """Walk roots and return {folder: sorted PNG names}, in path order, for
+    every folder (the roots included) that holds at least min_frames PNGs.
+
+    Only folders matching one of the include patterns are returned, though
+    all of them are still searched; folders matching an exclude pattern are
+    skipped together with everything below them.
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+    found = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or DEFAULT_SCAN_WORKERS) as executor:
+        pending = {}
+
+        def submit(root, path):
+            pending[executor.submit(_scan, path)] = (root, path)
+
+        for root in roots:
+            submit(root, root)
+        try:
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                if should_stop and should_stop():
+                    raise PrefetchCancelled()
+                for fut in done:
+                    root, path = pending.pop(fut)
+                    try:
+                        pngs, subdirs = fut.result()
+                    except OSError as e:
+                        log.warning("Cannot scan %s: %s", path, e)
+                        continue
+                    rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+                    name = os.path.basename(path.rstrip("/\\"))
+                    if len(pngs) >= max(min_frames, 1) and (not include or _matches(include, rel_path, name)):
+                        pngs.sort()
+                        found[path] = pngs
+                    for sub in subdirs:
+                        sub_rel = os.path.relpath(sub, root).replace(os.sep, "/")
+                        if not _matches(exclude, sub_rel, os.path.basename(sub)):
+                            submit(root, sub)
+        except BaseException:
+            for fut in pending:
+                fut.cancel()
+            raise
+    return dict(sorted(found.items()))
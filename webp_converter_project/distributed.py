@@ -0,0 +1,407 @@
+"""Spread a batch over several machines: one coordinator, many workers.
+
+The coordinator holds the job queue and serves it over plain HTTP with JSON
+bodies; workers pull one folder at a time, read its frames from shared
+storage, encode it with their own ConversionEngine and post the result back.
+Frames never travel over the connection, so every node must see the input
+and output folders under the same paths. There is no authentication: run it
+on a trusted network only.
+
+    GET  /config                      -> {"engine": {...}, "heartbeat": s}
+    POST /lease     {worker}          -> {"job": {...}} | {"wait": s} | {"done": true}
+    POST /heartbeat {worker, job}     -> {"cancel": bool}
+    POST /result    {worker, job, result} -> {"accepted": bool}
+    GET  /status                      -> queue and per-worker counts
+
+A leased job has to be renewed by a heartbeat every `heartbeat` seconds.
+When a worker dies or loses its connection, its lease runs out after
+`lease_timeout` and the job goes back to the front of the queue; after
+`max_attempts` leases it is reported as failed instead. The first result
+for a job wins, and a worker whose lease was taken away is told to cancel
+on its next heartbeat. Several workers can run on one machine, which is
+also how the protocol is tested (cli.py --serve 0 --local-workers 3).
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import collections
+import urllib.error
+import urllib.request
+import http.client
+import http.server
+
+from engine import ConversionError, FolderResult
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_HEARTBEAT = 5.0
+# Heartbeats that may be missed before a lease runs out
+LEASE_HEARTBEATS = 4
+REQUEST_TIMEOUT = 30.0
+
+
+class _Lease:
+    def __init__(self, worker, deadline):
+        self.worker = worker
+        self.deadline = deadline
+        self.started = time.monotonic()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server_version = "webp-coordinator"
+    timeout = REQUEST_TIMEOUT
+
+    def do_GET(self):
+        coordinator = self.server.coordinator
+        routes = {"/config": coordinator.config, "/status": coordinator.status}
+        if self.path not in routes:
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        self._reply(200, routes[self.path]())
+
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            worker = str(body["worker"])
+            if self.path == "/lease":
+                reply = coordinator.lease(worker)
+            elif self.path == "/heartbeat":
+                reply = coordinator.renew(worker, body["job"])
+            elif self.path == "/result":
+                reply = coordinator.report(worker, body["job"], body["result"])
+            else:
+                return self._reply(404, {"error": f"unknown path {self.path}"})
+        except (ValueError, KeyError, TypeError) as e:
+            return self._reply(400, {"error": f"bad request: {e}"})
+        self._reply(200, reply)
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug("%s " + format, self.address_string(), *args)
+
+
+class Coordinator:
+    """Serve jobs to Workers and collect their FolderResults.
+
+    jobs are dicts with the arguments of one single-folder
+    ConversionEngine.convert call (id, folder, output_file, png_files, fps,
+    quality, loop), id being the job's index; engine_options is handed to
+    every worker to build its engine from. on_result(result, completed,
+    total) is called from the server threads as results come in.
+    """
+    def __init__(self, jobs, engine_options, host="", port=DEFAULT_PORT,
+                 heartbeat=DEFAULT_HEARTBEAT, lease_timeout=None, max_attempts=3, on_result=None):
+        self.jobs = list(jobs)
+        self.engine_options = engine_options
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.lease_timeout = lease_timeout or heartbeat * LEASE_HEARTBEATS
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        self.results = [None] * len(self.jobs)
+        self.workers = {}
+        self._pending = collections.deque(range(len(self.jobs)))
+        self._leases = {}
+        self._attempts = [0] * len(self.jobs)
+        self._completed = 0
+        self._cancelled = False
+        # Workers that were told there is nothing left to do
+        self._released = set()
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._server = None
+
+    @property
+    def url(self):
+        host = self.host if self.host not in ("", "0.0.0.0") else socket.gethostname()
+        return f"http://{host}:{self.port}"
+
+    @property
+    def local_url(self):
+        """The URL for workers on this machine."""
+        host = self.host if self.host not in ("", "0.0.0.0") else "127.0.0.1"
+        return f"http://{host}:{self.port}"
+
+    def start(self):
+        """Start serving (raises OSError if the port is taken). Port 0 picks a free port."""
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), _Handler)
+        # Handler threads are not daemons, so stop() lets replies in flight
+        # (the last "done" answers) finish before the process can exit
+        self._server.coordinator = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap, daemon=True).start()
+        log.info("Serving %d job(s) on %s", len(self.jobs), self.url)
+
+    def drain(self, timeout):
+        """Keep answering after the last result until every worker that is
+        still around has asked for a job and been told to quit, so none of
+        them is left retrying against a closed port."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while time.monotonic() < deadline:
+                now = time.time()
+                if all(name in self._released or now - stats["last_seen"] > self.lease_timeout
+                       for name, stats in self.workers.items()):
+                    return
+                self._cond.wait(min(self.heartbeat, max(deadline - time.monotonic(), 0)))
+
+    def stop(self):
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def wait(self, timeout=None):
+        """Block until every job has a result (or timeout) and return the
+        results in job order; unfinished jobs are None."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._completed == len(self.jobs), timeout)
+            return list(self.results)
+
+    def cancel(self):
+        """Stop handing out jobs and tell the workers to cancel running ones.
+        Queued jobs are reported as cancelled at once, running ones when their
+        workers report back or their leases run out."""
+        with self._cond:
+            self._cancelled = True
+            dropped = [self._finish(idx, self._result(idx, "cancelled")) for idx in self._pending]
+            self._pending.clear()
+        self._notify(dropped)
+
+    # Protocol handlers, called from the server threads
+
+    def config(self):
+        return {"engine": self.engine_options, "heartbeat": self.heartbeat}
+
+    def status(self):
+        # A snapshot: the handler serializes it after the lock is released
+        with self._cond:
+            return {
+                "total": len(self.jobs),
+                "completed": self._completed,
+                "pending": len(self._pending),
+                "running": {str(idx): lease.worker for idx, lease in self._leases.items()},
+                "cancelled": self._cancelled,
+                "workers": {name: dict(stats) for name, stats in self.workers.items()},
+            }
+
+    def lease(self, worker):
+        with self._cond:
+            self._seen(worker)
+            if self._cancelled or self._completed == len(self.jobs):
+                self._released.add(worker)
+                self._cond.notify_all()
+                return {"done": True}
+            if not self._pending:
+                # Everything is out; a lease may still run out and come back
+                return {"wait": self.heartbeat}
+            idx = self._pending.popleft()
+            self._attempts[idx] += 1
+            self._leases[idx] = _Lease(worker, time.monotonic() + self.lease_timeout)
+            log.debug("Leased job %d (%s) to %s", idx, self.jobs[idx]["folder"], worker)
+            return {"job": self.jobs[idx]}
+
+    def renew(self, worker, idx):
+        self._check_id(idx)
+        with self._cond:
+            self._seen(worker)
+            lease = self._leases.get(idx)
+            if lease is None or lease.worker != worker:
+                # Requeued after this worker went quiet, or already finished
+                return {"cancel": True}
+            lease.deadline = time.monotonic() + self.lease_timeout
+            return {"cancel": self._cancelled}
+
+    def report(self, worker, idx, data):
+        self._check_id(idx)
+        result = FolderResult.from_dict(data)
+        result.index = idx
+        result.node = worker
+        finished = []
+        with self._cond:
+            # Leases that ran out before this one count as attempts too
+            result.attempts += self._attempts[idx] - 1
+            self._seen(worker)
+            lease = self._leases.get(idx)
+            if self.results[idx] is not None or lease is None or lease.worker != worker:
+                log.debug("Ignoring late result for job %d from %s", idx, worker)
+                return {"accepted": False}
+            del self._leases[idx]
+            if result.status == "cancelled" and not self._cancelled:
+                # The worker was shut down; somebody else can take the job
+                finished = self._requeue(idx, f"{worker} cancelled the job")
+            else:
+                stats = self.workers[worker]
+                stats["jobs"] += 1
+                stats["frames"] += result.frames
+                stats["elapsed"] = round(stats["elapsed"] + result.elapsed, 3)
+                finished = [self._finish(idx, result)]
+        self._notify(finished)
+        return {"accepted": True}
+
+    # Internals; the underscore methods below expect self._cond to be held
+
+    def _check_id(self, idx):
+        if not isinstance(idx, int) or not 0 <= idx < len(self.jobs):
+            raise ValueError(f"no job {idx!r}")
+
+    def _seen(self, worker):
+        stats = self.workers.setdefault(worker, {"jobs": 0, "frames": 0, "elapsed": 0.0})
+        stats["last_seen"] = time.time()
+
+    def _result(self, idx, status, error=None, node=None):
+        job = self.jobs[idx]
+        return FolderResult(idx, job["folder"], job["output_file"], status, error=error,
+                            attempts=max(self._attempts[idx], 1), node=node)
+
+    def _finish(self, idx, result):
+        self.results[idx] = result
+        self._completed += 1
+        self._cond.notify_all()
+        return result, self._completed
+
+    def _requeue(self, idx, reason):
+        if self._cancelled:
+            return [self._finish(idx, self._result(idx, "cancelled"))]
+        if self._attempts[idx] >= self.max_attempts:
+            log.warning("Giving up on %s: %s", self.jobs[idx]["folder"], reason)
+            return [self._finish(idx, self._result(idx, "failed", error=reason))]
+        log.warning("Requeueing %s: %s", self.jobs[idx]["folder"], reason)
+        self._pending.appendleft(idx)
+        return []
+
+    def _notify(self, finished):
+        if self.on_result:
+            for result, completed in finished:
+                self.on_result(result, completed, len(self.jobs))
+
+    def _reap(self):
+        while not self._stopped.wait(self.heartbeat / 2):
+            finished = []
+            with self._cond:
+                now = time.monotonic()
+                for idx, lease in list(self._leases.items()):
+                    if lease.deadline < now:
+                        del self._leases[idx]
+                        finished += self._requeue(idx, f"no heartbeat from {lease.worker}")
+            self._notify(finished)
+
+
+class Worker:
+    """Pull jobs from a Coordinator until it runs out of them.
+
+    engine_factory(options) builds the ConversionEngine from the
+    coordinator's engine options; machine-specific settings (img2webp path,
+    cache, decode threads) are up to the factory.
+    """
+    def __init__(self, url, engine_factory, name=None, give_up=60.0):
+        self.url = url.rstrip("/")
+        self.engine_factory = engine_factory
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        # Seconds the coordinator may be unreachable before the worker quits
+        self.give_up = give_up
+        self.engine = None
+        self._stop = threading.Event()
+
+    def run(self):
+        """Work until the coordinator is done; returns the number of jobs run.
+        Raises OSError when the coordinator cannot be reached or refuses a request."""
+        config = self._call("/config")
+        self.engine = self.engine_factory(config["engine"])
+        heartbeat = config["heartbeat"]
+        count = 0
+        while not self._stop.is_set():
+            reply = self._call("/lease", {"worker": self.name})
+            if reply.get("done"):
+                break
+            job = reply.get("job")
+            if job is None:
+                self._stop.wait(reply.get("wait", heartbeat))
+                continue
+            result = self._run_job(job, heartbeat)
+            self._call("/result", {"worker": self.name, "job": job["id"], "result": result.to_dict()})
+            count += 1
+        return count
+
+    def stop(self):
+        """Cancel the running job (it is handed back to the coordinator) and quit."""
+        self._stop.set()
+        if self.engine:
+            self.engine.cancel()
+
+    def _run_job(self, job, heartbeat):
+        folder = job["folder"]
+        log.info("Converting %s", folder)
+        finished = threading.Event()
+
+        def beat():
+            while not finished.wait(heartbeat):
+                try:
+                    reply = self._request("/heartbeat", {"worker": self.name, "job": job["id"]})
+                except (OSError, http.client.HTTPException) as e:
+                    # Keep encoding; the lease survives a few missed heartbeats
+                    log.warning("Heartbeat failed: %s", e)
+                    continue
+                if reply.get("cancel"):
+                    log.info("Coordinator cancelled %s", folder)
+                    self.engine.cancel()
+                    return
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        try:
+            frame_lists = {folder: job["png_files"]} if job.get("png_files") is not None else None
+            return self.engine.convert([folder], job["output_file"], job["fps"], job["quality"],
+                                       folder_loops={folder: job["loop"]},
+                                       frame_lists=frame_lists)[0]
+        except ConversionError as e:
+            return FolderResult(job["id"], folder, job["output_file"], "failed", error=str(e))
+        except KeyboardInterrupt:
+            # Hand the job back straight away instead of waiting for the lease to run out
+            self.engine.cancel()
+            try:
+                self._request("/result", {"worker": self.name, "job": job["id"],
+                                          "result": FolderResult(job["id"], folder, job["output_file"],
+                                                                 "cancelled").to_dict()})
+            except (OSError, http.client.HTTPException):
+                pass
+            raise
+        finally:
+            finished.set()
+
+    def _request(self, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return json.loads(response.read())
+
+    def _call(self, path, payload=None):
+        """_request, retried with doubling delays while the coordinator is
+        unreachable; errors it answers with are not retried."""
+        deadline = time.monotonic() + self.give_up
+        delay = 0.5
+        while True:
+            try:
+                return self._request(path, payload)
+            except urllib.error.HTTPError:
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                if self._stop.is_set() or time.monotonic() + delay > deadline:
+                    raise ConnectionError(str(e)) from e
+                log.warning("Coordinator unreachable (%s), retrying in %.1fs", e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
@@ -0,0 +1,354 @@
+"""Pluggable animated WebP encoder backends.
+
+img2webp  - spawns the bundled img2webp binary (the original behaviour)
+pillow    - encodes in-process through Pillow's libwebp bindings, pulling
+            frames from a generator one at a time
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import logging
+import importlib.util
+
+# Pillow is imported by the pillow encoder on first use
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+from alpha import frame_loader
+from prefetch import (FramePrefetcher, PrefetchCancelled, DEFAULT_DECODE_WORKERS, DEFAULT_LOOKAHEAD,
+                      load_frame)
+from supervisor import CancelToken, ProcessSupervisor
+
+log = logging.getLogger(__name__)
+
+
+def default_img2webp_path():
+    # Prefer the binary bundled next to this file (img2webp.exe on Windows),
+    # then whatever img2webp is on PATH (render farm Linux boxes).
+    exe_name = "img2webp.exe" if os.name == "nt" else "img2webp"
+    bundled = os.path.join(os.path.dirname(os.path.abspath(__file__)), exe_name)
+    if os.path.isfile(bundled):
+        return bundled
+    return shutil.which("img2webp") or bundled
+
+
+IMG2WEBP_PATH = default_img2webp_path()
+
+# Only exists on Windows; keeps img2webp from flashing a console window.
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+# Windows caps a command line at 32767 characters; stay well below that.
+MAX_COMMAND_LINE = 30000
+
+
+class EncodeJob:
+    """Everything an encoder needs to produce one animated WebP.
+
+    durations holds the display time of each frame in milliseconds.
+    In-process encoders decode frames on decode_workers threads, keeping at
+    most lookahead decoded frames ahead of the encoder. kmin/kmax bound the
+    keyframe interval (None keeps libwebp's default) and mixed lets libwebp
+    choose lossy or lossless per frame, see analysis.py. resize
+    (resize.ResizeSpec) is applied as frames are decoded, which only
+    in-process encoders do; img2webp jobs must be given scaled frames.
+    clean_alpha (alpha.clean_frame) is applied the same way, before
+    resizing, and palette (palette.SharedPalette) after it. exact keeps the
+    colour of fully transparent pixels, which libwebp otherwise discards.
+    """
+    def __init__(self, folder_path, png_files, output_file, durations, quality, loop,
+                 decode_workers=DEFAULT_DECODE_WORKERS, lookahead=DEFAULT_LOOKAHEAD,
+                 kmin=None, kmax=None, mixed=False, resize=None, clean_alpha=False, exact=False,
+                 palette=None):
+        self.folder_path = folder_path
+        self.png_files = png_files
+        self.output_file = output_file
+        self.durations = durations
+        self.quality = quality
+        self.loop = loop
+        self.decode_workers = decode_workers
+        self.lookahead = lookahead
+        self.kmin = kmin
+        self.kmax = kmax
+        self.mixed = mixed
+        self.resize = resize
+        self.clean_alpha = clean_alpha
+        self.exact = exact
+        self.palette = palette
+
+    @property
+    def lossless(self):
+        return self.quality == 100
+
+    def frame_paths(self):
+        return [os.path.join(self.folder_path, f) for f in self.png_files]
+
+    def loader(self, resize=True):
+        """Decode function for this job's frames: clean_alpha, resize, then
+        palette. resize=False leaves out the resize and the palette (which
+        is built for the resized frames)."""
+        decode = frame_loader() if self.clean_alpha else load_frame
+        if not resize or not (self.resize or self.palette):
+            return decode
+
+        def load(path):
+            im = decode(path)
+            if self.resize:
+                im = self.resize.apply(im)
+            return self.palette.apply(im) if self.palette else im
+        return load
+
+    def iter_frames(self, should_stop=None):
+        """Decoded frames in sequence order, prefetched in the background."""
+        return iter(FramePrefetcher(self.frame_paths(), load=self.loader(), workers=self.decode_workers,
+                                    lookahead=self.lookahead, should_stop=should_stop))
+
+
+class Encoder:
+    name = None
+    # True when encoding runs in this process rather than a subprocess, so
+    # parallel trial encodes need a process pool (see autotune.py)
+    in_process = False
+
+    def available(self):
+        return True
+
+    def unavailable_reason(self):
+        return f"{self.name} encoder is not available"
+
+    def version(self):
+        """Identifies the encoder build, so cached outputs go stale on upgrade."""
+        return ""
+
+    def encode(self, job, should_stop=None, on_frame=None):
+        """Encode job.output_file; return True on success.
+
+        on_frame(count) is called as frames are handed to libwebp. should_stop
+        is normally a supervisor.CancelToken, which interrupts the encode as
+        soon as it is cancelled; a plain callable is only checked between steps.
+        """
+        raise NotImplementedError
+
+    def cancel(self):
+        pass
+
+
+class Img2WebpEncoder(Encoder):
+    name = "img2webp"
+
+    def __init__(self, img2webp_path=None):
+        self.img2webp_path = img2webp_path or IMG2WEBP_PATH
+        self.supervisor = ProcessSupervisor()
+        self._version = None
+
+    def available(self):
+        return os.path.isfile(self.img2webp_path)
+
+    def unavailable_reason(self):
+        return f"img2webp.exe not found:\n{self.img2webp_path}"
+
+    def version(self):
+        if self._version is None:
+            try:
+                out = subprocess.run([self.img2webp_path, "-version"], capture_output=True, text=True,
+                                     timeout=10, creationflags=CREATE_NO_WINDOW)
+                self._version = out.stdout.strip()
+            except (OSError, subprocess.SubprocessError):
+                self._version = ""
+        return self._version
+
+    def build_arguments(self, job, verbose=False):
+        args = ["-v"] if verbose else []
+        if job.lossless:
+            args += ["-lossless", "-q", "100"]
+        else:
+            args += ["-lossy", "-q", str(job.quality)]
+        if job.mixed:
+            args += ["-mixed"]
+        if job.exact:
+            args += ["-exact"]
+        if job.kmax is not None:
+            args += ["-kmin", str(job.kmin), "-kmax", str(job.kmax)]
+        for f, delay in zip(job.png_files, job.durations):
+            args += ["-d", str(delay), f]
+        args += ["-loop", "0" if job.loop else "1"]
+        args += ["-o", job.output_file]
+        return args
+
+    def encode(self, job, should_stop=None, on_frame=None):
+        should_stop = should_stop or (lambda: False)
+        # Always overwrite any old file
+        if os.path.isfile(job.output_file):
+            try:
+                os.remove(job.output_file)
+            except Exception:
+                pass
+        # With -v img2webp prints "Added frame #N ..." to stderr per frame
+        args = self.build_arguments(job, verbose=on_frame is not None)
+        args_file = tmp_output = None
+        # img2webp reads its arguments from a file when given a single
+        # argument, which sidesteps the OS command-line length limit for
+        # long sequences. The file is split on whitespace, so the output is
+        # written to a plain name next to the frames (the working directory)
+        # and moved into place afterwards; frame names with spaces, or a
+        # read-only frame folder, still mean the command line.
+        if (sum(len(a) + 1 for a in args) > MAX_COMMAND_LINE
+                and not any(c.isspace() for f in job.png_files for c in f)):
+            try:
+                fd, tmp_output = tempfile.mkstemp(suffix=".webp", prefix=".img2webp_", dir=job.folder_path)
+                os.close(fd)
+            except OSError as e:
+                log.warning("Cannot write to %s, passing arguments on the command line: %s", job.folder_path, e)
+        if tmp_output:
+            args[-1] = os.path.basename(tmp_output)
+            fd, args_file = tempfile.mkstemp(suffix=".txt", prefix="img2webp_args_")
+            with os.fdopen(fd, "w") as f:
+                f.write("\n".join(args))
+            command = [self.img2webp_path, args_file]
+        else:
+            command = [self.img2webp_path] + args
+
+        try:
+            if should_stop():
+                return False
+            process = self.supervisor.start(command, cwd=job.folder_path, creationflags=CREATE_NO_WINDOW,
+                                            stderr=subprocess.PIPE, text=True, errors="replace")
+            tail = []
+            reader = threading.Thread(target=self._read_stderr, args=(process, on_frame, tail), daemon=True)
+            reader.start()
+            try:
+                cancel = should_stop if isinstance(should_stop, CancelToken) else None
+                returncode = self.supervisor.wait(process, cancel)
+            finally:
+                reader.join()
+            if should_stop():
+                return False
+            if returncode != 0:
+                log.error("img2webp failed (%s): %s", returncode, "".join(tail).strip())
+                return False
+            if tmp_output:
+                shutil.move(tmp_output, job.output_file)
+            return True
+        except Exception as e:
+            log.error("run_img2webp error: %s", e)
+            return False
+        finally:
+            if args_file:
+                os.remove(args_file)
+            if tmp_output and os.path.exists(tmp_output):
+                os.remove(tmp_output)
+
+    @staticmethod
+    def _read_stderr(process, on_frame, tail):
+        for line in process.stderr:
+            if line.startswith("Added frame"):
+                if on_frame:
+                    on_frame(1)
+                continue
+            tail.append(line)
+            del tail[:-20]
+        process.stderr.close()
+
+    def cancel(self):
+        self.supervisor.terminate_all()
+
+
+def _count_frames(frames, on_frame):
+    # Pillow asks for the next frame once the previous one has been added
+    first = True
+    for frame in frames:
+        if not first:
+            on_frame(1)
+        first = False
+        yield frame
+
+
+class PillowEncoder(Encoder):
+    name = "pillow"
+    in_process = True
+
+    def __init__(self, method=4):
+        self.method = method
+
+    def available(self):
+        if not PIL_AVAILABLE:
+            return False
+        from PIL import features
+        return bool(features.check("webp"))
+
+    def unavailable_reason(self):
+        if not PIL_AVAILABLE:
+            return "The pillow encoder needs Pillow (pip install pillow)"
+        return "This Pillow build has no WebP support"
+
+    def version(self):
+        import PIL
+        from PIL import features
+        return f"{PIL.__version__}/{features.version('webp')}/m{self.method}"
+
+    def encode(self, job, should_stop=None, on_frame=None):
+        return self.encode_frames(job, job.iter_frames(should_stop), should_stop, on_frame)
+
+    def encode_frames(self, job, frames, should_stop=None, on_frame=None):
+        """Encode an iterable of PIL images (len(job.durations) of them)."""
+        should_stop = should_stop or (lambda: False)
+        if os.path.isfile(job.output_file):
+            try:
+                os.remove(job.output_file)
+            except Exception:
+                pass
+        if on_frame:
+            frames = _count_frames(frames, on_frame)
+        try:
+            from framestream import FrameStream
+            stream = FrameStream(frames, len(job.durations))
+            keyframes = {} if job.kmax is None else {"kmin": job.kmin, "kmax": job.kmax}
+            stream.save(
+                job.output_file,
+                format="WEBP",
+                save_all=True,
+                duration=list(job.durations),
+                loop=0 if job.loop else 1,
+                lossless=job.lossless,
+                quality=job.quality,
+                method=self.method,
+                allow_mixed=job.mixed,
+                **keyframes,
+            )
+            if on_frame:
+                on_frame(1)  # the last frame
+            return not should_stop()
+        except PrefetchCancelled:
+            self._discard(job.output_file)
+            return False
+        except Exception as e:
+            log.error("pillow encode error: %s", e)
+            self._discard(job.output_file)
+            return False
+
+    def _discard(self, output_file):
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+
+
+ENCODERS = {
+    Img2WebpEncoder.name: Img2WebpEncoder,
+    PillowEncoder.name: PillowEncoder,
+}
+
+
+def get_encoder(name="auto", img2webp_path=None):
+    """Build an encoder by name. "auto" prefers img2webp and falls back to
+    the in-process encoder when the binary is missing."""
+    if name == "auto":
+        encoder = Img2WebpEncoder(img2webp_path)
+        if encoder.available() or not PillowEncoder().available():
+            return encoder
+        return PillowEncoder()
+    if name == Img2WebpEncoder.name:
+        return Img2WebpEncoder(img2webp_path)
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown encoder: {name}")
+    return ENCODERS[name]()
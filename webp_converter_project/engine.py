@@ -0,0 +1,739 @@
+"""Headless PNG-sequence to animated WebP conversion engine.
+
+Nothing in here touches tkinter, so it can be driven from the GUI, from
+cli.py, or from any other script on a machine without a display. Optional
+stages that need NumPy (analysis.py, autotune.py) are imported only when
+they are switched on, which keeps a plain conversion quick to start.
+"""
+import os
+import time
+import shutil
+import logging
+import tempfile
+
+from archive import copy_frames, in_archive, listdir, strip_archive_suffix
+from dedupe import coalesce_frames
+from encoders import EncodeJob, get_encoder
+from prefetch import DEFAULT_DECODE_WORKERS, DEFAULT_LOOKAHEAD, PrefetchCancelled
+from journal import CANCELLED, DONE, FAILED, FINAL_STATES, QUEUED, RUNNING, job_key
+from progress import ProgressTracker
+from resize import scale_frames
+from riff import verify_webp
+from scheduler import JobScheduler, available_cpus, estimate_job, read_png_header
+from segments import encode_segments
+from staging import publish
+from supervisor import CancelToken
+from variants import encode_variants
+
+log = logging.getLogger(__name__)
+
+
+class ConversionError(Exception):
+    """Raised when a batch cannot be started (bad settings, missing img2webp...)."""
+
+
+def find_png_files(folder_path):
+    # Folders may also be archives or folders inside them, see archive.py
+    return sorted([f for f in listdir(folder_path) if f.lower().endswith(".png")])
+
+
+def output_file_for(folder_path, output_dir):
+    folder_name = strip_archive_suffix(os.path.basename(folder_path.rstrip("/\\")))
+    return os.path.join(output_dir, f"{folder_name}.webp")
+
+
+def output_files_for(folders, output_dir):
+    """output_file_for every folder, except that folders sharing a name
+    (shot010/v001, shot020/v001) are told apart by prefixing their parent
+    folders' names until the outputs differ (shot010_v001.webp)."""
+    parts = [[strip_archive_suffix(p) for p in os.path.normpath(os.path.abspath(f)).split(os.sep)]
+             for f in folders]
+    depth = [1] * len(folders)
+
+    def name(i):
+        return "_".join(p for p in parts[i][-depth[i]:] if p)
+
+    while True:
+        groups = {}
+        for i in range(len(folders)):
+            groups.setdefault(name(i).lower(), []).append(i)
+        grew = False
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            for i in group:
+                # Never prefix the drive or filesystem root
+                if depth[i] < len(parts[i]) - 1:
+                    depth[i] += 1
+                    grew = True
+        if not grew:
+            break
+    return [os.path.join(output_dir, f"{name(i)}.webp") for i in range(len(folders))]
+
+
+def plan_outputs(folders, output_path):
+    """The output file of every folder: with one folder output_path is the
+    .webp file itself (or a directory to put <folder>.webp in), with several
+    it must be an existing directory."""
+    if len(folders) > 1:
+        if not output_path or not os.path.isdir(output_path):
+            raise ConversionError("Please select an output folder for multi-folder mode.")
+        return output_files_for(folders, output_path)
+    if not output_path:
+        raise ConversionError("Please specify an output file.")
+    if os.path.isdir(output_path):
+        output_path = output_file_for(folders[0], output_path)
+    return [output_path]
+
+
+def parse_fps(fps):
+    try:
+        fps = int(fps)
+        if fps <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ConversionError("FPS must be a positive integer")
+    return fps
+
+
+def encoder_options(analysis, quality):
+    """Extra EncodeJob arguments derived from an analysis.SequenceAnalysis."""
+    return analysis.encoder_options(lossless=quality == 100) if analysis else {}
+
+
+class FolderResult:
+    """Outcome of converting one folder. status is one of
+    "done", "failed", "no_pngs" or "cancelled"."""
+    def __init__(self, index, folder, output_file, status, frames=0, elapsed=0.0, error=None,
+                 dropped_frames=0, cached=False, bytes_written=0, quality=None, resumed=False,
+                 attempts=1, outputs=None, node=None):
+        self.index = index
+        self.folder = folder
+        self.output_file = output_file
+        self.status = status
+        self.frames = frames
+        self.elapsed = elapsed
+        self.error = error
+        self.dropped_frames = dropped_frames
+        self.cached = cached
+        self.bytes_written = bytes_written
+        # Quality actually used; differs from the requested one when tuned
+        self.quality = quality
+        # Finished in an earlier, interrupted run of the batch (see journal.py)
+        self.resumed = resumed
+        self.attempts = attempts
+        # Every file written; more than one with output variants
+        self.outputs = outputs or [output_file]
+        # Worker that encoded the folder when run by a distributed.Coordinator
+        self.node = node
+
+    @property
+    def fps(self):
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def success(self):
+        return self.status == "done"
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "folder": self.folder,
+            "output_file": self.output_file,
+            "outputs": self.outputs,
+            "status": self.status,
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "cached": self.cached,
+            "bytes_written": self.bytes_written,
+            "quality": self.quality,
+            "resumed": self.resumed,
+            "attempts": self.attempts,
+            "elapsed": round(self.elapsed, 3),
+            "fps": round(self.fps, 2),
+            "error": self.error,
+            "node": self.node,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a result from to_dict(), e.g. one reported by a remote worker."""
+        return cls(data["index"], data["folder"], data["output_file"], data["status"],
+                   frames=data.get("frames", 0), elapsed=data.get("elapsed", 0.0),
+                   error=data.get("error"), dropped_frames=data.get("dropped_frames", 0),
+                   cached=data.get("cached", False), bytes_written=data.get("bytes_written", 0),
+                   quality=data.get("quality"), resumed=data.get("resumed", False),
+                   attempts=data.get("attempts", 1), outputs=data.get("outputs"),
+                   node=data.get("node"))
+
+    def __repr__(self):
+        return f"FolderResult({self.index}, {self.folder!r}, {self.status!r})"
+
+
+class ConversionEngine:
+    def __init__(self, encoder="auto", img2webp_path=None, max_workers=None, memory_budget=None,
+                 dedupe=False, dedupe_threshold=None, cache=None,
+                 decode_workers=DEFAULT_DECODE_WORKERS, lookahead=DEFAULT_LOOKAHEAD,
+                 target_size=None, target_ssim=None, analyze=False, resize=None, frame_cache=None,
+                 segments=1, verify=True, journal=None, retries=0, retry_delay=2.0, variants=None,
+                 clean_alpha=False, exact=False, palette=None, staging=None):
+        if isinstance(encoder, str):
+            encoder = get_encoder(encoder, img2webp_path=img2webp_path)
+        self.encoder = encoder
+        # Merge runs of duplicate frames; a threshold (0-255) also merges
+        # near-duplicates, see dedupe.coalesce_frames.
+        self.dedupe = dedupe
+        self.dedupe_threshold = dedupe_threshold
+        # cache.OutputCache; unchanged jobs are skipped or restored from it
+        self.cache = cache
+        # Per-job decode pipeline for in-process encoders, see prefetch.py
+        self.decode_workers = decode_workers
+        self.lookahead = lookahead
+        # Search for a quality per folder instead of using the requested one,
+        # see autotune.QualityTuner
+        self.target_size = target_size
+        self.target_ssim = target_ssim
+        self.tuner = None
+        if target_size is not None or target_ssim is not None:
+            from autotune import QualityTuner
+            try:
+                self.tuner = QualityTuner(self.encoder, target_size=target_size, target_ssim=target_ssim)
+            except RuntimeError as e:
+                raise ConversionError(str(e))
+        # Measure inter-frame changes to pick keyframe/mixed settings, see analysis.py
+        self.analyze = analyze
+        # resize.ResizeSpec applied to every frame; with a resize.ScaledFrameCache
+        # the scaled frames are kept for later runs
+        self.resize = resize
+        self.frame_cache = frame_cache
+        # Encode each sequence as this many parallel segments, see segments.py;
+        # "auto" shares the CPUs between the folders in the batch
+        self.segments = segments
+        self._job_segments = 1 if segments == "auto" else segments
+        # Check each written file's container against the job, see riff.verify_webp
+        self.verify = verify
+        # journal.JobJournal: finished jobs are skipped when a batch is re-run;
+        # failed jobs are retried up to `retries` times with doubling delays
+        self.journal = journal
+        self.retries = retries
+        self.retry_delay = retry_delay
+        # variants.OutputVariant list: each folder is decoded once and written
+        # once per variant instead of once. Variants are encoded side by side,
+        # so they are not also split into segments, and the output cache is
+        # not used for them.
+        self.variants = list(variants or [])
+        if self.variants and self.tuner:
+            raise ConversionError("A target size or SSIM cannot be combined with output variants")
+        # Drop unused alpha channels and blank the colour of fully transparent
+        # pixels before encoding, see alpha.py; exact keeps that colour (only
+        # img2webp can be told to), which makes clean_alpha a no-op there.
+        self.clean_alpha = clean_alpha
+        self.exact = exact
+        if exact and self.encoder.in_process:
+            raise ConversionError(f"The {self.encoder.name} encoder cannot keep the colour of "
+                                  "transparent pixels; use img2webp for exact output")
+        if clean_alpha:
+            from alpha import NUMPY_AVAILABLE
+            if not NUMPY_AVAILABLE:
+                raise ConversionError("Alpha clean-up needs numpy and Pillow (pip install numpy pillow)")
+        # Encode sequences whose frames fit 256 colours lossless, see
+        # palette.py; "lossy" also maps flat-colour sequences with too many
+        # colours (anti-aliasing) to one shared palette.
+        self.palette = palette
+        if palette:
+            from palette import NUMPY_AVAILABLE, PALETTE_MODES
+            if palette not in PALETTE_MODES:
+                raise ConversionError(f"Unknown palette mode: {palette}")
+            if not NUMPY_AVAILABLE:
+                raise ConversionError("Palette detection needs numpy and Pillow (pip install numpy pillow)")
+            if self.tuner:
+                raise ConversionError("A target size or SSIM cannot be combined with a shared palette")
+            if self.variants:
+                raise ConversionError("Output variants cannot be combined with a shared palette")
+        # staging.StagingArea: frames are copied to local scratch in bulk and
+        # outputs are written there, then moved into place when complete
+        self.staging = staging
+        self.scheduler = JobScheduler(max_workers=max_workers, memory_budget=memory_budget)
+        self._cancel = CancelToken()
+        self.tracker = ProgressTracker()
+
+    @property
+    def stop_conversion(self):
+        return self._cancel.cancelled
+
+    def cancel(self):
+        """Stop the running batch: queued jobs are skipped and running
+        encodes are interrupted straight away."""
+        self._cancel.cancel()
+        self.encoder.cancel()
+
+    def convert(self, folders, output_path, fps, quality, folder_loops=None, on_result=None,
+                on_progress=None, frame_lists=None):
+        """Convert every folder and return a list of FolderResult in folder order.
+
+        With one folder output_path is the target .webp file (or a directory
+        to put <folder>.webp in); with several it must be an existing
+        directory. on_result(result, completed, total) is called as each
+        folder finishes, on_progress(progress.ProgressEvent) from the worker
+        threads as frames are encoded. frame_lists maps folders to their
+        sorted PNG names when they are already known (see
+        discover.discover_sequences); other folders are listed here.
+        """
+        folders = list(folders)
+        folder_loops = folder_loops or {}
+        frame_lists = frame_lists or {}
+        quality = int(quality)
+        self._cancel = CancelToken()
+
+        if not self.encoder.available():
+            raise ConversionError(self.encoder.unavailable_reason())
+        fps = parse_fps(fps)
+        if not folders:
+            raise ConversionError("Please select at least one folder.")
+        if not 0 <= quality <= 100:
+            raise ConversionError("Quality must be between 0 and 100")
+
+        outputs = plan_outputs(folders, output_path)
+
+        total = len(folders)
+        results = [None] * total
+        completed = 0
+        self.tracker = ProgressTracker(on_progress)
+
+        def report(result):
+            nonlocal completed
+            results[result.index] = result
+            completed += 1
+            if on_result:
+                on_result(result, completed, total)
+
+        if self.segments == "auto":
+            self._job_segments = max(1, available_cpus() // total)
+        delay = int(1000 / fps)
+        jobs = []
+        estimates = []
+        for idx, folder_path in enumerate(folders):
+            try:
+                png_files = frame_lists.get(folder_path)
+                if png_files is None:
+                    png_files = find_png_files(folder_path)
+                loop = folder_loops.get(folder_path, True)
+                key = settings = None
+                if self.journal:
+                    settings = dict(self.job_settings(delay, quality, loop), frames=len(png_files))
+                    key = job_key(folder_path, outputs[idx], settings, png_files)
+            except OSError as e:
+                self.tracker.add_job(idx, folder_path, 0)
+                self.tracker.finish_job(idx, completed=False)
+                report(FolderResult(idx, folder_path, outputs[idx], "failed", error=str(e)))
+                continue
+            if self.journal:
+                if self.journal.is_done(key, self.primary_output(outputs[idx])):
+                    self.tracker.add_job(idx, folder_path, 0)
+                    self.tracker.finish_job(idx)
+                    record = self.journal.get(key)
+                    report(FolderResult(idx, folder_path, self.primary_output(outputs[idx]), "done",
+                                        frames=len(png_files),
+                                        bytes_written=record.get("total_bytes", record["bytes_written"]),
+                                        quality=record.get("quality"), resumed=True,
+                                        outputs=[v.output_file(outputs[idx]) for v in self.variants]))
+                    continue
+                self.journal.record(key, QUEUED, folder=os.path.abspath(folder_path),
+                                    output_file=os.path.abspath(outputs[idx]), settings=settings)
+            self.tracker.add_job(idx, folder_path, len(png_files))
+            jobs.append((idx, folder_path, png_files, outputs[idx], fps, quality, loop, key))
+            estimates.append(estimate_job(folder_path, png_files))
+
+        try:
+            for _, result in self.scheduler.run(lambda job: self.convert_folder(*job), jobs, estimates):
+                report(result)
+        finally:
+            if self.cache:
+                self.cache.flush()
+        return results
+
+    def job_settings(self, delay, quality, loop):
+        """Everything besides the frames that affects the output bytes."""
+        return {
+            "delay": delay,
+            "quality": quality,
+            "loop": loop,
+            "encoder": self.encoder.name,
+            "encoder_version": self.encoder.version(),
+            "dedupe": self.dedupe,
+            "dedupe_threshold": self.dedupe_threshold,
+            "target_size": self.target_size,
+            "target_ssim": self.target_ssim,
+            "analyze": self.analyze,
+            "resize": self.resize.to_dict() if self.resize else None,
+            "segments": self._job_segments,
+            "variants": [v.to_dict() for v in self.variants],
+            "clean_alpha": self.clean_alpha,
+            "exact": self.exact,
+            "palette": self.palette,
+        }
+
+    def primary_output(self, output_file):
+        """The file a job's success is judged by: the output itself, or the
+        first variant's output when there are variants."""
+        return self.variants[0].output_file(output_file) if self.variants else output_file
+
+    def convert_folder(self, idx, folder_path, png_files, output_file, fps, quality, loop,
+                       journal_key=None):
+        log.debug("STARTING: (idx=%d) %s", idx, folder_path)
+        if self.stop_conversion:
+            self.tracker.finish_job(idx, completed=False)
+            self._journal(journal_key, CANCELLED)
+            return FolderResult(idx, folder_path, output_file, "cancelled")
+        self.tracker.start_job(idx)
+        attempt = 1
+        while True:
+            self._journal(journal_key, RUNNING, attempt=attempt)
+            result = self._convert_folder(idx, folder_path, png_files, output_file, fps, quality, loop)
+            result.attempts = attempt
+            if result.status != "failed" or attempt > self.retries or self.stop_conversion:
+                break
+            delay = self.retry_delay * 2 ** (attempt - 1)
+            log.warning("%s failed (%s), retrying in %gs", folder_path, result.error, delay)
+            self._journal(journal_key, FAILED, attempt=attempt, error=result.error, retry_in=delay)
+            if self._wait(delay):
+                break
+            attempt += 1
+        if result.success:
+            try:
+                st = os.stat(result.output_file)
+                result.bytes_written = sum(os.path.getsize(p) for p in result.outputs)
+            except OSError:
+                pass
+            else:
+                # bytes_written/mtime_ns identify the primary output, see JobJournal.is_done
+                self._journal(journal_key, DONE, attempt=attempt, elapsed=round(result.elapsed, 3),
+                              bytes_written=st.st_size, mtime_ns=st.st_mtime_ns,
+                              total_bytes=result.bytes_written, quality=result.quality)
+        else:
+            self._journal(journal_key, result.status if result.status in FINAL_STATES else FAILED,
+                          attempt=attempt, error=result.error)
+        self.tracker.finish_job(idx, result.bytes_written, completed=result.success)
+        log.debug("FINISHED: (idx=%d, Success=%s)", idx, result.success)
+        return result
+
+    def _journal(self, key, state, **fields):
+        if self.journal and key:
+            self.journal.record(key, state, **fields)
+
+    def _wait(self, seconds):
+        """Sleep between retries; returns True if the batch was cancelled."""
+        return self._cancel.wait(seconds)
+
+    def _convert_folder(self, idx, folder_path, png_files, output_file, fps, quality, loop):
+        start = time.perf_counter()
+        if not png_files:
+            log.debug("NO PNGs: %s", os.path.basename(folder_path))
+            return FolderResult(idx, folder_path, output_file, "no_pngs")
+        delay = int(1000 / fps)
+        cache_key = None
+        if self.cache and not self.variants:
+            try:
+                cache_key = self.cache.job_key(folder_path, png_files, self.job_settings(delay, quality, loop))
+            except OSError as e:
+                log.warning("Cannot compute cache key for %s: %s", folder_path, e)
+            if cache_key and self.cache.lookup(cache_key, output_file):
+                return FolderResult(idx, folder_path, output_file, "done", frames=len(png_files),
+                                    elapsed=time.perf_counter() - start, cached=True,
+                                    quality=None if self.tuner or self.palette else quality)
+        durations = [delay] * len(png_files)
+        stage = pinned = None
+        scratch_dirs = []
+        try:
+            frames_dir, target = folder_path, output_file
+            if self.staging:
+                stage = self.staging.stage(folder_path, png_files, output_file, should_stop=self._cancel)
+                frames_dir, target = stage.frames_dir, stage.output_file
+            dropped = 0
+            if self.dedupe:
+                merged = coalesce_frames(frames_dir, png_files, durations, self.dedupe_threshold)
+                png_files, durations, dropped = merged.png_files, merged.durations, merged.dropped
+                log.debug("Dropped %d duplicate frames in %s", dropped, folder_path)
+                self.tracker.set_frames_total(idx, len(png_files))
+            if self.variants:
+                result = self._encode_variants(idx, folder_path, frames_dir, png_files, durations, delay,
+                                               target, quality, loop, dropped, start)
+            else:
+                source_dir, options = frames_dir, {"exact": self.exact}
+                if self.resize:
+                    frames_dir, scratch_dir = self._scaled_frames(source_dir, png_files)
+                    scratch_dirs.append(scratch_dir)
+                    if self.frame_cache:
+                        pinned = frames_dir
+                    if frames_dir == source_dir:
+                        options["resize"] = self.resize
+                if self.clean_alpha:
+                    frames_dir, scratch_dir, options["clean_alpha"] = self._prepare_alpha(frames_dir, png_files)
+                    scratch_dirs.append(scratch_dir)
+                if self.palette:
+                    frames_dir, scratch_dir, lossless = self._prepare_palette(frames_dir, png_files, options)
+                    scratch_dirs.append(scratch_dir)
+                    if lossless:
+                        if quality != 100:
+                            log.warning("%s: encoding lossless through a palette, quality %d is ignored",
+                                        folder_path, quality)
+                        quality = 100
+                if not self.encoder.in_process and in_archive(frames_dir):
+                    frames_dir, scratch_dir = self._extracted_frames(frames_dir, png_files)
+                    scratch_dirs.append(scratch_dir)
+                result = self._encode_sequence(idx, folder_path, frames_dir, png_files, durations, target,
+                                               quality, loop, options, dropped, start)
+            if stage:
+                self._publish(result, output_file)
+            if result.success and cache_key:
+                self.cache.store(cache_key, output_file)
+            return result
+        except PrefetchCancelled:
+            return FolderResult(idx, folder_path, output_file, "cancelled")
+        except (OSError, RuntimeError) as e:
+            return FolderResult(idx, folder_path, output_file, "failed", error=str(e))
+        except Exception as e:
+            # Bad archives, decompression bombs, odd pixel data...: fail this
+            # job, not the whole batch
+            log.exception("Unexpected error converting %s", folder_path)
+            return FolderResult(idx, folder_path, output_file, "failed", error=f"{type(e).__name__}: {e}")
+        finally:
+            for scratch_dir in filter(None, scratch_dirs):
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+            if pinned:
+                self.frame_cache.release(pinned)
+            if stage:
+                stage.release()
+
+    def _publish(self, result, output_file):
+        """Move a staged job's outputs into place (see staging.publish) and
+        point the result at them. Failed jobs publish nothing.
+
+        The copy to a share is the write most likely to be cut short, so
+        each published file is checked again where it landed; one that does
+        not match is removed and fails the job."""
+        finals = [v.output_file(output_file) for v in self.variants] if self.variants else [output_file]
+        if result.success:
+            errors = []
+            for local, final in zip(result.outputs, finals):
+                size = os.path.getsize(local)
+                publish(local, final)
+                problems = self._check_published(final, size)
+                if problems:
+                    errors.append(f"{os.path.basename(final)}: published file is damaged: " + "; ".join(problems))
+                    try:
+                        os.remove(final)
+                    except OSError:
+                        pass
+            if errors:
+                result.status = "failed"
+                result.error = "; ".join(errors)
+                log.error("%s: %s", output_file, result.error)
+        result.output_file, result.outputs = finals[0], finals
+
+    def _check_published(self, path, size):
+        try:
+            published = os.path.getsize(path)
+        except OSError as e:
+            return [str(e)]
+        if published != size:
+            return [f"{published} bytes, expected {size}"]
+        if not self.verify:
+            return []
+        try:
+            return verify_webp(path)
+        except OSError as e:
+            return [str(e)]
+
+    def _scaled_frames(self, folder_path, png_files):
+        """Return (frames_dir, scratch_dir): where the resized frames are and
+        the temporary folder to delete afterwards, if any. In-process encoders
+        without a frame cache resize while decoding, so get folder_path back."""
+        if self.frame_cache:
+            return self.frame_cache.scaled_folder(self.resize, folder_path, png_files, self._cancel), None
+        if self.encoder.in_process:
+            return folder_path, None
+        scratch_dir = tempfile.mkdtemp(prefix="webp_scaled_")
+        try:
+            scale_frames(self.resize, folder_path, png_files, scratch_dir, should_stop=self._cancel)
+        except BaseException:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            raise
+        return scratch_dir, scratch_dir
+
+    def _extracted_frames(self, frames_dir, png_files):
+        """Return (frames_dir, scratch_dir) with the frames of an archived
+        folder copied out for img2webp, which can only read files."""
+        scratch_dir = tempfile.mkdtemp(prefix="webp_extract_")
+        try:
+            copy_frames(frames_dir, png_files, scratch_dir, should_stop=self._cancel)
+        except BaseException:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            raise
+        return scratch_dir, scratch_dir
+
+    def _needs_alpha_cleanup(self, frames_dir, png_files):
+        """Whether the jobs should clean their frames (alpha.clean_frame).
+        In-process encoders do it while decoding, which costs next to
+        nothing. img2webp would need rewritten frames, so the sequence is
+        scanned first: libwebp already skips an alpha channel that is 255
+        everywhere, so only colour under transparent pixels is worth it.
+        Exact output is left alone."""
+        if self.encoder.in_process:
+            return True
+        if self.exact:
+            return False
+        from alpha import scan_alpha
+        report = scan_alpha(frames_dir, png_files, self.decode_workers, self.lookahead,
+                            should_stop=self._cancel)
+        log.debug("Alpha in %s: %s", frames_dir, report.to_dict())
+        return report.hidden_colour > 0
+
+    def _prepare_alpha(self, frames_dir, png_files):
+        """Return (frames_dir, scratch_dir, clean_alpha) for a job; for
+        img2webp cleaned frames are written to a scratch folder."""
+        from alpha import write_frames
+        clean = self._needs_alpha_cleanup(frames_dir, png_files)
+        if self.encoder.in_process or not clean:
+            return frames_dir, None, clean
+        scratch_dir = tempfile.mkdtemp(prefix="webp_alpha_")
+        try:
+            write_frames(frames_dir, png_files, scratch_dir, should_stop=self._cancel)
+        except BaseException:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            raise
+        return scratch_dir, scratch_dir, False
+
+    def _prepare_palette(self, frames_dir, png_files, options):
+        """Return (frames_dir, scratch_dir, lossless) for a job, see
+        palette.scan_palette. Frames that need a shared palette get it
+        through options["palette"] with in-process encoders; img2webp is
+        given indexed frames in a scratch folder."""
+        from palette import scan_palette, write_indexed_frames
+        probe = EncodeJob(frames_dir, png_files, None, [], 100, False, **options)
+        report = scan_palette(frames_dir, png_files, self.palette, load=probe.loader(),
+                              workers=self.decode_workers, lookahead=self.lookahead,
+                              should_stop=self._cancel)
+        log.debug("Palette for %s: %s", frames_dir, report.to_dict())
+        if not report.palette:
+            return frames_dir, None, report.fits
+        if self.encoder.in_process:
+            options["palette"] = report.palette
+            return frames_dir, None, True
+        scratch_dir = tempfile.mkdtemp(prefix="webp_palette_")
+        try:
+            write_indexed_frames(report.palette, frames_dir, png_files, scratch_dir, should_stop=self._cancel)
+        except BaseException:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            raise
+        return scratch_dir, scratch_dir, True
+
+    def _encode_sequence(self, idx, folder_path, frames_dir, png_files, durations, output_file,
+                         quality, loop, options, dropped, start):
+        analysis = None
+        if self.analyze:
+            from analysis import analyze_sequence
+            analysis = analyze_sequence(frames_dir, png_files, self.decode_workers, self.lookahead,
+                                        should_stop=self._cancel)
+        tuned = None
+        if self.tuner:
+            tuned = self.tuner.tune(frames_dir, png_files, durations, loop, analysis, options)
+            quality = tuned.quality
+        job = EncodeJob(frames_dir, png_files, output_file, durations, quality, loop,
+                        decode_workers=self.decode_workers, lookahead=self.lookahead,
+                        **options, **encoder_options(analysis, quality))
+        success = self._encode(idx, job)
+        # The sampled size is only an estimate; if the real file overshoots a
+        # target the trials said it would meet, step the quality down.
+        retries = 3 if tuned and self.target_size is not None and tuned.predicted_size <= self.target_size else 0
+        while (success and retries and job.quality > 0 and not self.stop_conversion
+               and os.path.getsize(output_file) > self.target_size):
+            log.debug("%s is over the target size at q%d, retrying", output_file, job.quality)
+            retries -= 1
+            quality = max(0, min(job.quality, 95) - 10)
+            job = EncodeJob(frames_dir, png_files, output_file, durations, quality, loop,
+                            decode_workers=self.decode_workers, lookahead=self.lookahead,
+                            **options, **encoder_options(analysis, quality))
+            success = self._encode(idx, job)
+        error = None
+        if success and self.verify:
+            problems = self.verify_output(job)
+            if problems:
+                success = False
+                error = "Output verification failed: " + "; ".join(problems)
+                log.error("%s: %s", output_file, error)
+        if success:
+            status = "done"
+        elif self.stop_conversion:
+            status = "cancelled"
+        else:
+            status = "failed"
+        return FolderResult(idx, folder_path, output_file, status, frames=len(png_files),
+                            elapsed=time.perf_counter() - start, error=error,
+                            dropped_frames=dropped, quality=job.quality)
+
+    def _encode_variants(self, idx, folder_path, frames_dir, png_files, durations, delay, output_file,
+                         quality, loop, dropped, start):
+        analysis = None
+        if self.analyze:
+            from analysis import analyze_sequence
+            analysis = analyze_sequence(frames_dir, png_files, self.decode_workers, self.lookahead,
+                                        should_stop=self._cancel)
+        clean_alpha = self.clean_alpha and self._needs_alpha_cleanup(frames_dir, png_files)
+        jobs = []
+        for variant in self.variants:
+            v_quality = quality if variant.quality is None else variant.quality
+            v_loop = loop if variant.loop is None else variant.loop
+            v_durations = durations
+            if variant.fps is not None:
+                # Merged duplicates last a whole number of frames
+                v_durations = [d // delay * int(1000 / variant.fps) for d in durations]
+            jobs.append(EncodeJob(frames_dir, png_files, variant.output_file(output_file), v_durations,
+                                  v_quality, v_loop, decode_workers=self.decode_workers,
+                                  lookahead=self.lookahead, resize=variant.resize or self.resize,
+                                  clean_alpha=clean_alpha, exact=self.exact,
+                                  **encoder_options(analysis, v_quality)))
+        self.tracker.set_frames_total(idx, len(png_files) * len(jobs))
+        on_frame = lambda n: self.tracker.frames_done(idx, n)
+        succeeded = encode_variants(self.encoder, jobs, self._cancel, on_frame)
+        errors = []
+        for job, success in zip(jobs, succeeded):
+            name = os.path.basename(job.output_file)
+            if not success:
+                errors.append(f"{name}: encode failed")
+            elif self.verify:
+                problems = self.verify_output(job)
+                if problems:
+                    errors.append(f"{name}: output verification failed: " + "; ".join(problems))
+        if not errors:
+            status = "done"
+        elif self.stop_conversion:
+            status = "cancelled"
+        else:
+            status = "failed"
+            log.error("%s: %s", folder_path, "; ".join(errors))
+        return FolderResult(idx, folder_path, jobs[0].output_file, status, frames=len(png_files),
+                            elapsed=time.perf_counter() - start,
+                            error="; ".join(errors) if status == "failed" else None,
+                            dropped_frames=dropped, quality=quality,
+                            outputs=[job.output_file for job in jobs])
+
+    def verify_output(self, job):
+        """Problems with job.output_file's canvas, timing or loop count."""
+        try:
+            size = read_png_header(job.frame_paths()[0])[:2]
+        except (OSError, ValueError):
+            size = (None, None)
+        if job.resize and size[0] is not None:
+            size = job.resize.target_size(size)
+        try:
+            return verify_webp(job.output_file, size[0], size[1], job.durations,
+                               loop_count=0 if job.loop else 1)
+        except OSError as e:
+            return [str(e)]
+
+    def _encode(self, idx, job):
+        on_frame = lambda n: self.tracker.frames_done(idx, n)
+        if self._job_segments > 1:
+            return encode_segments(self.encoder, job, self._job_segments, self._cancel, on_frame)
+        return self.encoder.encode(job, should_stop=self._cancel, on_frame=on_frame)
@@ -0,0 +1,43 @@
+"""Frame iterator adapter for Pillow's animated WebP writer.
+
+Kept apart from encoders.py so that Pillow is only imported once the pillow
+encoder actually encodes something.
+"""
+from PIL import Image
+
+
+class FrameStream(Image.Image):
+    """Presents a frame iterator to Pillow's WebP writer as one multi-frame
+    image. The writer walks it with seek(0..n-1), so only the frame being
+    encoded is ever held in memory. Needs Pillow 10.1+."""
+    def __init__(self, frames, n_frames):
+        super().__init__()
+        self._frames = iter(frames)
+        self.n_frames = n_frames
+        self.is_animated = n_frames > 1
+        self._adopt(next(self._frames))
+        self._index = 0
+
+    def _adopt(self, frame):
+        if frame.mode not in ("RGB", "RGBA"):
+            frame = frame.convert("RGBA" if frame.has_transparency_data else "RGB")
+        frame.load()
+        self.im = frame.im
+        self._size = frame.size
+        self._mode = frame.mode
+
+    def seek(self, frame):
+        if frame == self._index:
+            return
+        if frame < self._index:
+            # The writer seeks back to frame 0 once it is done; the
+            # stream cannot rewind and nothing needs the pixels any more.
+            self._index = frame
+            return
+        if frame != self._index + 1:
+            raise EOFError("frames can only be read in order")
+        self._adopt(next(self._frames))
+        self._index = frame
+
+    def tell(self):
+        return self._index
@@ -0,0 +1,788 @@
+import os
+import sys
+import queue
+import threading
+import traceback
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+from archive import in_archive, is_archive, strip_archive_suffix
+from cache import OutputCache, default_cache_dir
+from discover import discover_sequences
+from engine import ConversionEngine, ConversionError
+from journal import JobJournal
+from watch import WatchService
+
+myappid = 'ADGroup.RishWebpify.Converter.1'
+
+# --- TRY TO IMPORT tkinterdnd2 for drag and drop
+try:
+    from tkinterdnd2 import TkinterDnD, DND_FILES
+    DND_AVAILABLE = True
+except ImportError:
+    DND_AVAILABLE = False
+
+# How often the Tk thread applies updates queued by worker threads
+UI_POLL_MS = 50
+
+# Folder grid geometry
+CELL_H = 65
+CELL_PAD = 18
+MIN_CELL_W = 250
+MAX_NAME_LENGTH = 22
+
+
+class _FolderCell:
+    """The widgets of one grid cell. Cells are recycled while scrolling, so a
+    cell only knows which folder index it is showing right now."""
+    def __init__(self, owner):
+        self.owner = owner
+        self.index = None
+        self.folder = None
+        self.loop = None
+        canvas = owner.canvas
+        self.frame = tk.Frame(canvas, bg="#181818", height=CELL_H, width=MIN_CELL_W)
+        self.frame.grid_propagate(False)
+        self.frame.grid_columnconfigure(0, minsize=38, weight=0)
+        self.frame.grid_columnconfigure(1, weight=1, minsize=50)
+        self.frame.grid_columnconfigure(2, minsize=40, weight=0)
+        self.frame.grid_columnconfigure(3, minsize=10, weight=0)
+
+        icon_label = tk.Label(self.frame, text="📁", bg="#181818", fg="#FDB43B",
+                            font=("Segoe UI Emoji", 19), anchor="w")
+        icon_label.grid(row=0, column=0, rowspan=2, padx=(14, 12), pady=(10, 10), sticky="nw")
+
+        self.name_label = tk.Label(
+            self.frame, bg="#181818", fg="#ffffff",
+            font=("Helvetica", 12, "bold"), anchor="w"
+        )
+        self.name_label.grid(row=0, column=1, sticky="new", padx=(0,12), pady=(10,0))
+
+        self.path_label = tk.Label(
+            self.frame, bg="#181818", fg="#cccccc",
+            font=("Helvetica", 8), anchor="w"
+        )
+        self.path_label.grid(row=1, column=1, sticky="sw", padx=(0,12), pady=(0,16))
+
+        for label in (self.name_label, self.path_label):
+            label.bind("<Enter>", lambda e: owner._show_tooltip(self.index, e))
+            label.bind("<Leave>", lambda e: owner._hide_tooltip())
+
+        # --- CLOSE BUTTON ---
+        close_btn = tk.Label(self.frame, text="✕", fg="#d9534f", bg="#181818",
+                            font=("Helvetica", 13, "bold"), cursor="hand2")
+        close_btn.grid(row=0, column=2, sticky="ne", padx=(8,0), pady=(10,0))
+        close_btn.bind("<Button-1>", lambda e: owner.remove_folder(self.index))
+
+        # --- LOOP BUTTON ---
+        self.loop_btn = tk.Button(
+            self.frame,
+            bg="#181818",
+            activebackground="#222",
+            activeforeground="#8b06c4",
+            font=("Helvetica", 10, "bold"),
+            borderwidth=0,
+            relief="flat",
+            cursor="hand2",
+            command=lambda: owner.toggle_loop(self.index)
+        )
+        self.loop_btn.grid(row=1, column=2, sticky="ne", padx=(8,0), pady=(0,10))
+
+        self.window = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+
+    def show(self, index, folder, loop, x, y, width):
+        self.index = index
+        if folder != self.folder:
+            self.folder = folder
+            foldername = os.path.basename(folder)
+            shown_name = (foldername[:MAX_NAME_LENGTH - 2] + "…") if len(foldername) > MAX_NAME_LENGTH else foldername
+            path_display = folder
+            if len(path_display) > 44:
+                path_display = path_display[:17] + "…" + path_display[-24:]
+            self.name_label.config(text=shown_name)
+            self.path_label.config(text=path_display)
+        if loop != self.loop:
+            self.loop = loop
+            self.loop_btn.config(
+                text="➰ Loop" if loop else "〰 Loop",
+                fg="#8b06c4" if loop else "#aaaaaa"
+            )
+        self.frame.config(width=width)
+        canvas = self.owner.canvas
+        canvas.coords(self.window, x, y)
+        canvas.itemconfig(self.window, state="normal")
+
+    def hide(self):
+        self.index = None
+        self.owner.canvas.itemconfig(self.window, state="hidden")
+
+
+class FolderDropFrame(ttk.Frame):
+    """Responsive, scrollable drag-and-drop folders grid with canvas-drawn placeholder that never blocks drop.
+       Each folder includes a per-folder 'Loop' toggle.
+
+       The grid is virtual: only the rows in view have widgets, and those
+       cells are reused as the view scrolls, so adding, removing and
+       scrolling cost the same for ten folders as for ten thousand."""
+    def __init__(self, parent, on_folders_changed, post, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.on_folders_changed = on_folders_changed
+        self.post = post  # runs a callable on the Tk thread, see WebPConverterApp.post
+        self.folders = []
+        self._folder_set = set()  # O(1) duplicate checks on large drops
+        # PNG names found while discovering sequences, reused by the engine
+        self.frame_lists = {}
+        self.bg_color = "#1e1e1e"
+        self.folder_loops = {}  # Per-folder loop setting
+        self._cells = []
+        self._cols = 2
+        self._cell_w = MIN_CELL_W
+        self._yview = None
+        self._refresh_pending = False
+
+        # OUTER BOX
+        self.box_frame = ttk.Frame(self, style="TEntry")
+        self.box_frame.pack(fill="both", expand=True, padx=0, pady=(12, 0))
+        self.box_frame.grid_propagate(False)
+
+        # HEIGHT CONTROL (max 2.5 rows)
+        rows_visible = 2.5
+        max_height = int(rows_visible * CELL_H + (rows_visible - 1) * CELL_PAD)
+        self.canvas_frame = tk.Frame(self.box_frame, bg=self.bg_color, height=max_height)
+        self.canvas_frame.pack(fill="both", expand=False)
+        self.canvas_frame.pack_propagate(False)
+
+        # CANVAS & SCROLLBAR
+        self.canvas = tk.Canvas(
+            self.canvas_frame, bg=self.bg_color, highlightthickness=0, relief="flat"
+        )
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(0, 20))
+
+        style = ttk.Style()
+        style.element_create("Custom.Vertical.Scrollbar.trough", "from", "clam")
+        style.layout("Rish.Vertical.TScrollbar",
+            [('Vertical.Scrollbar.trough',
+                {'children': [('Vertical.Scrollbar.thumb', {'expand': '1', 'sticky': 'nswe'})],
+                 'sticky': 'ns'})])
+        style.configure("Rish.Vertical.TScrollbar",
+            troughcolor="#1e1e1e", background="#222", bordercolor="#181818",
+            lightcolor="#1e1e1e", darkcolor="#1e1e1e", arrowsize=10, gripcount=0, relief="flat",
+            borderwidth=0)
+        style.map("Rish.Vertical.TScrollbar",
+            background=[('active', "#444444"), ('!active', "#222")],
+            troughcolor=[('active', "#1e1e1e"), ('!active', "#1e1e1e")]
+        )
+        self.v_scroll = ttk.Scrollbar(
+            self.canvas_frame, orient="vertical", command=self.canvas.yview,
+            style="Rish.Vertical.TScrollbar"
+        )
+        self.canvas.configure(yscrollcommand=self._on_yview)
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+
+        # Drag & Drop events (canvas is target)
+        if DND_AVAILABLE:
+            self.canvas.drop_target_register(DND_FILES)
+            self.canvas.dnd_bind('<<Drop>>', self._on_drop)
+
+        # Tooltip (truncated names)
+        self.tooltip = tk.Toplevel(self)
+        self.tooltip.withdraw()
+        self.tooltip.overrideredirect(True)
+        self.canvas.bind_all("<Motion>", self._on_hover)
+        self.hover_idx = None
+
+        self.draw_folders()
+
+    def select_folders(self, event=None):
+        folder = filedialog.askdirectory(mustexist=True, title="Select Folder", parent=self)
+        if folder:
+            self.discover([folder])
+
+    def select_archives(self, event=None):
+        archives = filedialog.askopenfilenames(title="Select Archives", parent=self,
+                                               filetypes=[("ZIP/TAR archives", "*.zip *.tar")])
+        if archives:
+            self.discover(list(archives))
+
+    def _on_drop(self, event):
+        paths = self.winfo_toplevel().tk.splitlist(event.data)
+        folders = [p for p in paths if os.path.isdir(p) or is_archive(p)]
+        self.discover(folders)
+
+    def discover(self, roots):
+        """Add every PNG sequence folder under roots. The tree is walked on a
+        background thread so dropping a large render tree does not block."""
+        def run():
+            try:
+                found = discover_sequences(roots)
+            except OSError as e:
+                found = {}
+                self.post(messagebox.showerror, "Error", f"Cannot scan folders:\n{e}")
+            self.post(self.add_sequences, found)
+
+        if roots:
+            threading.Thread(target=run, daemon=True).start()
+
+    def add_sequences(self, found):
+        self.frame_lists.update(found)
+        self.add_folders(list(found))
+
+    def add_folders(self, folders):
+        added = False
+        for f in folders:
+            if f not in self._folder_set and (os.path.isdir(f) or in_archive(f)):
+                self._folder_set.add(f)
+                self.folders.append(f)
+                self.folder_loops[f] = False  # Default: Loop disabled
+                added = True
+        if added:
+            self.draw_folders()
+            self.on_folders_changed(self.folders)
+
+    def remove_folder(self, idx):
+        if idx is None:
+            return
+        self._hide_tooltip()
+        folder = self.folders.pop(idx)
+        self._folder_set.discard(folder)
+        self.folder_loops.pop(folder, None)
+        self.frame_lists.pop(folder, None)
+        self.draw_folders()
+        self.on_folders_changed(self.folders)
+
+    def clear(self):
+        self.folders.clear()
+        self._folder_set.clear()
+        self.frame_lists.clear()
+        self.folder_loops.clear()
+        self.draw_folders()
+        self.on_folders_changed(self.folders)
+
+    def toggle_loop(self, idx):
+        if idx is None:
+            return
+        folder = self.folders[idx]
+        self.folder_loops[folder] = not self.folder_loops.get(folder, False)
+        self._refresh_visible()
+
+    def draw_placeholder(self):
+        self.canvas.delete("placeholder")
+        self.canvas.update_idletasks()
+        w = self.canvas.winfo_width()
+        h = self.canvas.winfo_height()
+        text = "Drag & drop folders or ZIP/TAR archives here\nor click 'Add Folder(s)'"
+        self.canvas.create_text(
+            w // 2, h // 2,
+            text=text,
+            font=("Helvetica", 13, "italic"),
+            fill="#bbbbbb",
+            tags="placeholder",
+            justify="center"
+        )
+
+    def draw_folders(self):
+        """Recompute the grid geometry and scroll region, then fill the
+        visible rows. No per-folder widgets are created here."""
+        w = self.canvas.winfo_width() or 600
+        cols = 2
+        if w > 600:
+            cols = max(2, min(5, w // (MIN_CELL_W + CELL_PAD)))
+        self._cols = cols
+        self._cell_w = (w - (cols - 1) * CELL_PAD) // cols
+
+        self.canvas.delete("placeholder")
+        if not self.folders:
+            self.draw_placeholder()
+
+        rows = -(-len(self.folders) // cols)
+        height = max(0, rows * CELL_H + (rows - 1) * CELL_PAD)
+        self.canvas.config(scrollregion=(0, 0, w, height))
+        if height > self.canvas.winfo_height():
+            self.v_scroll.pack(side="right", fill="y", padx=(0, 0))
+        else:
+            self.v_scroll.pack_forget()
+            self.canvas.yview_moveto(0)
+        self._refresh_visible()
+
+    def _refresh_visible(self):
+        """Point the pooled cells at the folders in the visible rows."""
+        self._refresh_pending = False
+        row_h = CELL_H + CELL_PAD
+        top = self.canvas.canvasy(0)
+        bottom = top + max(self.canvas.winfo_height(), CELL_H)
+        first = int(top // row_h) * self._cols
+        last = min(len(self.folders), (int(bottom // row_h) + 1) * self._cols)
+        visible = range(first, last)
+
+        # Cells already showing a visible index keep it, the rest are reused
+        shown = {cell.index: cell for cell in self._cells if cell.index in visible}
+        free = [cell for cell in self._cells if shown.get(cell.index) is not cell]
+        for idx in visible:
+            cell = shown.get(idx)
+            if cell is None:
+                if not free:
+                    free.append(_FolderCell(self))
+                    self._cells.append(free[-1])
+                cell = free.pop()
+            folder = self.folders[idx]
+            row, col = divmod(idx, self._cols)
+            cell.show(idx, folder, self.folder_loops.get(folder, False),
+                      col * (self._cell_w + CELL_PAD), row * row_h, self._cell_w)
+        for cell in free:
+            cell.hide()
+
+    def _schedule_refresh(self):
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self._refresh_visible)
+
+    def get_folder_loops(self):
+        return {f: self.folder_loops.get(f, True) for f in self.folders}
+
+    def _on_yview(self, first, last):
+        self.v_scroll.set(first, last)
+        if (first, last) != self._yview:
+            self._yview = (first, last)
+            self._schedule_refresh()
+
+    def _on_canvas_configure(self, event):
+        self.draw_folders()
+
+    def _on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+
+    def _show_tooltip(self, idx, event):
+        if idx is None:
+            return
+        folder = self.folders[idx]
+        x = event.widget.winfo_rootx() + event.x + 18
+        y = event.widget.winfo_rooty() + event.y + 12
+        self.tooltip.geometry(f"+{x}+{y}")
+        self.tooltip.deiconify()
+        if hasattr(self, "_ttlabel"):
+            self._ttlabel.destroy()
+        self._ttlabel = tk.Label(self.tooltip, text=folder, background="#222", foreground="#fff", borderwidth=1, relief="solid", font=("Helvetica", 9))
+        self._ttlabel.pack()
+        self.hover_idx = idx
+
+    def _hide_tooltip(self, event=None):
+        self.tooltip.withdraw()
+        if hasattr(self, "_ttlabel"):
+            self._ttlabel.destroy()
+        self.hover_idx = None
+
+    def _on_hover(self, event):
+        if self.hover_idx is not None:
+            pass
+
+
+class WebPConverterApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("PNG to Animated WebP Converter")
+        self.root.geometry("700x500")
+        self.root.configure(bg="#1e1e1e")
+
+        style = ttk.Style()
+        style.theme_use("clam")
+        style.configure("TLabel", background="#1e1e1e", foreground="#ffffff", font=("Helvetica", 10))
+        style.configure("TButton", background="#2a2a2a", foreground="#ffffff", font=("Helvetica", 10), padding=6, relief="flat")
+        style.map("TButton", background=[("active", "#3c3c3c")])
+        style.configure("TCheckbutton", background="#1e1e1e", foreground="#ffffff", font=("Helvetica", 10))
+        style.configure("TEntry", fieldbackground="#2a2a2a", foreground="#ffffff", bordercolor="#2a2a2a", insertcolor="#ffffff", lightcolor="#2a2a2a",  relief="flat", padding=8, borderwidth=0)
+        style.configure("TSpinbox", arrowsize=15, fieldbackground="#2a2a2a", foreground="#ffffff", bordercolor="#2a2a2a",  lightcolor="#2a2a2a", relief="flat")
+        style.configure("Horizontal.TScale", background="#1e1e1e", troughcolor="#444444", bordercolor="#2a2a2a")
+        style.configure("Horizontal.TProgressbar", background="#4caf50", troughcolor="#1e1e1e", bordercolor="#2a2a2a")
+        style.configure("TFrame", background="#1e1e1e", bordercolor="#2a2a2a")
+        style.configure("Drop.TFrame", background="#1e1e1e")
+
+        self.stop_conversion = False
+        self.thread = None
+        self.engine = ConversionEngine(retries=2)
+        self.journal = None
+        # Worker threads never touch Tk; they queue callables for the Tk thread
+        self.ui_queue = queue.Queue()
+        self._latest_progress = None
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
+
+        self.center_frame = ttk.Frame(self.root, style="TFrame")
+        self.center_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+
+        header_frame = ttk.Frame(self.center_frame, style="TFrame")
+        header_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10, pady=(10, 0))
+        header_frame.grid_columnconfigure(0, weight=1)
+        ttk.Label(header_frame, text="Select PNG Folders:").grid(row=0, column=0, sticky="w")
+        self.folder_add_btn = ttk.Button(header_frame, text="Add Folder(s)", command=lambda: self.folder_drop.select_folders())
+        self.folder_add_btn.grid(row=0, column=1, sticky="e")
+        self.archive_add_btn = ttk.Button(header_frame, text="Add Archive(s)",
+                                          command=lambda: self.folder_drop.select_archives())
+        self.archive_add_btn.grid(row=0, column=2, sticky="e", padx=(8, 0))
+        self.watch_btn = ttk.Button(header_frame, text="Watch Folder…", command=self.toggle_watch)
+        self.watch_btn.grid(row=0, column=3, sticky="e", padx=(8, 0))
+        self.watch_service = None
+
+        self.folder_drop = FolderDropFrame(self.center_frame, on_folders_changed=self.on_folders_changed,
+                                           post=self.post)
+        self.folder_drop.grid(row=1, column=0, sticky="nsew", padx=(10, 5), pady=(5, 10), columnspan=2)
+        self.center_frame.grid_rowconfigure(1, minsize=170)
+        self.center_frame.grid_columnconfigure(0, weight=1)
+        self.center_frame.grid_columnconfigure(1, weight=0)
+
+        self.output_entry = ttk.Entry(self.center_frame)
+        self.output_entry.grid(row=3, column=0, sticky="ew", padx=(10, 5), pady=(5, 10))
+        self.browse_output_btn = ttk.Button(self.center_frame, text="Browse Output", command=self.browse_output)
+        self.browse_output_btn.grid(row=3, column=1, sticky="w", padx=(5, 10), pady=(5, 10))
+        self.output_entry.insert(0, "")
+
+        # --- FPS & Quality: now side by side in same row ---
+        fps_quality_frame = ttk.Frame(self.center_frame, style="TFrame")
+        fps_quality_frame.grid(row=4, column=0, columnspan=2, sticky="ew", padx=10, pady=(20, 20))
+        fps_quality_frame.columnconfigure(1, weight=1)
+        fps_quality_frame.columnconfigure(3, weight=1)
+
+        # FPS
+        ttk.Label(fps_quality_frame, text="FPS:").grid(row=0, column=0, padx=(0, 10), sticky="w")
+        self.fps_spinbox = ttk.Spinbox(fps_quality_frame, from_=1, to=60, width=5, justify="center")
+        self.fps_spinbox.set("25")
+        self.fps_spinbox.grid(row=0, column=1, padx=(0, 24), sticky="w")
+
+        # Quality
+        ttk.Label(fps_quality_frame, text="Quality (0=low, 100=lossless):").grid(row=0, column=2, padx=(0,10), sticky="w")
+        self.quality_value = tk.IntVar(value=100)
+        self.quality_slider = ttk.Scale(
+            fps_quality_frame,
+            from_=0,
+            to=100,
+            orient=tk.HORIZONTAL,
+            length=220,
+            command=lambda val: self.update_quality_entry(val)
+        )
+        self.quality_slider.set(self.quality_value.get())
+        self.quality_slider.grid(row=0, column=3, sticky="ew", padx=(0,8))
+        self.quality_entry = ttk.Entry(fps_quality_frame, textvariable=self.quality_value, width=5)
+        self.quality_entry.grid(row=0, column=4)
+        self.quality_entry.bind("<KeyRelease>", self.update_quality_slider)
+
+        self.dedupe_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(fps_quality_frame, text="Merge duplicate frames", variable=self.dedupe_var,
+                        style="TCheckbutton").grid(row=1, column=0, columnspan=3, sticky="w", pady=(10, 0))
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(fps_quality_frame, text="Skip folders finished by an interrupted run",
+                        variable=self.resume_var,
+                        style="TCheckbutton").grid(row=2, column=0, columnspan=5, sticky="w", pady=(4, 0))
+
+        self.button_frame = ttk.Frame(self.center_frame, style="TFrame")
+        self.button_frame.grid(row=6, column=0, columnspan=2, padx=5, pady=(1, 5), sticky="ew")
+        self.button_frame.columnconfigure(0, weight=1)
+        self.button_frame.columnconfigure(1, weight=1)
+        self.button_frame.columnconfigure(2, weight=4)
+        self.button_frame.rowconfigure(0, weight=1)
+        self.convert_btn = ttk.Button(self.button_frame, text="Convert", command=self.start_conversion)
+        self.convert_btn.grid(row=0, column=0, sticky="nsew", padx=5)
+        self.cancel_btn = ttk.Button(self.button_frame, text="Cancel", command=self.cancel_conversion, state="disabled")
+        self.cancel_btn.grid(row=0, column=1, sticky="nsew", padx=5)
+        self.progress_container = ttk.Frame(self.button_frame, style="TFrame")
+        self.progress_container.grid(row=0, column=2, sticky="nsew", padx=5)
+        self.progress_container.grid_propagate(True)
+        self.progress_container.columnconfigure(0, weight=1)
+        self.progress_container.rowconfigure(0, weight=1)
+        self.progress = ttk.Progressbar(
+            self.progress_container,
+            orient="horizontal",
+            mode="determinate",
+            style="Horizontal.TProgressbar"
+        )
+        self.progress.grid(row=0, column=0, sticky="nsew")
+        self.status_label = ttk.Label(
+            self.progress_container,
+            text="Ready",
+            background="",
+            foreground="#ffffff",
+            anchor="center"
+        )
+        self.status_label.place(relx=0.5, rely=0.5, anchor="center")
+        # Footer
+        footer_label = ttk.Label(
+            self.root,
+            text="Created by Rishab Kiran",
+            background="#1e1e1e",
+            foreground="#888888",
+            font=("Helvetica", 9),   
+        )
+        footer_label.place(relx=0.5, rely=1.0, anchor="s", y=-5)
+
+        self.on_folders_changed([])  # Set initial state
+
+    def on_folders_changed(self, folders):
+        if len(folders) == 1:
+            folder = folders[0]
+            folder_name = strip_archive_suffix(os.path.basename(folder.rstrip("/\\")))
+            parent_folder = os.path.dirname(folder.rstrip("/\\"))
+            default_output = os.path.join(parent_folder, f"{folder_name}.webp")
+            self.output_entry.configure(state="normal")
+            self.output_entry.delete(0, tk.END)
+            self.output_entry.insert(0, default_output)
+            self.browse_output_btn.config(text="Browse Output")
+        elif len(folders) > 1:
+            self.output_entry.configure(state="normal")
+            self.output_entry.delete(0, tk.END)
+            self.output_entry.configure(state="readonly")
+            self.browse_output_btn.config(text="Browse Output Folder")
+        else:
+            self.output_entry.configure(state="normal")
+            self.output_entry.delete(0, tk.END)
+            self.output_entry.insert(0, "")
+            self.browse_output_btn.config(text="Browse Output")
+
+    def update_quality_entry(self, val):
+        self.quality_value.set(int(float(val)))
+
+    def update_quality_slider(self, event):
+        try:
+            val = int(self.quality_entry.get())
+            if 0 <= val <= 100:
+                self.quality_slider.set(val)
+        except ValueError:
+            pass
+
+    def browse_output(self):
+        folders = self.folder_drop.folders
+        if len(folders) <= 1:
+            folder = folders[0] if folders else ""
+            if folder and (os.path.isdir(folder) or in_archive(folder)):
+                folder_name = strip_archive_suffix(os.path.basename(folder.rstrip("/\\")))
+                parent_folder = os.path.dirname(folder.rstrip("/\\"))
+                initialfile = f"{folder_name}.webp"
+                initialdir = parent_folder
+            else:
+                initialfile = "output.webp"
+                initialdir = os.getcwd()
+            file = filedialog.asksaveasfilename(
+                defaultextension=".webp",
+                filetypes=[("WebP files", "*.webp")],
+                initialfile=initialfile,
+                initialdir=initialdir
+            )
+            if file:
+                self.output_entry.configure(state="normal")
+                self.output_entry.delete(0, tk.END)
+                self.output_entry.insert(0, file)
+        else:
+            folder = filedialog.askdirectory(title="Select Output Folder")
+            if folder:
+                self.output_entry.configure(state="normal")
+                self.output_entry.delete(0, tk.END)
+                self.output_entry.insert(0, folder)
+                self.output_entry.configure(state="readonly")
+
+    def start_conversion(self):
+        if self.thread and self.thread.is_alive():
+            messagebox.showinfo("Info", "Conversion is already running.")
+            return
+        self.stop_conversion = False
+        self.convert_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.status_label.config(text="Starting...")
+        self.progress["value"] = 0
+        # Read the widgets here; the worker thread must not touch Tk
+        self.engine.dedupe = self.dedupe_var.get()
+        self.thread = threading.Thread(target=self.convert_to_webp, args=(
+            list(self.folder_drop.folders),
+            self.output_entry.get().strip(),
+            self.fps_spinbox.get(),
+            int(round(self.quality_slider.get())),
+            self.folder_drop.get_folder_loops(),
+            dict(self.folder_drop.frame_lists),
+            self.resume_var.get(),
+        ))
+        self.thread.start()
+
+    def cancel_conversion(self):
+        self.stop_conversion = True
+        self.status_label.config(text="Cancelling...")
+        self.engine.cancel()
+        if self.watch_service:
+            self.watch_service.engine.cancel()
+
+    def post(self, fn, *args):
+        """Run fn(*args) on the Tk thread; safe to call from any thread."""
+        self.ui_queue.put((fn, args))
+
+    def _drain_ui_queue(self):
+        while True:
+            try:
+                fn, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            fn(*args)
+        # Only the newest progress snapshot is worth drawing
+        event, self._latest_progress = self._latest_progress, None
+        if event is not None:
+            self.show_progress(event)
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
+
+    def convert_to_webp(self, folders, output_path, fps, quality, folder_loops, frame_lists, resume=False):
+        # Runs on the worker thread: every UI update goes through self.post
+        try:
+            self._run_conversion(folders, output_path, fps, quality, folder_loops, frame_lists, resume)
+        except Exception as e:
+            traceback.print_exc()
+            self.post(self.show_error, f"Unexpected error: {e}")
+        finally:
+            # Whatever happened, give the buttons back
+            self.post(self.finish_conversion)
+
+    def _run_conversion(self, folders, output_path, fps, quality, folder_loops, frame_lists, resume):
+        # Re-running a batch after a crash skips the folders already done
+        self.engine.journal = self.open_journal() if resume else None
+        total = len(folders)
+        multi = total > 1
+        failures = []
+
+        def on_result(result, completed, total):
+            if result.status == "no_pngs":
+                failures.append(f"({result.index+1}) No PNGs")
+            elif not result.success:
+                failures.append(f"({result.index+1}) Failed")
+
+        def on_progress(event):
+            self._latest_progress = event
+
+        self.post(self.status_label.config, {"text": f"Converting (0/{total})"})
+
+        try:
+            results = self.engine.convert(folders, output_path, fps, quality,
+                                          folder_loops=folder_loops, on_result=on_result,
+                                          on_progress=on_progress, frame_lists=frame_lists)
+        except ConversionError as e:
+            return self.post(self.show_error, str(e))
+
+        if multi:
+            if not self.stop_conversion:
+                self.post(self.show_done, total)
+                if failures:
+                    self.post(messagebox.showwarning, "Some folders failed",
+                              "Some folders failed to convert:\n" + "\n".join(failures))
+                else:
+                    self.post(messagebox.showinfo, "Success",
+                              f"Converted {total} folders to WebP!\nSaved in: {output_path}")
+        else:
+            result = results[0]
+            if result.success:
+                self.post(self.show_done, 1)
+                self.post(messagebox.showinfo, "Success", f"Animated WebP saved as:\n{result.output_file}")
+            elif result.status == "no_pngs":
+                self.post(self.show_error, "No PNG files found in the folder")
+            elif not self.stop_conversion:
+                self.post(self.show_error, "Conversion failed.")
+
+    def open_journal(self):
+        """The resume journal, opened on first use; None if it cannot be."""
+        if self.journal is None:
+            try:
+                os.makedirs(default_cache_dir(), exist_ok=True)
+                self.journal = JobJournal(os.path.join(default_cache_dir(), "journal.jsonl"))
+            except OSError:
+                pass
+        return self.journal
+
+    def toggle_watch(self):
+        if self.watch_service:
+            self.watch_service.stop()
+            self.watch_service.engine.cancel()
+            self.watch_service = None
+            self.watch_btn.config(text="Watch Folder…")
+            self.status_label.config(text="Stopped watching")
+            return
+        root_dir = filedialog.askdirectory(mustexist=True, title="Select Folder to Watch", parent=self.root)
+        if not root_dir:
+            return
+        output_path = self.output_entry.get().strip()
+        output_dir = output_path if output_path and os.path.isdir(output_path) else None
+        quality = int(round(self.quality_slider.get()))
+
+        def on_ready(folders):
+            self.post(self.folder_drop.add_folders, folders)
+            self.post(self.cancel_btn.config, {"state": "normal"})
+
+        def on_result(result, completed, total):
+            text = f"Watch: {os.path.basename(result.folder)} {result.status}"
+            self.post(self.status_label.config, {"text": text})
+            if completed == total:
+                self.post(self.finish_watch_batch)
+
+        # Like a batch: retried, cached so unchanged folders are not encoded
+        # again, and journaled when resuming is on
+        try:
+            cache = OutputCache()
+        except OSError:
+            cache = None
+        engine = ConversionEngine(dedupe=self.dedupe_var.get(), retries=2, cache=cache,
+                                  journal=self.open_journal() if self.resume_var.get() else None)
+        self.watch_service = WatchService(engine, [root_dir], output_dir, self.fps_spinbox.get(), quality,
+                                          on_ready=on_ready, on_result=on_result)
+        self.watch_service.start()
+        self.watch_btn.config(text="Stop Watching")
+        self.status_label.config(text=f"Watching {os.path.basename(root_dir)}")
+
+    def finish_watch_batch(self):
+        # Cancel stays live while a batch started by hand is still running
+        if not (self.thread and self.thread.is_alive()):
+            self.cancel_btn.config(state="disabled")
+
+    def show_progress(self, event):
+        # Real frame counts from the encoder, see progress.ProgressTracker
+        if self.stop_conversion or not self.convert_btn.instate(["disabled"]):
+            return
+        self.progress["value"] = event.percent
+        self.status_label.config(text=f"Converting {event.summary()}")
+
+    def show_done(self, count):
+        self.progress["value"] = 100
+        self.status_label.config(text=f"Done ({count})")
+
+    def show_error(self, msg):
+        messagebox.showerror("Error", msg)
+        self.status_label.config(text="Error")
+
+    def finish_conversion(self):
+        self.convert_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+        self.progress["value"] = 100 if not self.stop_conversion else 0
+        if not self.stop_conversion:
+            self.status_label.config(text="Done")
+        else:
+            self.status_label.config(text="Cancelled")
+
+def create_root_window():
+    if DND_AVAILABLE:
+        return TkinterDnD.Tk()
+    else:
+        return tk.Tk()
+
+
+def run():
+    if os.name == "nt":
+        # Own taskbar icon instead of python.exe's; Windows only
+        import ctypes
+        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
+
+    root = create_root_window()
+    root.withdraw()   # Hide window immediately
+
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    icon_path = os.path.join(base_path, "app_icon.ico")
+    try:
+        root.iconbitmap(icon_path)
+    except Exception:
+        pass
+
+    app = WebPConverterApp(root)
+    root.deiconify()  # Show window only after fully configured
+    root.mainloop()
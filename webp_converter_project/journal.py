@@ -0,0 +1,112 @@
+"""Durable, append-only record of batch jobs so an interrupted batch resumes.
+
+Every state change (queued, running, done, failed, cancelled) is appended to
+a JSON-lines file together with the job's folder, output, settings and
+timings. A job is identified by its folder, output file, settings and the
+size and mtime of every frame, so running the same batch again after a
+crash or reboot finds the jobs that already finished, and skips them as
+long as their output is still there unchanged. A re-rendered sequence is a
+new job. Finished states are fsync-ed; losing an unfinished record to a
+crash only means the job runs again.
+
+The file is compacted to the latest record per job when it is opened, and
+jobs that have not been touched for `max_age` seconds are dropped then.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+
+from archive import frame_signature
+
+log = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+def job_key(folder_path, output_file, settings, png_files=()):
+    h = hashlib.sha256()
+    h.update(os.path.abspath(folder_path).encode("utf-8") + b"\0")
+    h.update(os.path.abspath(output_file).encode("utf-8") + b"\0")
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for name in png_files:
+        h.update(f"{name}\0{frame_signature(os.path.join(folder_path, name))}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class JobJournal:
+    def __init__(self, path, max_age=30 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        lines = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                        key = record["key"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn last line after a crash
+                    latest = self._latest.setdefault(key, {})
+                    latest.update(record)
+        except FileNotFoundError:
+            return
+        cutoff = time.time() - self.max_age
+        stale = [k for k, r in self._latest.items() if r.get("time", 0) < cutoff]
+        for key in stale:
+            del self._latest[key]
+        if lines > len(self._latest):
+            self._compact()
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in self._latest.values():
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def record(self, key, state, **fields):
+        record = {"key": key, "state": state, "time": time.time(), **fields}
+        with self._lock:
+            self._latest.setdefault(key, {}).update(record)
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            if state in FINAL_STATES:
+                os.fsync(self._file.fileno())
+
+    def get(self, key):
+        with self._lock:
+            record = self._latest.get(key)
+            return dict(record) if record else None
+
+    def is_done(self, key, output_file):
+        """True if the job finished and its output is still what was written."""
+        record = self.get(key)
+        if not record or record.get("state") != DONE:
+            return False
+        try:
+            st = os.stat(output_file)
+        except OSError:
+            return False
+        return st.st_size == record.get("bytes_written") and st.st_mtime_ns == record.get("mtime_ns")
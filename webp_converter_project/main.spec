@@ -16,19 +16,18 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
+# One-folder build: a one-file exe unpacks the whole bundle into a temp
+# folder on every launch, which dominated startup time.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
     upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +36,13 @@ exe = EXE(
     entitlements_file=None,
     icon=['app_icon.ico'],
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='main',
+)
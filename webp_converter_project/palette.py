@@ -0,0 +1,235 @@
+"""Shared-palette detection and quantization for flat-colour sequences.
+
+UI captures and motion graphics often use only a few hundred colours across
+the whole animation, or a few flat colours plus anti-aliased edges. WebP's
+lossless mode stores a frame with at most 256 colours as palette indices,
+which is far smaller than lossy encoding of the same flat areas and faster
+to encode than full-colour lossless.
+
+scan_palette() streams over the frames once and builds a colour histogram
+of the whole sequence. Each frame is reduced to its runs of equal pixels
+before counting, which makes flat frames cheap, and the scan stops as soon
+as a sequence has too many colours to be worth it. From the histogram:
+
+* if every frame has at most 256 colours, libwebp already palettes each
+  frame itself and the sequence only needs to be encoded lossless (EXACT);
+* with LOSSY allowed, a sequence whose most common colours cover nearly
+  every pixel gets one SharedPalette of 256 colours: the frequent colours
+  are kept exactly and the rest (mostly anti-aliasing) share the remaining
+  entries. Every frame maps each colour to the same entry, so unchanged
+  areas stay identical from frame to frame. In-process encoders map frames
+  as they are decoded; img2webp is given indexed PNGs.
+
+Neither mode hands libwebp a palette: its animation API takes RGBA frames
+and the lossless encoder builds a colour table per frame from the pixels
+it is given. EXACT therefore builds no palette of its own and only checks
+that every frame is small enough for that; the shared palette of LOSSY
+works by limiting the colours each frame can contain, not by being written
+to the file. Both encode lossless, whatever quality was asked for.
+"""
+import os
+import importlib.util
+
+from prefetch import FramePrefetcher, load_frame
+from resize import scale_frames_multi
+
+NUMPY_AVAILABLE = (importlib.util.find_spec("numpy") is not None
+                   and importlib.util.find_spec("PIL") is not None)
+
+EXACT = "exact"
+LOSSY = "lossy"
+PALETTE_MODES = (EXACT, LOSSY)
+
+PALETTE_SIZE = 256
+# Distinct colours after which a sequence is not flat-colour content
+MAX_COLOURS = 1 << 16
+# Share of pixels the most common PALETTE_SIZE colours must cover for LOSSY
+LOSSY_COVERAGE = 0.97
+# Colours covering at least this share of the pixels are kept exactly
+KEEP_SHARE = 0.001
+# Pixels in the weighted sample the remaining palette entries are built from
+SAMPLE_PIXELS = 1 << 20
+
+
+def _rgba_pixels(im):
+    # RGBA pixels as little-endian uint32, one per pixel
+    import numpy as np
+    if im.mode != "RGBA":
+        im = im.convert("RGBA")
+    return np.asarray(im).view("<u4")[..., 0]
+
+
+def _frame_colours(im):
+    """(sorted colours, pixel counts) of one frame. Counting runs of equal
+    pixels instead of pixels keeps this cheap for flat frames."""
+    import numpy as np
+    flat = _rgba_pixels(im).ravel()
+    starts = np.flatnonzero(np.concatenate(([True], flat[1:] != flat[:-1])))
+    lengths = np.diff(np.append(starts, flat.size))
+    colours, inverse = np.unique(flat[starts], return_inverse=True)
+    return colours, np.bincount(inverse, weights=lengths).astype(np.int64)
+
+
+class ColourHistogram:
+    """Colour counts over a whole sequence, merged one frame at a time."""
+    def __init__(self, max_colours=MAX_COLOURS):
+        import numpy as np
+        self.max_colours = max_colours
+        self.colours = np.empty(0, np.uint32)
+        self.counts = np.empty(0, np.int64)
+        self.pixels = 0
+        self.frames = 0
+        # Most colours in any one frame
+        self.frame_colours = 0
+
+    @property
+    def overflow(self):
+        return len(self.colours) > self.max_colours
+
+    def add(self, colours, counts):
+        import numpy as np
+        merged, inverse = np.unique(np.concatenate((self.colours, colours)), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate((self.counts, counts)),
+                                  minlength=len(merged)).astype(np.int64)
+        self.colours = merged
+        self.pixels += int(counts.sum())
+        self.frames += 1
+        self.frame_colours = max(self.frame_colours, len(colours))
+
+    def coverage(self, n):
+        """Share of all pixels covered by the n most common colours."""
+        import numpy as np
+        if not self.pixels:
+            return 1.0
+        return float(np.sort(self.counts)[::-1][:n].sum()) / self.pixels
+
+
+class SharedPalette:
+    """Maps every colour of a sequence (colours, sorted uint32) to an entry
+    of entries (at most 256 uint32 RGBA colours) through indices."""
+    def __init__(self, colours, entries, indices):
+        self.colours = colours
+        self.entries = entries
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _indices(self, im):
+        import numpy as np
+        px = _rgba_pixels(im)
+        pos = np.minimum(np.searchsorted(self.colours, px), len(self.colours) - 1)
+        indices = self.indices[pos]
+        unknown = self.colours[pos] != px
+        if unknown.any():
+            # Colours the scan never saw (the frames changed since) get the nearest entry
+            new, inverse = np.unique(px[unknown], return_inverse=True)
+            indices[unknown] = _nearest(new, self.entries)[inverse]
+        return indices
+
+    def apply(self, im):
+        """im with every colour replaced by its palette entry (RGBA)."""
+        from PIL import Image
+        return Image.frombuffer("RGBA", im.size, self.entries[self._indices(im)], "raw", "RGBA", 0, 1)
+
+    def indexed(self, im):
+        """im as an indexed ("P") image using the shared palette."""
+        import numpy as np
+        from PIL import Image
+        out = Image.frombuffer("P", im.size, self._indices(im).astype(np.uint8), "raw", "P", 0, 1)
+        out.putpalette(self.entries.astype("<u4").tobytes(), "RGBA")
+        return out
+
+    def to_dict(self):
+        return {"colours": len(self.colours), "entries": len(self.entries)}
+
+
+class PaletteReport:
+    """What scan_palette() found. fits is True when the sequence should be
+    encoded lossless; palette is the SharedPalette its frames must be
+    mapped to first, or None when every frame fits 256 colours as it is."""
+    def __init__(self, frames, colours, frame_colours, palette=None):
+        self.frames = frames
+        # None when the scan stopped early because the sequence cannot fit
+        self.colours = colours
+        self.frame_colours = frame_colours
+        self.palette = palette
+
+    @property
+    def fits(self):
+        return self.palette is not None or (self.colours is not None
+                                            and self.frame_colours <= PALETTE_SIZE)
+
+    def to_dict(self):
+        return {"frames": self.frames, "colours": self.colours, "frame_colours": self.frame_colours,
+                "palette": self.palette.to_dict() if self.palette else None}
+
+
+def _nearest(colours, entries):
+    """Index of the nearest entry (squared RGBA distance) for each colour."""
+    import numpy as np
+    src = colours.view(np.uint8).reshape(-1, 4).astype(np.int32)
+    pal = entries.view(np.uint8).reshape(-1, 4).astype(np.int32)
+    out = np.empty(len(src), np.int64)
+    for start in range(0, len(src), 4096):
+        chunk = src[start:start + 4096]
+        out[start:start + 4096] = ((chunk[:, None, :] - pal[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return out
+
+
+def _quantize(colours, counts, n):
+    """Up to n entries for colours, weighted by their counts (octree)."""
+    import numpy as np
+    from PIL import Image
+    if len(colours) <= n:
+        return colours
+    reps = np.maximum(1, counts * SAMPLE_PIXELS // max(int(counts.sum()), 1))
+    sample = np.repeat(colours, reps)
+    im = Image.frombuffer("RGBA", (len(sample), 1), sample, "raw", "RGBA", 0, 1)
+    quantized = im.quantize(n, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    used = np.unique(np.asarray(quantized))
+    rgba = np.frombuffer(bytes(quantized.getpalette("RGBA")), np.uint8).reshape(-1, 4)
+    return rgba[used].copy().view("<u4")[:, 0]
+
+
+def build_palette(histogram):
+    """A SharedPalette for the histogram, or None if its most common
+    colours do not cover enough of the pixels."""
+    import numpy as np
+    if histogram.overflow or histogram.coverage(PALETTE_SIZE) < LOSSY_COVERAGE:
+        return None
+    colours, counts = histogram.colours, histogram.counts
+    order = np.argsort(counts)[::-1]
+    frequent = order[:PALETTE_SIZE // 2]
+    keep = frequent[counts[frequent] >= histogram.pixels * KEEP_SHARE]
+    rest = np.setdiff1d(order, keep)
+    entries = np.unique(np.concatenate((colours[keep],
+                                        _quantize(colours[rest], counts[rest], PALETTE_SIZE - len(keep)))))
+    return SharedPalette(colours, entries, _nearest(colours, entries))
+
+
+def scan_palette(folder_path, png_files, mode, load=None, workers=None, lookahead=None, should_stop=None):
+    """Return a PaletteReport for the sequence (frames decoded with load,
+    default prefetch.load_frame). mode is EXACT or LOSSY; with EXACT the
+    report only says whether every frame fits libwebp's own per-frame
+    palette, and report.palette stays None."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Palette detection needs numpy and Pillow (pip install numpy pillow)")
+    load = load or load_frame
+    histogram = ColourHistogram()
+    paths = [os.path.join(folder_path, f) for f in png_files]
+    for colours, counts in FramePrefetcher(paths, load=lambda path: _frame_colours(load(path)),
+                                           workers=workers, lookahead=lookahead, should_stop=should_stop):
+        histogram.add(colours, counts)
+        if histogram.overflow or (mode == EXACT and histogram.frame_colours > PALETTE_SIZE):
+            return PaletteReport(len(paths), None, histogram.frame_colours)
+    report = PaletteReport(len(paths), len(histogram.colours), histogram.frame_colours)
+    if mode == LOSSY and not report.fits:
+        report.palette = build_palette(histogram)
+    return report
+
+
+def write_indexed_frames(palette, folder_path, png_files, out_dir, workers=None, should_stop=None):
+    """Write every frame as an indexed PNG using the palette, for img2webp."""
+    scale_frames_multi([(None, out_dir)], folder_path, png_files, workers, should_stop,
+                       load=lambda path: palette.indexed(load_frame(path)))
@@ -0,0 +1,69 @@
+"""Parallel, order-preserving frame decoding with bounded look-ahead.
+
+PNG decoding (zlib inflate) releases the GIL, so a small thread pool keeps
+reading and decoding the next frames while the encoder works on the current
+one. At most `lookahead` decoded frames exist at any time: a new decode is
+only submitted when the consumer takes a frame, so memory stays flat no
+matter how long the sequence is.
+"""
+import collections
+import importlib.util
+import concurrent.futures
+
+from archive import open_frame
+
+# Pillow is only imported once a frame is decoded, so runs that never decode
+# in this process (img2webp) do not pay for importing it
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+DEFAULT_DECODE_WORKERS = 2
+DEFAULT_LOOKAHEAD = 8
+
+
+class PrefetchCancelled(Exception):
+    pass
+
+
+def load_frame(path):
+    """Decode a PNG into an RGB or RGBA image, fully loaded and closed."""
+    from PIL import Image
+    with open_frame(path) as f, Image.open(f) as im:
+        if im.mode not in ("RGB", "RGBA"):
+            return im.convert("RGBA" if im.has_transparency_data else "RGB")
+        im.load()
+        return im
+
+
+class FramePrefetcher:
+    def __init__(self, paths, load=None, workers=None, lookahead=None, should_stop=None):
+        self.paths = list(paths)
+        self.load = load or load_frame
+        self.workers = workers or DEFAULT_DECODE_WORKERS
+        self.lookahead = max(1, lookahead or DEFAULT_LOOKAHEAD)
+        self.should_stop = should_stop
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        window = collections.deque()
+        paths = iter(self.paths)
+        try:
+            for path in paths:
+                window.append(executor.submit(self.load, path))
+                if len(window) >= self.lookahead:
+                    break
+            while window:
+                if self.should_stop and self.should_stop():
+                    raise PrefetchCancelled()
+                frame = window.popleft().result()
+                for path in paths:
+                    window.append(executor.submit(self.load, path))
+                    break
+                yield frame
+        finally:
+            # Also runs when the consumer abandons the generator early
+            for fut in window:
+                fut.cancel()
+            executor.shutdown(wait=True)
@@ -0,0 +1,180 @@
+"""Per-frame progress and throughput telemetry for conversion batches.
+
+Encoders report every frame they hand to libwebp; the tracker turns that into
+frames done, bytes written, frames/sec and ETA per job and for the whole
+batch, and passes a ProgressEvent to the listener at most every
+`min_interval` seconds (plus once whenever a job starts or finishes).
+"""
+import time
+import threading
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class JobProgress:
+    def __init__(self, index, folder, frames_total):
+        self.index = index
+        self.folder = folder
+        self.frames_total = frames_total
+        self.frames_done = 0
+        self.bytes_written = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def fps(self):
+        elapsed = self.elapsed
+        return self.frames_done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        if self.finished:
+            return 0.0
+        fps = self.fps
+        if not fps:
+            return None
+        return max(0, self.frames_total - self.frames_done) / fps
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "folder": self.folder,
+            "frames_done": self.frames_done,
+            "frames_total": self.frames_total,
+            "bytes_written": self.bytes_written,
+            "fps": round(self.fps, 2),
+            "eta": None if self.eta is None else round(self.eta, 1),
+        }
+
+
+class ProgressEvent:
+    """Snapshot handed to the progress listener. job is the JobProgress
+    that changed; the other attributes describe the whole batch."""
+    def __init__(self, job, jobs_done, jobs_total, frames_done, frames_total,
+                 bytes_written, fps, eta):
+        self.job = job
+        self.jobs_done = jobs_done
+        self.jobs_total = jobs_total
+        self.frames_done = frames_done
+        self.frames_total = frames_total
+        self.bytes_written = bytes_written
+        self.fps = fps
+        self.eta = eta
+
+    @property
+    def percent(self):
+        if not self.frames_total:
+            return 100.0 * self.jobs_done / self.jobs_total if self.jobs_total else 0.0
+        return 100.0 * self.frames_done / self.frames_total
+
+    def summary(self):
+        return (f"({self.jobs_done}/{self.jobs_total}) {self.frames_done}/{self.frames_total} frames"
+                f" · {self.fps:.0f} fps · ETA {format_eta(self.eta)}")
+
+    def to_dict(self):
+        return {
+            "job": self.job.to_dict() if self.job else None,
+            "jobs_done": self.jobs_done,
+            "jobs_total": self.jobs_total,
+            "frames_done": self.frames_done,
+            "frames_total": self.frames_total,
+            "bytes_written": self.bytes_written,
+            "fps": round(self.fps, 2),
+            "eta": None if self.eta is None else round(self.eta, 1),
+        }
+
+
+class ProgressTracker:
+    def __init__(self, listener=None, min_interval=0.1):
+        self.listener = listener
+        self.min_interval = min_interval
+        self.jobs = {}
+        self.started = time.perf_counter()
+        # Batch totals are kept incrementally so an update stays O(1)
+        self._jobs_done = 0
+        self._frames_done = 0
+        self._frames_total = 0
+        self._bytes_written = 0
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+
+    def add_job(self, index, folder, frames_total):
+        with self._lock:
+            self.jobs[index] = JobProgress(index, folder, frames_total)
+            self._frames_total += frames_total
+
+    def start_job(self, index):
+        with self._lock:
+            job = self.jobs[index]
+            job.started = time.perf_counter()
+        self._emit(job, force=True)
+
+    def set_frames_total(self, index, frames_total):
+        with self._lock:
+            job = self.jobs[index]
+            self._frames_total += frames_total - job.frames_total
+            job.frames_total = frames_total
+
+    def frames_done(self, index, count=1):
+        with self._lock:
+            job = self.jobs[index]
+            self._add_frames(job, count)
+        self._emit(job)
+
+    def finish_job(self, index, bytes_written=0, completed=True):
+        with self._lock:
+            job = self.jobs[index]
+            if job.started is None:
+                job.started = time.perf_counter()
+            job.finished = time.perf_counter()
+            self._bytes_written += bytes_written - job.bytes_written
+            job.bytes_written = bytes_written
+            if completed:
+                self._add_frames(job, job.frames_total)
+            else:
+                # Whatever was left will never be encoded
+                self._frames_total -= job.frames_total - job.frames_done
+                job.frames_total = job.frames_done
+            self._jobs_done += 1
+        self._emit(job, force=True)
+
+    def _add_frames(self, job, count):
+        done = min(job.frames_total, job.frames_done + count)
+        self._frames_done += done - job.frames_done
+        job.frames_done = done
+
+    def snapshot(self, job=None):
+        with self._lock:
+            frames_done = self._frames_done
+            frames_total = self._frames_total
+            bytes_written = self._bytes_written
+            jobs_done = self._jobs_done
+            jobs_total = len(self.jobs)
+        elapsed = time.perf_counter() - self.started
+        fps = frames_done / elapsed if elapsed > 0 else 0.0
+        eta = (frames_total - frames_done) / fps if fps else None
+        return ProgressEvent(job, jobs_done, jobs_total, frames_done, frames_total,
+                             bytes_written, fps, eta)
+
+    def _emit(self, job, force=False):
+        if not self.listener:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now
+        self.listener(self.snapshot(job))
@@ -0,0 +1,195 @@
+"""Optional downscale stage applied to every frame before encoding.
+
+In-process encoders resize each frame on the decode threads right after it
+is read, so nothing extra touches the disk. img2webp reads frames from disk
+itself, so for it the scaled frames are written once, in parallel, either
+into a temporary folder that is removed after the job or into a
+ScaledFrameCache, where a later run with the same frames and resize settings
+finds them ready and skips the scaling entirely.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import collections
+import importlib.util
+import threading
+import concurrent.futures
+
+from archive import frame_signature
+from prefetch import PrefetchCancelled, load_frame
+from scheduler import available_cpus
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+# Names of PIL.Image.Resampling members; Pillow is imported on first resize
+FILTERS = ("nearest", "box", "bilinear", "hamming", "bicubic", "lanczos")
+
+log = logging.getLogger(__name__)
+
+COMPLETE_MARKER = ".complete"
+
+
+class ResizeSpec:
+    """max_width/max_height only ever shrink (keeping the aspect ratio);
+    scale multiplies both sides first."""
+    def __init__(self, max_width=None, max_height=None, scale=None, resample="lanczos"):
+        if not PIL_AVAILABLE:
+            raise RuntimeError("Resizing needs Pillow (pip install pillow)")
+        if resample not in FILTERS:
+            raise ValueError(f"Unknown resampling filter {resample!r}")
+        if scale is not None and scale <= 0:
+            raise ValueError("Scale must be positive")
+        self.max_width = max_width
+        self.max_height = max_height
+        self.scale = scale
+        self.resample = resample
+
+    def target_size(self, size):
+        width, height = size
+        factor = self.scale or 1.0
+        if self.max_width and width * factor > self.max_width:
+            factor = self.max_width / width
+        if self.max_height and height * factor > self.max_height:
+            factor = self.max_height / height
+        return max(1, round(width * factor)), max(1, round(height * factor))
+
+    def apply(self, im):
+        size = self.target_size(im.size)
+        if size == im.size:
+            return im
+        from PIL import Image
+        return im.resize(size, Image.Resampling[self.resample.upper()])
+
+    def load(self, path):
+        """Decode and resize one frame; a drop-in for prefetch.load_frame."""
+        return self.apply(load_frame(path))
+
+    def to_dict(self):
+        return {"max_width": self.max_width, "max_height": self.max_height,
+                "scale": self.scale, "resample": self.resample}
+
+
+def scale_frames(spec, folder_path, png_files, out_dir, workers=None, should_stop=None):
+    """Write a resized copy of every frame into out_dir, several at a time."""
+    scale_frames_multi([(spec, out_dir)], folder_path, png_files, workers, should_stop)
+
+
+def scale_frames_multi(targets, folder_path, png_files, workers=None, should_stop=None, load=None):
+    """scale_frames for several (spec, out_dir) targets at once, decoding
+    each source frame only once (with load, default prefetch.load_frame).
+    A spec of None writes the frame unscaled."""
+    load = load or load_frame
+    for _, out_dir in targets:
+        os.makedirs(out_dir, exist_ok=True)
+
+    def scale_one(name):
+        if should_stop and should_stop():
+            raise PrefetchCancelled()
+        im = load(os.path.join(folder_path, name))
+        for spec, out_dir in targets:
+            # These are read back once or twice; favour speed over size
+            (spec.apply(im) if spec else im).save(os.path.join(out_dir, name), format="PNG",
+                                                  compress_level=1)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or available_cpus()) as executor:
+        futures = [executor.submit(scale_one, name) for name in png_files]
+        try:
+            for fut in concurrent.futures.as_completed(futures):
+                fut.result()
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
+
+
+class ScaledFrameCache:
+    """Resized sequences kept on disk under cache_dir/<key>/, keyed on the
+    source frames (names, sizes, mtimes) and the resize settings. Whole
+    sequences are evicted least-recently-used once past max_bytes.
+
+    scaled_folder() pins the folder it returns until release() is called
+    with it, so jobs running side by side never evict each other's frames.
+    Pins only cover this process; other processes sharing cache_dir are
+    protected by the LRU order alone, as a folder is touched when pinned."""
+    def __init__(self, cache_dir, max_bytes=8 * 1024 ** 3, workers=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pins = collections.Counter()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, spec, folder_path, png_files):
+        h = hashlib.sha256()
+        h.update(json.dumps(spec.to_dict(), sort_keys=True).encode("utf-8"))
+        for name in png_files:
+            h.update(f"{name}\0{frame_signature(os.path.join(folder_path, name))}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def scaled_folder(self, spec, folder_path, png_files, should_stop=None):
+        """Return a folder holding png_files resized by spec, scaling only
+        on a miss. The folder stays pinned until release()d."""
+        out_dir = os.path.join(self.cache_dir, self.key(spec, folder_path, png_files))
+        marker = os.path.join(out_dir, COMPLETE_MARKER)
+        with self._lock:
+            self._pins[out_dir] += 1
+            if os.path.isfile(marker):
+                try:
+                    os.utime(marker)  # LRU bookkeeping
+                except OSError:
+                    pass
+                return out_dir
+        tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(out_dir) + ".", suffix=".tmp", dir=self.cache_dir)
+        try:
+            scale_frames(spec, folder_path, png_files, tmp_dir, self.workers, should_stop)
+            size = sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in png_files)
+            with open(os.path.join(tmp_dir, COMPLETE_MARKER), "w", encoding="utf-8") as f:
+                json.dump({"bytes": size}, f)
+            with self._lock:
+                # Another job may have scaled the same frames meanwhile
+                if not os.path.isfile(marker):
+                    shutil.rmtree(out_dir, ignore_errors=True)
+                    os.replace(tmp_dir, out_dir)
+        except BaseException:
+            self.release(out_dir)
+            raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+        return out_dir
+
+    def release(self, out_dir):
+        """Unpin a folder returned by scaled_folder()."""
+        with self._lock:
+            self._pins[out_dir] -= 1
+            if self._pins[out_dir] <= 0:
+                del self._pins[out_dir]
+
+    def evict(self):
+        """Delete least-recently-used unpinned sequences until under max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".tmp"):
+                        continue  # still being scaled
+                    marker = os.path.join(entry.path, COMPLETE_MARKER)
+                    try:
+                        with open(marker, "r", encoding="utf-8") as f:
+                            size = json.load(f)["bytes"]
+                        mtime = os.stat(marker).st_mtime
+                    except (OSError, ValueError, KeyError):
+                        continue
+                    entries.append((mtime, size, entry.path))
+                    total += size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if path in self._pins:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
@@ -0,0 +1,275 @@
+"""Minimal reader/writer for the animated WebP RIFF container.
+
+Only the container is touched: frame bitstreams are copied byte for byte,
+so animations can be cut, joined or inspected without re-encoding, and a
+written file can be verified from its chunk headers alone. See
+https://developers.google.com/speed/webp/docs/riff_container for the layout.
+"""
+import os
+import struct
+
+# VP8X feature flags
+FLAG_ICC = 0x20
+FLAG_ALPHA = 0x10
+FLAG_EXIF = 0x08
+FLAG_XMP = 0x04
+FLAG_ANIMATION = 0x02
+
+# ANMF flag bits
+ANMF_NO_BLEND = 0x02
+ANMF_DISPOSE_BACKGROUND = 0x01
+
+
+class RiffError(ValueError):
+    pass
+
+
+def _u24(data, offset):
+    return data[offset] | data[offset + 1] << 8 | data[offset + 2] << 16
+
+
+def _pack_u24(value):
+    if not 0 <= value < 1 << 24:
+        raise RiffError(f"Value does not fit in 24 bits: {value}")
+    return struct.pack("<I", value)[:3]
+
+
+def iter_chunks(data, offset=12, end=None):
+    """Yield (fourcc, payload) for each chunk in data[offset:end]. payload is
+    a slice of data, so a memoryview or mmap keeps this copy-free."""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        fourcc = bytes(data[offset:offset + 4])
+        size = struct.unpack_from("<I", data, offset + 4)[0]
+        start = offset + 8
+        if start + size > end:
+            raise RiffError(f"Chunk {fourcc!r} runs past the end of the file")
+        yield fourcc, data[start:start + size]
+        offset = start + size + (size & 1)
+
+
+def check_header(data):
+    """Validate the RIFF/WEBP header and return the RIFF payload end offset."""
+    if len(data) < 12 or bytes(data[0:4]) != b"RIFF" or bytes(data[8:12]) != b"WEBP":
+        raise RiffError("Not a WebP file")
+    riff_size = struct.unpack_from("<I", data, 4)[0]
+    if riff_size + 8 > len(data):
+        raise RiffError("File is truncated")
+    return riff_size + 8
+
+
+class AnimationFrame:
+    """One ANMF chunk: its placement, timing and flags plus the raw frame
+    data (ALPH/VP8/VP8L sub-chunks), which is never decoded."""
+    def __init__(self, x, y, width, height, duration, flags, data):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.duration = duration
+        self.flags = flags
+        self.data = data
+
+    @classmethod
+    def parse(cls, payload):
+        if len(payload) < 16:
+            raise RiffError("ANMF chunk is too short")
+        return cls(_u24(payload, 0) * 2, _u24(payload, 3) * 2,
+                   _u24(payload, 6) + 1, _u24(payload, 9) + 1,
+                   _u24(payload, 12), payload[15], payload[16:])
+
+    @property
+    def blend(self):
+        return not self.flags & ANMF_NO_BLEND
+
+    @property
+    def dispose(self):
+        return bool(self.flags & ANMF_DISPOSE_BACKGROUND)
+
+    def covers(self, width, height):
+        return self.x == 0 and self.y == 0 and self.width == width and self.height == height
+
+    def payload_size(self):
+        return 16 + len(self.data)
+
+    def header(self):
+        return (_pack_u24(self.x // 2) + _pack_u24(self.y // 2)
+                + _pack_u24(self.width - 1) + _pack_u24(self.height - 1)
+                + _pack_u24(self.duration) + bytes([self.flags & 0x03]))
+
+
+class Animation:
+    """An animated WebP: canvas, loop count, frames and any metadata chunks
+    (ICCP before the frames, EXIF/XMP after them)."""
+    def __init__(self, width, height, flags=FLAG_ANIMATION, background=0, loop_count=0,
+                 frames=None, pre_chunks=None, post_chunks=None):
+        self.width = width
+        self.height = height
+        self.flags = flags
+        self.background = background
+        self.loop_count = loop_count
+        self.frames = frames if frames is not None else []
+        self.pre_chunks = pre_chunks if pre_chunks is not None else []
+        self.post_chunks = post_chunks if post_chunks is not None else []
+
+    @classmethod
+    def parse(cls, data):
+        end = check_header(data)
+        chunks = iter_chunks(data, 12, end)
+        fourcc, vp8x = next(chunks, (None, None))
+        if fourcc != b"VP8X" or len(vp8x) < 10:
+            raise RiffError("Not an animated WebP (no VP8X chunk)")
+        anim = cls(_u24(vp8x, 4) + 1, _u24(vp8x, 7) + 1, flags=vp8x[0])
+        if not anim.flags & FLAG_ANIMATION:
+            raise RiffError("Not an animated WebP (still image)")
+        seen_anim = False
+        for fourcc, payload in chunks:
+            if fourcc == b"ANIM":
+                if len(payload) < 6:
+                    raise RiffError("ANIM chunk is too short")
+                anim.background = struct.unpack_from("<I", payload, 0)[0]
+                anim.loop_count = struct.unpack_from("<H", payload, 4)[0]
+                seen_anim = True
+            elif fourcc == b"ANMF":
+                anim.frames.append(AnimationFrame.parse(payload))
+            elif anim.frames:
+                anim.post_chunks.append((fourcc, payload))
+            else:
+                anim.pre_chunks.append((fourcc, payload))
+        if not seen_anim:
+            raise RiffError("Animated WebP has no ANIM chunk")
+        return anim
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as f:
+            return cls.parse(f.read())
+
+    def write(self, path):
+        chunks = [(b"VP8X", struct.pack("<B3x", self.flags)
+                   + _pack_u24(self.width - 1) + _pack_u24(self.height - 1))]
+        chunks += self.pre_chunks
+        chunks.append((b"ANIM", struct.pack("<IH", self.background, self.loop_count)))
+        body = sum(8 + len(p) + (len(p) & 1) for _, p in chunks + self.post_chunks)
+        body += sum(8 + f.payload_size() + (f.payload_size() & 1) for f in self.frames)
+        if body + 4 > 0xFFFFFFFF:
+            raise RiffError("Animation is too large for a RIFF container")
+        with open(path, "wb") as out:
+            out.write(b"RIFF" + struct.pack("<I", body + 4) + b"WEBP")
+            for fourcc, payload in chunks:
+                _write_chunk(out, fourcc, payload)
+            for frame in self.frames:
+                _write_chunk(out, b"ANMF", frame.header(), frame.data)
+            for fourcc, payload in self.post_chunks:
+                _write_chunk(out, fourcc, payload)
+
+
+def _write_chunk(out, fourcc, *parts):
+    size = sum(len(p) for p in parts)
+    out.write(fourcc + struct.pack("<I", size))
+    for part in parts:
+        out.write(part)
+    if size & 1:
+        out.write(b"\0")
+
+
+def _bitstream_size(fourcc, payload):
+    """Canvas size from a still image's VP8/VP8L bitstream header."""
+    if fourcc == b"VP8L" and len(payload) >= 5 and payload[0] == 0x2F:
+        bits = struct.unpack_from("<I", payload, 1)[0]
+        return (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+    if fourcc == b"VP8 " and len(payload) >= 10 and bytes(payload[3:6]) == b"\x9d\x01\x2a":
+        width, height = struct.unpack_from("<HH", payload, 6)
+        return width & 0x3FFF, height & 0x3FFF
+    raise RiffError(f"Bad {fourcc.decode('ascii', 'replace').strip()} bitstream header")
+
+
+def _check_frame_data(payload):
+    """An ANMF's frame data must hold an image bitstream that fits in it."""
+    for fourcc, _ in iter_chunks(payload, 0):
+        if fourcc in (b"VP8 ", b"VP8L"):
+            return
+    raise RiffError("Frame has no image data")
+
+
+def _check_durations(actual, expected):
+    """libwebp merges runs of identical frames into one longer frame, so
+    every actual duration must add up exactly one run of expected ones."""
+    i = 0
+    for n, duration in enumerate(actual):
+        if i == len(expected):
+            return f"{len(actual) - n} more frame(s) than requested"
+        total = 0
+        while i < len(expected) and total < duration:
+            total += expected[i]
+            i += 1
+        if total != duration:
+            return f"frame {n} lasts {duration} ms, expected {total} ms"
+    if i != len(expected):
+        return f"{len(expected) - i} frame(s) missing at the end"
+    return None
+
+
+def verify_webp(path, width=None, height=None, durations=None, loop_count=None):
+    """Check a written WebP without decoding any pixels. The file is
+    memory-mapped and only chunk headers are read. Returns a list of
+    problems; empty means it looks as requested. Arguments left as None are
+    not checked."""
+    import mmap
+    problems = []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ["file is empty"]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = memoryview(mm)
+            try:
+                problems = _verify(data, width, height, durations, loop_count)
+            except RiffError as e:
+                problems = [str(e)]
+            finally:
+                data.release()
+    return problems
+
+
+def _verify(data, width, height, durations, loop_count):
+    end = check_header(data)
+    size = anim = None
+    flags = 0
+    actual = []
+    for fourcc, payload in iter_chunks(data, 12, end):
+        if fourcc == b"VP8X":
+            if len(payload) < 10:
+                raise RiffError("VP8X chunk is too short")
+            flags = payload[0]
+            size = (_u24(payload, 4) + 1, _u24(payload, 7) + 1)
+        elif fourcc == b"ANIM":
+            if len(payload) < 6:
+                raise RiffError("ANIM chunk is too short")
+            anim = struct.unpack_from("<H", payload, 4)[0]
+        elif fourcc == b"ANMF":
+            frame = AnimationFrame.parse(payload)
+            if size and (frame.x + frame.width > size[0] or frame.y + frame.height > size[1]):
+                raise RiffError(f"Frame {len(actual)} lies outside the canvas")
+            _check_frame_data(frame.data)
+            actual.append(frame.duration)
+        elif fourcc in (b"VP8 ", b"VP8L") and size is None:
+            size = _bitstream_size(fourcc, payload)
+    problems = []
+    if size is None:
+        raise RiffError("No canvas size found")
+    if (width, height) != (None, None) and size != (width, height):
+        problems.append(f"canvas is {size[0]}x{size[1]}, expected {width}x{height}")
+    if flags & FLAG_ANIMATION:
+        if anim is None:
+            problems.append("missing ANIM chunk")
+        elif loop_count is not None and anim != loop_count:
+            problems.append(f"loop count is {anim}, expected {loop_count}")
+        if not actual:
+            problems.append("animation has no frames")
+        elif durations is not None:
+            mismatch = _check_durations(actual, list(durations))
+            if mismatch:
+                problems.append(mismatch)
+    # A still image is what libwebp writes when every frame was identical,
+    # so there is nothing more to check for one.
+    return problems
@@ -0,0 +1,186 @@
+"""Core- and memory-aware job scheduling for batch conversions.
+
+Concurrency is sized from the CPU count, and each job's memory footprint is
+estimated from its PNG headers so several huge sequences are never admitted
+at the same time. Jobs are admitted largest-first so the batch does not end
+with one long straggler running on its own.
+"""
+import os
+import queue
+import struct
+import threading
+
+from archive import open_frame
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# IHDR colour type -> samples per pixel
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# The animation encoder keeps a few full RGBA canvases alive at once
+# (previous/current canvas plus candidate sub-frames), independent of length.
+WORKING_CANVASES = 8
+
+# The encoded animation is assembled in memory before it is written out; this
+# is a deliberately pessimistic bytes-per-source-pixel for that buffer.
+OUTPUT_BYTES_PER_PIXEL = 0.5
+
+
+def read_png_header(path):
+    """Return (width, height, bit_depth, color_type) from a PNG's IHDR chunk."""
+    with open_frame(path) as f:
+        head = f.read(26)
+    if len(head) < 26 or head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        raise ValueError(f"Not a PNG file: {path}")
+    return struct.unpack(">IIBB", head[16:26])
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def total_memory():
+    """Physical memory in bytes, or None if it cannot be determined."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    if os.name == "nt":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+    return None
+
+
+def default_memory_budget():
+    total = total_memory()
+    return total // 2 if total else 4 * 1024 ** 3
+
+
+def parse_size(text):
+    """Parse sizes like "512M", "8G" or "1073741824" into bytes."""
+    text = str(text).strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class JobEstimate:
+    def __init__(self, frames=0, width=0, height=0):
+        self.frames = frames
+        self.width = width
+        self.height = height
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    @property
+    def memory(self):
+        return int(self.pixels * 4 * WORKING_CANVASES
+                   + self.frames * self.pixels * OUTPUT_BYTES_PER_PIXEL)
+
+    @property
+    def cost(self):
+        # Encode time is roughly proportional to the number of pixels pushed
+        return self.frames * self.pixels
+
+
+def estimate_job(folder_path, png_files):
+    """Estimate a job from its frame count and the first frame's resolution."""
+    if not png_files:
+        return JobEstimate()
+    try:
+        width, height, _, _ = read_png_header(os.path.join(folder_path, png_files[0]))
+    except (OSError, ValueError):
+        return JobEstimate(frames=len(png_files))
+    return JobEstimate(len(png_files), width, height)
+
+
+class JobScheduler:
+    def __init__(self, max_workers=None, memory_budget=None):
+        self.max_workers = max_workers or available_cpus()
+        self.memory_budget = memory_budget or default_memory_budget()
+
+    def run(self, fn, items, estimates):
+        """Run fn(item) for every item and yield (index, result) as jobs finish.
+
+        Jobs start largest-cost first. A job is only admitted while the
+        estimated memory of everything running fits in the budget; a job
+        bigger than the whole budget still runs, but on its own.
+
+        If a job raises, or the caller stops iterating, no further jobs are
+        started and the ones already running are waited for before the
+        error (if any) is passed on.
+        """
+        pending = sorted(range(len(items)), key=lambda i: estimates[i].cost, reverse=True)
+        cond = threading.Condition()
+        state = {"memory": 0, "running": 0}
+        done = queue.Queue()
+
+        def admit():
+            for pos, i in enumerate(pending):
+                need = estimates[i].memory
+                if state["running"] == 0 or state["memory"] + need <= self.memory_budget:
+                    return pending.pop(pos)
+            return None
+
+        def worker():
+            while True:
+                with cond:
+                    while True:
+                        if not pending:
+                            return
+                        i = admit()
+                        if i is not None:
+                            break
+                        cond.wait()
+                    state["memory"] += estimates[i].memory
+                    state["running"] += 1
+                try:
+                    done.put((i, fn(items[i]), None))
+                except BaseException as e:
+                    with cond:
+                        pending.clear()  # the batch is over, start nothing new
+                    done.put((i, None, e))
+                finally:
+                    with cond:
+                        state["memory"] -= estimates[i].memory
+                        state["running"] -= 1
+                        cond.notify_all()
+
+        threads = [threading.Thread(target=worker, daemon=True)
+                   for _ in range(min(self.max_workers, len(items)))]
+        for t in threads:
+            t.start()
+        try:
+            for _ in range(len(items)):
+                i, result, error = done.get()
+                if error is not None:
+                    raise error
+                yield i, result
+        finally:
+            with cond:
+                pending.clear()
+                cond.notify_all()
+            for t in threads:
+                t.join()
@@ -0,0 +1,166 @@
+"""Encode one long sequence as several segments in parallel, then stitch.
+
+A single animation encode is sequential, so one huge folder keeps a single
+core busy. Here the frames are cut into contiguous segments that are encoded
+concurrently (threads around img2webp processes, or a worker pool for
+in-process encoders) and the resulting files are joined by copying their
+ANMF chunks into one container with riff.py; nothing is re-encoded.
+
+The cuts are not taken from the keyframes a single encode would choose:
+they are spaced evenly, and the first frame of every segment becomes a
+keyframe because libwebp starts each file with one. For opaque frames
+libwebp writes it as a full-canvas, non-blended frame, so it does not depend
+on what came before and the segments join exactly. With transparency libwebp
+trims that keyframe to its visible area and relies on the rest of the canvas
+being empty, which is not true mid-animation; such segments are encoded
+with the previous segment's last frame in front of them to prime the canvas,
+and that extra frame is dropped again when stitching. This only joins
+exactly when the encode is lossless: a lossy priming frame decodes slightly
+differently from the previous segment's copy of it, and the frames built on
+it would carry that difference, so lossy sequences with transparency are
+not split. If a segment cannot be joined safely the whole sequence is
+encoded in one piece instead.
+"""
+import os
+import copy
+import queue
+import shutil
+import logging
+import tempfile
+import concurrent.futures
+
+from alpha import may_have_alpha
+from riff import ANMF_DISPOSE_BACKGROUND, FLAG_ALPHA, Animation, RiffError
+from supervisor import CancelToken
+
+log = logging.getLogger(__name__)
+
+# Shorter segments gain little and cost a keyframe each
+MIN_SEGMENT_FRAMES = 48
+
+
+def plan_segments(n_frames, segments, min_frames=MIN_SEGMENT_FRAMES):
+    """Split range(n_frames) into at most `segments` (start, end) spans of at
+    least min_frames each. The spans are even; each start becomes a
+    keyframe when its segment is encoded."""
+    count = max(1, min(segments, n_frames // min_frames))
+    return [(n_frames * i // count, n_frames * (i + 1) // count) for i in range(count)]
+
+
+def stitch(paths, output_file, loop_count, primed=()):
+    """Join the animations in paths into output_file. primed[i] is the
+    duration of the priming frame at the start of segment i (None if it has
+    none)."""
+    anims = [Animation.read(p) for p in paths]
+    first = anims[0]
+    out = Animation(first.width, first.height, flags=first.flags, background=first.background,
+                    loop_count=loop_count, frames=list(first.frames),
+                    pre_chunks=first.pre_chunks, post_chunks=first.post_chunks)
+    for i, anim in enumerate(anims[1:], 1):
+        if (anim.width, anim.height) != (out.width, out.height):
+            raise RiffError("Segments have different canvas sizes")
+        frames = anim.frames
+        prime = primed[i] if i < len(primed) else None
+        prev = out.frames[-1]
+        if prime is not None:
+            # The priming frame shows what the previous segment already ends
+            # on. libwebp may have merged it with identical frames after it;
+            # that extra time belongs to the previous segment's last frame.
+            head = frames[0]
+            if head.dispose or head.duration < prime:
+                raise RiffError("Priming frame cannot be dropped")
+            frames = frames[1:]
+            prev.flags &= ~ANMF_DISPOSE_BACKGROUND
+            prev.duration += head.duration - prime
+        elif frames and (frames[0].blend or not frames[0].covers(out.width, out.height)):
+            raise RiffError("Segment does not start with a full-canvas keyframe")
+        out.frames += frames
+        out.flags |= anim.flags & FLAG_ALPHA
+    out.write(output_file)
+
+
+def _run_threads(encoder, jobs, cancel, on_frame):
+    # One failed segment cancels its siblings, but not the caller's token
+    token = CancelToken(parent=cancel)
+
+    def encode(job):
+        ok = encoder.encode(job, should_stop=token, on_frame=on_frame)
+        if not ok:
+            token.cancel()
+        return ok
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            results = list(executor.map(encode, jobs))
+    finally:
+        token.close()
+    return all(results)
+
+
+def _run_processes(encoder, jobs, cancel, on_frame):
+    # Workers cannot call back, so progress arrives one segment at a time.
+    # Leaving the with block terminates the pool, so a cancel or a failed
+    # segment stops the remaining workers at once.
+    import multiprocessing
+    done = queue.Queue()
+
+    def failed(e):
+        log.error("Segment encode failed: %s", e)
+        done.put((None, False))
+
+    with multiprocessing.Pool(len(jobs)) as pool:
+        for job in jobs:
+            pool.apply_async(encoder.encode, (job,),
+                             callback=lambda ok, job=job: done.put((job, ok)),
+                             error_callback=failed)
+        remove = cancel.on_cancel(lambda: done.put((None, False)))
+        try:
+            for _ in jobs:
+                job, ok = done.get()
+                if not ok:
+                    return False
+                if on_frame:
+                    on_frame(len(job.png_files))
+            return True
+        finally:
+            remove()
+
+
+def encode_segments(encoder, job, segments, cancel=None, on_frame=None):
+    """Encode job in up to `segments` parallel pieces. Returns True on
+    success. cancel is a supervisor.CancelToken."""
+    cancel = cancel or CancelToken()
+    spans = plan_segments(len(job.png_files), segments)
+    if len(spans) < 2:
+        return encoder.encode(job, should_stop=cancel, on_frame=on_frame)
+    prime = may_have_alpha(os.path.join(job.folder_path, job.png_files[0]))
+    if prime and (job.mixed or not job.lossless):
+        log.debug("%s is lossy with transparency; not splitting it", job.output_file)
+        return encoder.encode(job, should_stop=cancel, on_frame=on_frame)
+    tmp_dir = tempfile.mkdtemp(prefix="webp_segments_")
+    try:
+        jobs, primed = [], []
+        for i, (start, end) in enumerate(spans):
+            if prime and i:
+                start -= 1
+                primed.append(job.durations[start])
+            else:
+                primed.append(None)
+            sub = copy.copy(job)
+            sub.png_files = job.png_files[start:end]
+            sub.durations = job.durations[start:end]
+            sub.output_file = os.path.join(tmp_dir, f"{i:04d}.webp")
+            jobs.append(sub)
+        log.debug("Encoding %s in %d segments", job.output_file, len(jobs))
+        run = _run_processes if encoder.in_process else _run_threads
+        if not run(encoder, jobs, cancel, on_frame):
+            return False
+        try:
+            stitch([j.output_file for j in jobs], job.output_file, 0 if job.loop else 1, primed)
+        except (OSError, RiffError) as e:
+            log.warning("Cannot stitch segments of %s (%s); encoding it in one piece",
+                        job.output_file, e)
+            return encoder.encode(job, should_stop=cancel, on_frame=on_frame)
+        return True
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,132 @@
+"""Stage frames and outputs on fast local disk for jobs on network storage.
+
+Over SMB/NFS every frame read is a high-latency round trip that the encoder
+waits for, and an output written in place sits half-finished on the share
+until the encode ends, or for good if the job is cancelled. With a
+StagingArea a job first copies its frames to local scratch in bulk, many
+files at once, then reads and writes only local files. The finished output
+is moved into place in one step by publish(), so the share only ever holds
+complete outputs.
+
+Staged frames count against max_bytes while their job runs. A job waits for
+room when other jobs' frames fill the area; a sequence larger than the
+whole cap is read from its folder as before, and only its output is staged.
+"""
+import os
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+import concurrent.futures
+
+from archive import copy_frames, frame_size
+from prefetch import PrefetchCancelled
+from supervisor import CancelToken
+
+log = logging.getLogger(__name__)
+
+DEFAULT_STAGE_BYTES = 10 * 1024 ** 3
+# Copies are latency-bound on network storage, so use more threads than cores
+DEFAULT_COPY_WORKERS = 16
+
+
+def publish(src, dst):
+    """Move src to dst so that dst only ever appears complete. A rename
+    when both are on one filesystem, otherwise a copy to a temporary name
+    next to dst that is then renamed over it."""
+    try:
+        os.replace(src, dst)
+        return
+    except OSError:
+        pass
+    tmp = os.path.join(os.path.dirname(os.path.abspath(dst)),
+                       f".{os.path.basename(dst)}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    os.remove(src)
+
+
+class StagedJob:
+    """One job's corner of the staging area. frames_dir is the local copy
+    of the frames (or the original folder when they did not fit) and
+    output_file the local path to encode to before publishing."""
+    def __init__(self, area, job_dir, frames_dir, output_file):
+        self.area = area
+        self.job_dir = job_dir
+        self.frames_dir = frames_dir
+        self.output_file = output_file
+        self.bytes = 0
+
+    def release(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        self.area._release(self.bytes)
+        self.bytes = 0
+
+
+class StagingArea:
+    def __init__(self, scratch_dir=None, max_bytes=DEFAULT_STAGE_BYTES, workers=DEFAULT_COPY_WORKERS):
+        self.scratch_dir = scratch_dir or tempfile.gettempdir()
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._used = 0
+        self._cond = threading.Condition()
+        os.makedirs(self.scratch_dir, exist_ok=True)
+
+    def stage(self, folder_path, png_files, output_file, should_stop=None):
+        """Copy png_files to local scratch and return a StagedJob; release()
+        it once its output has been published."""
+        job_dir = tempfile.mkdtemp(prefix="webp_stage_", dir=self.scratch_dir)
+        job = StagedJob(self, job_dir, folder_path, os.path.join(job_dir, os.path.basename(output_file)))
+        try:
+            paths = [os.path.join(folder_path, name) for name in png_files]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                size = sum(executor.map(frame_size, paths))
+            if size > self.max_bytes:
+                log.debug("%s is larger than the staging area, reading it in place", folder_path)
+                return job
+            self._reserve(size, should_stop)
+            job.bytes = size
+            frames_dir = os.path.join(job_dir, "frames")
+            copy_frames(folder_path, png_files, frames_dir, self.workers, should_stop)
+            job.frames_dir = frames_dir
+        except BaseException:
+            job.release()
+            raise
+        return job
+
+    def _reserve(self, size, should_stop):
+        # A CancelToken wakes the wait the moment it fires; any other
+        # should_stop callable has to be polled
+        remove = None
+        timeout = 0.5 if should_stop else None
+        if isinstance(should_stop, CancelToken):
+            remove = should_stop.on_cancel(self._wake)
+            timeout = None
+        try:
+            with self._cond:
+                while self._used + size > self.max_bytes:
+                    if should_stop and should_stop():
+                        raise PrefetchCancelled()
+                    self._cond.wait(timeout)
+                self._used += size
+        finally:
+            if remove:
+                remove()
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _release(self, size):
+        if size:
+            with self._cond:
+                self._used -= size
+                self._cond.notify_all()
@@ -0,0 +1,110 @@
+"""Cancellation and child-process supervision without polling.
+
+A CancelToken is a cancel flag that also pushes: anything blocked on the
+work it guards (a child process, a backoff sleep, a worker pool) registers a
+callback with on_cancel and is woken the moment cancel() is called. Tokens
+are callable, so they can be passed anywhere a should_stop() function is
+expected. ProcessSupervisor keeps track of every child process it starts and
+blocks in process.wait() instead of polling; a cancel terminates the process
+and wait() returns straight away.
+"""
+import logging
+import subprocess
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class CancelToken:
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_id = 0
+        # A child is cancelled with its parent, but can also be cancelled alone
+        self._detach = parent.on_cancel(self.cancel) if parent is not None else None
+
+    def __call__(self):
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                log.warning("Cancel callback failed: %s", e)
+
+    def on_cancel(self, callback):
+        """Call callback() once when cancelled (now, if already cancelled).
+        Returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+
+                def remove():
+                    with self._lock:
+                        self._callbacks.pop(key, None)
+                return remove
+        callback()
+        return lambda: None
+
+    def wait(self, timeout=None):
+        """Block until cancelled or timeout; True if cancelled."""
+        return self._event.wait(timeout)
+
+    def close(self):
+        """Stop following the parent token."""
+        if self._detach:
+            self._detach()
+            self._detach = None
+
+
+class ProcessSupervisor:
+    def __init__(self):
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def start(self, command, **popen_kwargs):
+        process = subprocess.Popen(command, **popen_kwargs)
+        with self._lock:
+            self._processes.add(process)
+        return process
+
+    def wait(self, process, cancel=None):
+        """Wait for process to exit; a CancelToken terminates it early.
+        Returns the exit code."""
+        remove = cancel.on_cancel(lambda: self.terminate(process)) if cancel is not None else None
+        try:
+            return process.wait()
+        finally:
+            if remove:
+                remove()
+            with self._lock:
+                self._processes.discard(process)
+
+    @staticmethod
+    def terminate(process):
+        if process.poll() is not None:
+            return
+        try:
+            process.terminate()
+        except OSError as e:
+            log.warning("Failed to terminate process: %s", e)
+
+    def terminate_all(self):
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self.terminate(process)
@@ -0,0 +1,34 @@
+"""Unit tests; run from webp_converter_project with python -m unittest (or pytest)."""
+import os
+import importlib.util
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)]
+
+
+def webp_available():
+    if not PIL_AVAILABLE:
+        return False
+    from PIL import features
+    return bool(features.check("webp"))
+
+
+def make_sequence(folder, colors=COLORS, size=(32, 24)):
+    """Write one solid-colour PNG frame per colour; returns the frame names."""
+    from PIL import Image
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for i, color in enumerate(colors):
+        name = f"frame_{i:04d}.png"
+        Image.new("RGBA", size, color + (255,)).save(os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+def make_animation(path, colors, durations, size=(32, 24)):
+    """Encode solid-colour frames into an animated WebP with Pillow."""
+    from PIL import Image
+    frames = [Image.new("RGBA", size, color + (255,)) for color in colors]
+    frames[0].save(path, "WEBP", save_all=True, append_images=frames[1:], duration=durations,
+                   loop=0, lossless=True)
@@ -0,0 +1,104 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from archive import (frame_signature, frame_size, in_archive, listdir, open_frame, split_path,
+                     strip_archive_suffix)
+from scheduler import read_png_header
+
+# A 3x2 PNG header is enough for read_png_header
+PNG = (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x03\x00\x00\x00\x02\x08\x06\x00\x00\x00"
+       + bytes(64))
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.frames = {"beauty/0001.png": PNG + b"1", "beauty/0002.png": PNG + b"22",
+                       "beauty/sub/0001.png": PNG + b"333", "notes.txt": b"hello"}
+
+    def make_zip(self, name="shot010.zip", compression=zipfile.ZIP_STORED):
+        path = os.path.join(self.dir, name)
+        with zipfile.ZipFile(path, "w", compression) as z:
+            for member, data in self.frames.items():
+                z.writestr(member, data)
+        return path
+
+    def make_tar(self, name="shot010.tar", mode="w"):
+        path = os.path.join(self.dir, name)
+        with tarfile.open(path, mode) as tar:
+            for member, data in self.frames.items():
+                info = tarfile.TarInfo(member)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return path
+
+    def check_reads(self, path):
+        for member, data in self.frames.items():
+            frame = os.path.join(path, *member.split("/"))
+            self.assertTrue(in_archive(frame))
+            with open_frame(frame) as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(frame_size(frame), len(data))
+        self.assertEqual(sorted(listdir(path)), ["beauty", "notes.txt"])
+        self.assertEqual(sorted(listdir(os.path.join(path, "beauty"))), ["0001.png", "0002.png", "sub"])
+        self.assertEqual(read_png_header(os.path.join(path, "beauty", "0001.png"))[:2], (3, 2))
+
+    def test_stored_zip(self):
+        self.check_reads(self.make_zip())
+
+    def test_deflated_zip(self):
+        self.check_reads(self.make_zip(compression=zipfile.ZIP_DEFLATED))
+
+    def test_tar(self):
+        self.check_reads(self.make_tar())
+
+    def test_split_path(self):
+        path = self.make_zip()
+        self.assertEqual(split_path(os.path.join(path, "beauty", "0001.png")),
+                         (os.path.abspath(path), "beauty/0001.png"))
+        self.assertEqual(split_path(path), (os.path.abspath(path), ""))
+        self.assertIsNone(split_path(self.dir))
+        self.assertFalse(in_archive(os.path.join(self.dir, "missing.zip", "0001.png")))
+        self.assertEqual(strip_archive_suffix("shot010.zip"), "shot010")
+        self.assertEqual(strip_archive_suffix("shot010"), "shot010")
+
+    def test_missing_member(self):
+        path = self.make_zip()
+        with self.assertRaises(FileNotFoundError):
+            open_frame(os.path.join(path, "beauty", "9999.png"))
+        with self.assertRaises(FileNotFoundError):
+            listdir(os.path.join(path, "missing"))
+
+    def test_signature_follows_the_archive(self):
+        path = self.make_zip()
+        frame = os.path.join(path, "beauty", "0001.png")
+        before = frame_signature(frame)
+        self.frames["beauty/0001.png"] = PNG + b"re-rendered"
+        self.make_zip()
+        self.assertNotEqual(frame_signature(frame), before)
+        with open_frame(frame) as f:
+            self.assertEqual(f.read(), PNG + b"re-rendered")
+
+    def test_archive_created_after_a_lookup(self):
+        path = os.path.join(self.dir, "later.zip")
+        frame = os.path.join(path, "beauty", "0001.png")
+        self.assertFalse(in_archive(frame))
+        self.make_zip("later.zip")
+        self.assertTrue(in_archive(frame))
+        os.remove(path)
+        self.assertFalse(in_archive(frame))
+
+    def test_compressed_tar_is_refused(self):
+        path = self.make_tar("shot010.tar", mode="w:gz")
+        with self.assertRaises(OSError):
+            listdir(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from cache import OutputCache
+
+SETTINGS = {"delay": 40, "quality": 90, "loop": True}
+
+
+class OutputCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.folder = os.path.join(self.dir, "shot010")
+        os.mkdir(self.folder)
+        self.png_files = ["0001.png", "0002.png"]
+        for name in self.png_files:
+            self.write(os.path.join(self.folder, name), name.encode())
+        self.output = os.path.join(self.dir, "shot010.webp")
+        self.cache = OutputCache(os.path.join(self.dir, "cache"))
+
+    def write(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def encode(self, data=b"RIFF encoded"):
+        """Stands in for a conversion: writes the output and stores it."""
+        key = self.cache.job_key(self.folder, self.png_files, SETTINGS)
+        self.write(self.output, data)
+        self.cache.store(key, self.output)
+        return key
+
+    def test_unchanged_job_hits(self):
+        key = self.encode()
+        self.assertTrue(self.cache.lookup(key, self.output))
+        self.assertEqual(self.cache.job_key(self.folder, self.png_files, SETTINGS), key)
+
+    def test_missing_output_is_restored(self):
+        key = self.encode()
+        os.remove(self.output)
+        self.assertTrue(self.cache.lookup(key, self.output))
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(), b"RIFF encoded")
+
+    def test_manifest_survives_a_restart(self):
+        key = self.encode()
+        self.cache.flush()
+        cache = OutputCache(self.cache.cache_dir)
+        self.assertTrue(cache.lookup(key, self.output))
+
+    def test_changed_frames_miss(self):
+        key = self.encode()
+        self.write(os.path.join(self.folder, "0002.png"), b"re-rendered")
+        new_key = self.cache.job_key(self.folder, self.png_files, SETTINGS)
+        self.assertNotEqual(new_key, key)
+        self.assertFalse(self.cache.lookup(new_key, self.output))
+
+    def test_changed_settings_miss(self):
+        key = self.encode()
+        new_key = self.cache.job_key(self.folder, self.png_files, dict(SETTINGS, quality=50))
+        self.assertNotEqual(new_key, key)
+        self.assertFalse(self.cache.lookup(new_key, self.output))
+
+    def test_content_hash_ignores_touched_frames(self):
+        cache = OutputCache(os.path.join(self.dir, "hashed"), content_hash=True)
+        key = cache.job_key(self.folder, self.png_files, SETTINGS)
+        path = os.path.join(self.folder, "0001.png")
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        self.assertEqual(cache.job_key(self.folder, self.png_files, SETTINGS), key)
+
+    def test_eviction_keeps_under_budget(self):
+        cache = OutputCache(os.path.join(self.dir, "small"), max_bytes=100)
+        for i in range(5):
+            output = os.path.join(self.dir, f"out{i}.webp")
+            self.write(output, bytes(40))
+            cache.store(f"key{i}", output)
+        sizes = [e.stat().st_size for e in os.scandir(cache.objects_dir)]
+        self.assertLessEqual(sum(sizes), 100)
+        self.assertTrue(os.path.isfile(os.path.join(cache.objects_dir, "key4.webp")))
+
+    def test_eviction_prunes_stale_manifest_entries(self):
+        cache = OutputCache(os.path.join(self.dir, "small"), max_bytes=100)
+        outputs = []
+        for i in range(5):
+            output = os.path.join(self.dir, f"out{i}.webp")
+            self.write(output, bytes(40))
+            cache.store(f"key{i}", output)
+            outputs.append(output)
+            if i == 1:
+                os.remove(outputs[0])
+        # out0 is gone and its object evicted; out1 lost its object but is
+        # still the file that was recorded
+        self.assertNotIn(outputs[0], cache._manifest)
+        self.assertTrue(cache.lookup("key1", outputs[1]))
+        self.assertFalse(os.path.exists(os.path.join(cache.objects_dir, "key1.webp")))
+
+    def test_concurrent_stores_of_one_key(self):
+        key = self.cache.job_key(self.folder, self.png_files, SETTINGS)
+        outputs = []
+        for i in range(8):
+            output = os.path.join(self.dir, f"copy{i}.webp")
+            self.write(output, b"RIFF encoded")
+            outputs.append(output)
+        threads = [threading.Thread(target=self.cache.store, args=(key, output)) for output in outputs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(os.listdir(self.cache.objects_dir), [key + ".webp"])
+        self.assertTrue(all(self.cache.lookup(key, output) for output in outputs))
+
+
+if __name__ == "__main__":
+    unittest.main()
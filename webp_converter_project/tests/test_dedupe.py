@@ -0,0 +1,45 @@
+import shutil
+import tempfile
+import unittest
+
+from dedupe import coalesce_frames
+from tests import PIL_AVAILABLE, make_sequence
+
+RED = (255, 0, 0)
+NEAR_RED = (252, 2, 1)
+BLUE = (0, 0, 255)
+
+
+@unittest.skipUnless(PIL_AVAILABLE, "needs Pillow")
+class CoalesceFramesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def test_identical_runs_are_merged(self):
+        names = make_sequence(self.dir, [RED, RED, BLUE, BLUE, BLUE, RED])
+        merged = coalesce_frames(self.dir, names, [40] * 6)
+        self.assertEqual(merged.png_files, [names[0], names[2], names[5]])
+        self.assertEqual(merged.durations, [80, 120, 40])
+        self.assertEqual(merged.dropped, 3)
+
+    def test_unequal_durations_are_summed(self):
+        names = make_sequence(self.dir, [RED, RED, BLUE])
+        merged = coalesce_frames(self.dir, names, [10, 20, 30])
+        self.assertEqual(merged.durations, [30, 30])
+
+    def test_near_duplicates_need_a_threshold(self):
+        names = make_sequence(self.dir, [RED, NEAR_RED, BLUE])
+        self.assertEqual(coalesce_frames(self.dir, names, [40] * 3).dropped, 0)
+        merged = coalesce_frames(self.dir, names, [40] * 3, threshold=4)
+        self.assertEqual(merged.png_files, [names[0], names[2]])
+        self.assertEqual(merged.durations, [80, 40])
+        self.assertEqual(coalesce_frames(self.dir, names, [40] * 3, threshold=2).dropped, 0)
+
+    def test_empty(self):
+        merged = coalesce_frames(self.dir, [], [])
+        self.assertEqual((merged.png_files, merged.durations, merged.dropped), ([], [], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
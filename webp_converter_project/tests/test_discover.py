@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from discover import discover_sequences
+
+
+class DiscoverSequencesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.tree = {
+            "shot010/v001/beauty": 3,
+            "shot010/v001/depth": 2,
+            "shot010/v002/beauty": 1,
+            "shot020/beauty": 4,
+            "shot020/tmp": 5,
+            "empty": 0,
+        }
+        for folder, frames in self.tree.items():
+            path = self.path(folder)
+            os.makedirs(path)
+            for i in reversed(range(frames)):
+                open(os.path.join(path, f"{i:04d}.png"), "wb").close()
+            open(os.path.join(path, "notes.txt"), "wb").close()
+
+    def path(self, rel):
+        return os.path.join(self.dir, *rel.split("/"))
+
+    def test_finds_every_sequence_with_sorted_frames(self):
+        found = discover_sequences([self.dir])
+        self.assertEqual(list(found), sorted(self.path(f) for f, n in self.tree.items() if n))
+        self.assertEqual(found[self.path("shot020/beauty")], ["0000.png", "0001.png", "0002.png", "0003.png"])
+
+    def test_patterns_and_min_frames(self):
+        found = discover_sequences([self.dir], include=["beauty"], exclude=["tmp"], min_frames=2)
+        self.assertEqual(list(found), [self.path("shot010/v001/beauty"), self.path("shot020/beauty")])
+        found = discover_sequences([self.dir], include=["shot010/*/beauty"])
+        self.assertEqual(list(found), [self.path("shot010/v001/beauty"), self.path("shot010/v002/beauty")])
+        found = discover_sequences([self.dir], exclude=["shot010"])
+        self.assertEqual(list(found), [self.path("shot020/beauty"), self.path("shot020/tmp")])
+
+    def test_root_with_frames_is_a_sequence(self):
+        root = self.path("shot020/beauty")
+        self.assertEqual(list(discover_sequences([root])), [root])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+
+from distributed import Coordinator, Worker
+from engine import FolderResult
+
+
+class FakeEngine:
+    """Stands in for a ConversionEngine: every job succeeds after a moment."""
+    def __init__(self, name, converted):
+        self.name = name
+        self.converted = converted
+
+    def convert(self, folders, output_file, fps, quality, folder_loops=None, frame_lists=None):
+        time.sleep(0.1)
+        self.converted.append((self.name, folders[0]))
+        return [FolderResult(0, folders[0], output_file, "done", frames=len(frame_lists[folders[0]]))]
+
+    def cancel(self):
+        pass
+
+
+class LocalCoordinatorTest(unittest.TestCase):
+    def test_two_workers_share_the_batch(self):
+        jobs = [{"id": i, "folder": f"/renders/shot{i:03d}", "output_file": f"/out/shot{i:03d}.webp",
+                 "png_files": ["0001.png", "0002.png"], "fps": 25, "quality": 90, "loop": True}
+                for i in range(6)]
+        reported = []
+        coordinator = Coordinator(jobs, {"encoder": "pillow"}, host="127.0.0.1", port=0, heartbeat=0.5,
+                                  on_result=lambda result, completed, total: reported.append(completed))
+        coordinator.start()
+        self.addCleanup(coordinator.stop)
+
+        converted = []
+        options = []
+
+        def factory(name):
+            def build(engine_options):
+                options.append(engine_options)
+                return FakeEngine(name, converted)
+            return build
+
+        workers = [Worker(coordinator.local_url, factory(name), name=name) for name in ("a", "b")]
+        counts = {}
+        threads = [threading.Thread(target=lambda w=w: counts.__setitem__(w.name, w.run())) for w in workers]
+        for t in threads:
+            t.start()
+        results = coordinator.wait(timeout=30)
+        for t in threads:
+            t.join(30)
+
+        self.assertEqual([r.status for r in results], ["done"] * 6)
+        self.assertEqual([r.folder for r in results], [job["folder"] for job in jobs])
+        self.assertEqual(sorted(folder for _, folder in converted), [job["folder"] for job in jobs])
+        self.assertEqual(options, [{"encoder": "pillow"}] * 2)
+        self.assertEqual(sorted(reported), list(range(1, 7)))
+        # Both workers took part and then quit when told there was nothing left
+        self.assertEqual(set(counts), {"a", "b"})
+        self.assertEqual(sum(counts.values()), 6)
+        self.assertTrue(all(counts.values()))
+
+        status = coordinator.status()
+        self.assertEqual((status["total"], status["completed"], status["pending"]), (6, 6, 0))
+        self.assertEqual(status["running"], {})
+        self.assertEqual(set(status["workers"]), {"a", "b"})
+        # status() hands out a snapshot, not the live per-worker stats
+        status["workers"]["a"]["jobs"] = -1
+        self.assertNotEqual(coordinator.status()["workers"]["a"]["jobs"], -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tests import COLORS, make_sequence, webp_available
+
+
+@unittest.skipUnless(webp_available(), "needs Pillow with WebP support")
+class ConversionEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.out = os.path.join(self.dir, "out")
+        os.mkdir(self.out)
+        self.first = os.path.join(self.dir, "first")
+        self.second = os.path.join(self.dir, "second")
+        make_sequence(self.first, COLORS[:3])
+        make_sequence(self.second, COLORS[3:])
+
+    def engine(self, **kwargs):
+        from engine import ConversionEngine
+        return ConversionEngine(encoder="pillow", max_workers=2, **kwargs)
+
+    def test_unexpected_error_fails_only_its_job(self):
+        engine = self.engine()
+        encode = engine._encode_sequence
+
+        def broken(idx, folder_path, *args, **kwargs):
+            if folder_path == self.second:
+                raise ValueError("cannot handle this mode")
+            return encode(idx, folder_path, *args, **kwargs)
+
+        engine._encode_sequence = broken
+        first, second = engine.convert([self.first, self.second], self.out, 25, 90)
+        self.assertEqual(first.status, "done")
+        self.assertEqual(second.status, "failed")
+        self.assertIn("ValueError", second.error)
+
+    def test_journal_resumes_unchanged_folders_only(self):
+        from journal import JobJournal
+        journal = JobJournal(os.path.join(self.dir, "journal.jsonl"))
+        self.addCleanup(journal.close)
+        engine = self.engine(journal=journal)
+        results = engine.convert([self.first, self.second], self.out, 25, 90)
+        self.assertEqual([r.status for r in results], ["done", "done"])
+        self.assertFalse(any(r.resumed for r in results))
+
+        results = engine.convert([self.first, self.second], self.out, 25, 90)
+        self.assertTrue(all(r.resumed for r in results))
+
+        # Same frame count, new pixels: must be converted again
+        make_sequence(self.second, [(10, 20, 30)] + COLORS[4:])
+        first, second = engine.convert([self.first, self.second], self.out, 25, 90)
+        self.assertTrue(first.resumed)
+        self.assertFalse(second.resumed)
+        self.assertEqual(second.status, "done")
+
+    def test_damaged_publish_fails_the_job(self):
+        from staging import StagingArea, publish
+        engine = self.engine(staging=StagingArea(os.path.join(self.dir, "scratch")))
+
+        def torn(src, dst):
+            publish(src, dst)
+            if "second" in dst:
+                with open(dst, "r+b") as f:
+                    f.truncate(40)
+
+        with mock.patch("engine.publish", torn):
+            first, second = engine.convert([self.first, self.second], self.out, 25, 90)
+        self.assertEqual(first.status, "done")
+        self.assertTrue(os.path.exists(first.output_file))
+        self.assertEqual(second.status, "failed")
+        self.assertIn("damaged", second.error)
+        self.assertFalse(os.path.exists(second.output_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from journal import DONE, RUNNING, JobJournal, job_key
+
+SETTINGS = {"delay": 40, "quality": 90, "loop": True}
+
+
+class JobJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.folder = os.path.join(self.dir, "shot010")
+        os.mkdir(self.folder)
+        self.png_files = []
+        for i in range(3):
+            name = f"frame_{i:04d}.png"
+            with open(os.path.join(self.folder, name), "wb") as f:
+                f.write(b"frame %d" % i)
+            self.png_files.append(name)
+        self.output = os.path.join(self.dir, "shot010.webp")
+        with open(self.output, "wb") as f:
+            f.write(b"RIFF....WEBP")
+        self.path = os.path.join(self.dir, "journal.jsonl")
+
+    def key(self):
+        return job_key(self.folder, self.output, SETTINGS, self.png_files)
+
+    def record_done(self, journal, key):
+        st = os.stat(self.output)
+        journal.record(key, DONE, bytes_written=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    def test_resume_after_reopening(self):
+        journal = JobJournal(self.path)
+        self.record_done(journal, self.key())
+        journal.close()
+        journal = JobJournal(self.path)
+        self.addCleanup(journal.close)
+        self.assertTrue(journal.is_done(self.key(), self.output))
+
+    def test_unfinished_job_is_not_done(self):
+        journal = JobJournal(self.path)
+        self.addCleanup(journal.close)
+        journal.record(self.key(), RUNNING, attempt=1)
+        self.assertFalse(journal.is_done(self.key(), self.output))
+
+    def test_changed_frames_are_a_new_job(self):
+        journal = JobJournal(self.path)
+        self.addCleanup(journal.close)
+        self.record_done(journal, self.key())
+        # Re-rendered with the same frame count
+        with open(os.path.join(self.folder, self.png_files[1]), "wb") as f:
+            f.write(b"re-rendered frame 1")
+        self.assertFalse(journal.is_done(self.key(), self.output))
+
+    def test_changed_output_is_not_done(self):
+        journal = JobJournal(self.path)
+        self.addCleanup(journal.close)
+        key = self.key()
+        self.record_done(journal, key)
+        with open(self.output, "ab") as f:
+            f.write(b"more")
+        self.assertFalse(journal.is_done(key, self.output))
+        os.remove(self.output)
+        self.assertFalse(journal.is_done(key, self.output))
+
+    def test_torn_last_line_is_ignored(self):
+        journal = JobJournal(self.path)
+        self.record_done(journal, self.key())
+        journal.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"key": "abc", "sta')
+        journal = JobJournal(self.path)
+        self.addCleanup(journal.close)
+        self.assertTrue(journal.is_done(self.key(), self.output))
+        self.assertIsNone(journal.get("abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from riff import _check_durations, verify_webp
+from segments import stitch
+from tests import COLORS, make_animation, webp_available
+
+
+class CheckDurationsTest(unittest.TestCase):
+    def test_exact(self):
+        self.assertIsNone(_check_durations([100, 100, 40], [100, 100, 40]))
+
+    def test_merged_runs(self):
+        # libwebp merges identical frames into one longer frame
+        self.assertIsNone(_check_durations([200, 40], [100, 100, 40]))
+
+    def test_wrong_duration(self):
+        self.assertEqual(_check_durations([100, 50], [100, 40]), "frame 1 lasts 50 ms, expected 40 ms")
+
+    def test_merge_across_boundary(self):
+        self.assertEqual(_check_durations([150], [100, 100]), "frame 0 lasts 150 ms, expected 200 ms")
+
+    def test_extra_frames(self):
+        self.assertEqual(_check_durations([100, 100, 100], [100]), "2 more frame(s) than requested")
+
+    def test_missing_frames(self):
+        self.assertEqual(_check_durations([100], [100, 100, 100]), "2 frame(s) missing at the end")
+
+
+@unittest.skipUnless(webp_available(), "needs Pillow with WebP support")
+class VerifyWebpTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.output = os.path.join(self.dir, "out.webp")
+
+    def test_stitched_output_verifies(self):
+        first = os.path.join(self.dir, "first.webp")
+        second = os.path.join(self.dir, "second.webp")
+        make_animation(first, COLORS[:3], [100, 100, 100])
+        make_animation(second, COLORS[3:], [40, 40, 40])
+        stitch([first, second], self.output, loop_count=0)
+        self.assertEqual(verify_webp(self.output, 32, 24, [100, 100, 100, 40, 40, 40], loop_count=0), [])
+        self.assertEqual(verify_webp(self.output, 32, 24, [100] * 6),
+                         ["frame 3 lasts 40 ms, expected 100 ms"])
+        self.assertEqual(verify_webp(self.output, 64, 24, loop_count=1),
+                         ["canvas is 32x24, expected 64x24", "loop count is 0, expected 1"])
+
+    def test_truncated_file(self):
+        make_animation(self.output, COLORS[:3], [100, 100, 100])
+        size = os.path.getsize(self.output)
+        with open(self.output, "r+b") as f:
+            f.truncate(size - 10)
+        self.assertNotEqual(verify_webp(self.output), [])
+
+    def test_empty_file(self):
+        open(self.output, "wb").close()
+        self.assertEqual(verify_webp(self.output), ["file is empty"])
+
+
+if __name__ == "__main__":
+    unittest.main()
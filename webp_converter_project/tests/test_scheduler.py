@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+
+from scheduler import JobEstimate, JobScheduler, parse_size
+
+
+def estimates(n):
+    # Largest cost first, so items start in list order
+    return [JobEstimate(frames=1, width=n - i, height=1) for i in range(n)]
+
+
+class ParseSizeTest(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(parse_size("512M"), 512 * 1024 ** 2)
+        self.assertEqual(parse_size("1.5g"), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_size("2GB"), 2 * 1024 ** 3)
+        self.assertEqual(parse_size("1000"), 1000)
+
+
+class JobSchedulerTest(unittest.TestCase):
+    def test_yields_every_result(self):
+        items = list(range(8))
+        results = dict(JobScheduler(max_workers=3).run(lambda x: x * x, items, estimates(8)))
+        self.assertEqual(results, {i: i * i for i in items})
+
+    def test_memory_budget_limits_concurrency(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def job(x):
+            with lock:
+                running.append(x)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(x)
+
+        # Every job needs more than half the budget, so they run one at a time
+        big = [JobEstimate(frames=1, width=1000, height=1000) for _ in range(4)]
+        scheduler = JobScheduler(max_workers=4, memory_budget=int(big[0].memory * 1.5))
+        list(scheduler.run(job, list(range(4)), big))
+        self.assertEqual(max(peak), 1)
+
+    def test_raising_job_stops_the_batch(self):
+        started = []
+
+        def job(x):
+            started.append(x)
+            if x == 1:
+                raise ValueError("bad frame")
+            return x
+
+        before = threading.active_count()
+        with self.assertRaises(ValueError):
+            list(JobScheduler(max_workers=1).run(job, list(range(5)), estimates(5)))
+        # No job is started after the failure and no worker is left running
+        self.assertEqual(started, [0, 1])
+        self.assertEqual(threading.active_count(), before)
+
+    def test_stopping_early_drains_workers(self):
+        release = threading.Event()
+
+        def job(x):
+            if x > 0:
+                release.wait(5)
+            return x
+
+        before = threading.active_count()
+        results = JobScheduler(max_workers=2).run(job, list(range(6)), estimates(6))
+        self.assertEqual(next(results), (0, 0))
+        release.set()
+        results.close()
+        self.assertEqual(threading.active_count(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
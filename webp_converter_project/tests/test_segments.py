@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from encoders import EncodeJob
+from riff import Animation, RiffError
+from segments import encode_segments, plan_segments, stitch
+from tests import COLORS, PIL_AVAILABLE, make_animation, webp_available
+
+
+class PlanSegmentsTest(unittest.TestCase):
+    def test_even_spans(self):
+        self.assertEqual(plan_segments(300, 3), [(0, 100), (100, 200), (200, 300)])
+
+    def test_short_sequences_are_not_split(self):
+        self.assertEqual(plan_segments(60, 4), [(0, 60)])
+        self.assertEqual(plan_segments(100, 4, min_frames=48), [(0, 50), (50, 100)])
+
+    def test_spans_cover_every_frame(self):
+        spans = plan_segments(1001, 7, min_frames=10)
+        self.assertEqual(len(spans), 7)
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], 1001)
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(spans, spans[1:])))
+
+
+class RecordingEncoder:
+    in_process = False
+
+    def __init__(self):
+        self.jobs = []
+
+    def encode(self, job, should_stop=None, on_frame=None):
+        self.jobs.append(len(job.png_files))
+        return False
+
+
+@unittest.skipUnless(PIL_AVAILABLE, "needs Pillow")
+class EncodeSegmentsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def encode(self, mode, quality):
+        from PIL import Image
+        # Only the first frame is read, to see whether it can have alpha
+        Image.new(mode, (8, 8)).save(os.path.join(self.dir, "frame_0000.png"))
+        names = [f"frame_{i:04d}.png" for i in range(200)]
+        job = EncodeJob(self.dir, names, os.path.join(self.dir, "out.webp"), [40] * 200, quality, False)
+        encoder = RecordingEncoder()
+        encode_segments(encoder, job, 4)
+        return encoder.jobs
+
+    def test_opaque_lossy_is_split(self):
+        self.assertEqual(sorted(self.encode("RGB", 80)), [50, 50, 50, 50])
+
+    def test_transparent_lossless_is_split_with_priming_frames(self):
+        self.assertEqual(sorted(self.encode("RGBA", 100)), [50, 51, 51, 51])
+
+    def test_transparent_lossy_is_not_split(self):
+        self.assertEqual(self.encode("RGBA", 80), [200])
+
+
+@unittest.skipUnless(webp_available(), "needs Pillow with WebP support")
+class StitchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.first = os.path.join(self.dir, "first.webp")
+        self.second = os.path.join(self.dir, "second.webp")
+        self.output = os.path.join(self.dir, "out.webp")
+        make_animation(self.first, COLORS[:3], [100, 100, 100])
+
+    def test_round_trip(self):
+        make_animation(self.second, COLORS[3:], [40, 40, 40])
+        stitch([self.first, self.second], self.output, loop_count=1)
+        anim = Animation.read(self.output)
+        self.assertEqual((anim.width, anim.height, anim.loop_count), (32, 24, 1))
+        self.assertEqual([f.duration for f in anim.frames], [100, 100, 100, 40, 40, 40])
+
+    def test_priming_frame_is_dropped(self):
+        # The second segment starts on the first one's last frame
+        make_animation(self.second, COLORS[2:], [100, 40, 40, 40])
+        stitch([self.first, self.second], self.output, loop_count=0, primed=[None, 100])
+        self.assertEqual([f.duration for f in Animation.read(self.output).frames], [100, 100, 100, 40, 40, 40])
+
+    def test_canvas_sizes_must_match(self):
+        make_animation(self.second, COLORS[3:], [40, 40, 40], size=(16, 24))
+        with self.assertRaises(RiffError):
+            stitch([self.first, self.second], self.output, loop_count=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
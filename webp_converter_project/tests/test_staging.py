@@ -0,0 +1,128 @@
+import errno
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from prefetch import PrefetchCancelled
+from staging import StagingArea, publish
+from supervisor import CancelToken
+
+
+class StagingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.folder = os.path.join(self.dir, "share", "shot010")
+        os.makedirs(self.folder)
+        self.png_files = [f"{i:04d}.png" for i in range(4)]
+        for name in self.png_files:
+            self.write(os.path.join(self.folder, name), name.encode() * 10)
+        self.output = os.path.join(self.dir, "share", "shot010.webp")
+        self.scratch = os.path.join(self.dir, "scratch")
+
+    def write(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_stage_copies_frames_and_release_cleans_up(self):
+        area = StagingArea(self.scratch)
+        job = area.stage(self.folder, self.png_files, self.output)
+        self.assertTrue(job.frames_dir.startswith(self.scratch))
+        self.assertEqual(sorted(os.listdir(job.frames_dir)), self.png_files)
+        for name in self.png_files:
+            self.assertEqual(self.read(os.path.join(job.frames_dir, name)),
+                             self.read(os.path.join(self.folder, name)))
+        self.assertEqual(os.path.dirname(job.output_file), job.job_dir)
+        self.assertEqual(area._used, 4 * 80)
+        job.release()
+        self.assertFalse(os.path.exists(job.job_dir))
+        self.assertEqual(area._used, 0)
+
+    def test_folder_larger_than_the_area_is_read_in_place(self):
+        area = StagingArea(self.scratch, max_bytes=100)
+        job = area.stage(self.folder, self.png_files, self.output)
+        self.assertEqual(job.frames_dir, self.folder)
+        self.assertTrue(job.output_file.startswith(self.scratch))
+        job.release()
+        self.assertEqual(area._used, 0)
+
+    def test_full_area_waits_until_cancelled(self):
+        area = StagingArea(self.scratch, max_bytes=500)
+        first = area.stage(self.folder, self.png_files, self.output)
+        self.addCleanup(first.release)
+        cancel = CancelToken()
+        errors = []
+
+        def stage():
+            try:
+                area.stage(self.folder, self.png_files, self.output, should_stop=cancel)
+            except PrefetchCancelled as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=stage)
+        waiter.start()
+        time.sleep(0.1)
+        self.assertTrue(waiter.is_alive())
+        started = time.monotonic()
+        cancel.cancel()
+        waiter.join(5)
+        # Woken by the token, not by a polling timeout
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(area._used, 4 * 80)
+
+    def test_full_area_waits_for_a_release(self):
+        area = StagingArea(self.scratch, max_bytes=500)
+        first = area.stage(self.folder, self.png_files, self.output)
+        staged = []
+        waiter = threading.Thread(target=lambda: staged.append(
+            area.stage(self.folder, self.png_files, self.output, should_stop=CancelToken())))
+        waiter.start()
+        time.sleep(0.1)
+        self.assertEqual(staged, [])
+        first.release()
+        waiter.join(5)
+        self.assertEqual(len(staged), 1)
+        staged[0].release()
+        self.assertEqual(area._used, 0)
+
+    def test_publish_replaces_the_output(self):
+        self.write(self.output, b"old")
+        staged = os.path.join(self.dir, "staged.webp")
+        self.write(staged, b"new output")
+        publish(staged, self.output)
+        self.assertEqual(self.read(self.output), b"new output")
+        self.assertFalse(os.path.exists(staged))
+
+    def test_publish_across_filesystems(self):
+        self.write(self.output, b"old")
+        staged = os.path.join(self.dir, "staged.webp")
+        self.write(staged, b"new output")
+        real_replace = os.replace
+        calls = []
+
+        def replace(src, dst):
+            calls.append(src)
+            if len(calls) == 1:
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            return real_replace(src, dst)
+
+        with mock.patch("staging.os.replace", replace):
+            publish(staged, self.output)
+        # The copy went to a temporary name next to the output first
+        self.assertEqual(os.path.dirname(calls[1]), os.path.dirname(self.output))
+        self.assertEqual(self.read(self.output), b"new output")
+        self.assertFalse(os.path.exists(staged))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.output))), ["shot010", "shot010.webp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
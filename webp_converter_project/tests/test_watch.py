@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from watch import FolderWatcher
+
+
+class FolderWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def render(self, name, frames, start=0):
+        folder = os.path.join(self.dir, name)
+        os.makedirs(folder, exist_ok=True)
+        for i in range(start, start + frames):
+            with open(os.path.join(folder, f"{i:04d}.png"), "wb") as f:
+                f.write(b"frame")
+        return folder
+
+    def test_folder_is_ready_once_it_settles(self):
+        watcher = FolderWatcher([self.dir], settle=10)
+        self.assertEqual(watcher.poll(now=0), [])
+        shot = self.render("shot010", 3)
+        self.assertEqual(watcher.poll(now=1), [])
+        self.assertEqual(watcher.poll(now=5), [])
+        self.assertEqual(watcher.poll(now=12), [shot])
+        # Handed out once
+        self.assertEqual(watcher.poll(now=30), [])
+
+    def test_new_frames_restart_the_clock(self):
+        watcher = FolderWatcher([self.dir], settle=10)
+        watcher.poll(now=0)
+        shot = self.render("shot010", 3)
+        watcher.poll(now=1)
+        self.render("shot010", 2, start=3)
+        self.assertEqual(watcher.poll(now=11), [])
+        self.assertEqual(watcher.poll(now=22), [shot])
+
+    def test_existing_folders_are_skipped(self):
+        old = self.render("old", 3)
+        watcher = FolderWatcher([self.dir], settle=0)
+        self.assertEqual(watcher.poll(now=0), [])
+        self.assertEqual(watcher.poll(now=1), [])
+        # Unless they change afterwards
+        self.render("old", 1, start=3)
+        watcher.poll(now=2)
+        self.assertEqual(watcher.poll(now=3), [old])
+
+    def test_existing_folders_can_be_converted(self):
+        old = self.render("old", 3)
+        watcher = FolderWatcher([self.dir], settle=0, skip_existing=False)
+        self.assertEqual(watcher.poll(now=0), [])
+        self.assertEqual(watcher.poll(now=1), [old])
+
+    def test_min_frames(self):
+        watcher = FolderWatcher([self.dir], settle=0, min_frames=5)
+        watcher.poll(now=0)
+        self.render("short", 3)
+        watcher.poll(now=1)
+        self.assertEqual(watcher.poll(now=2), [])
+
+
+class WatchCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def run_watch(self, output):
+        import cli
+        args = cli.build_parser().parse_args(["--watch", self.dir, "-o", output])
+        with mock.patch("watch.WatchService.run") as run:
+            return cli.run_watch(mock.Mock(), args, lambda *a: None), run.called
+
+    def test_output_folder_is_created(self):
+        output = os.path.join(self.dir, "out", "webp")
+        self.assertEqual(self.run_watch(output), (0, True))
+        self.assertTrue(os.path.isdir(output))
+
+    def test_output_file_is_refused(self):
+        output = os.path.join(self.dir, "shot010.webp")
+        with open(output, "wb") as f:
+            f.write(b"RIFF....WEBP")
+        with mock.patch("sys.stderr"):
+            self.assertEqual(self.run_watch(output), (2, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
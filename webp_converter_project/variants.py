@@ -0,0 +1,196 @@
+"""Several outputs from one pass over a sequence's frames.
+
+A lossless master, a web version and a thumbnail of the same sequence only
+differ in quality, size, timing and looping, so decoding every PNG again for
+each of them wastes most of the run. For in-process encoders the frames are
+decoded once and handed to one encoder thread per variant, each scaling its
+own copy; every variant gets its own short queue, so memory stays bounded
+and the slowest variant sets the pace. img2webp reads its PNGs itself, so
+for it all scaled variants are written in a single decode pass and the
+img2webp processes then run side by side.
+"""
+import os
+import re
+import copy
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import concurrent.futures
+
+from archive import in_archive
+from prefetch import FramePrefetcher, PrefetchCancelled
+from resize import ResizeSpec, scale_frames_multi
+
+log = logging.getLogger(__name__)
+
+# Decoded frames queued per variant ahead of its encoder
+BRANCH_DEPTH = 2
+
+_END = object()
+_CANCEL = object()
+
+
+class OutputVariant:
+    """One output of a job. name is appended to the output file name
+    (clip.webp -> clip_web.webp); settings left as None fall back to the
+    job's own quality, resize, fps and loop."""
+    def __init__(self, name, quality=None, resize=None, fps=None, loop=None):
+        if not re.fullmatch(r"[\w.-]+", name or ""):
+            raise ValueError(f"Bad variant name {name!r}")
+        if quality is not None and not 0 <= quality <= 100:
+            raise ValueError("Variant quality must be between 0 and 100")
+        if fps is not None and fps <= 0:
+            raise ValueError("Variant fps must be positive")
+        self.name = name
+        self.quality = quality
+        self.resize = resize
+        self.fps = fps
+        self.loop = loop
+
+    def output_file(self, output_file):
+        stem, ext = os.path.splitext(output_file)
+        return f"{stem}_{self.name}{ext or '.webp'}"
+
+    def to_dict(self):
+        return {"name": self.name, "quality": self.quality,
+                "resize": self.resize.to_dict() if self.resize else None,
+                "fps": self.fps, "loop": self.loop}
+
+
+def parse_variant(text):
+    """Parse "web:q=80,scale=0.5,fps=12,loop=1". Keys are q, scale,
+    max_width, max_height, filter, fps and loop; all are optional."""
+    name, _, spec = text.partition(":")
+    fields = {}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected key=value, got {item!r}")
+        fields[key.strip()] = value.strip()
+    unknown = set(fields) - {"q", "scale", "max_width", "max_height", "filter", "fps", "loop"}
+    if unknown:
+        raise ValueError(f"Unknown variant setting(s): {', '.join(sorted(unknown))}")
+    resize = None
+    if {"scale", "max_width", "max_height"} & set(fields):
+        resize = ResizeSpec(int(fields["max_width"]) if "max_width" in fields else None,
+                            int(fields["max_height"]) if "max_height" in fields else None,
+                            float(fields["scale"]) if "scale" in fields else None,
+                            fields.get("filter", "lanczos"))
+    loop = fields.get("loop")
+    if loop is not None:
+        if loop not in ("0", "1"):
+            raise ValueError("Variant loop must be 0 or 1")
+        loop = loop == "1"
+    return OutputVariant(name,
+                         quality=int(fields["q"]) if "q" in fields else None,
+                         resize=resize,
+                         fps=int(fields["fps"]) if "fps" in fields else None,
+                         loop=loop)
+
+
+class _Branch:
+    """The frames for one variant's encoder, fed by the decoding thread."""
+    def __init__(self, resize):
+        self.queue = queue.Queue(maxsize=BRANCH_DEPTH)
+        self.resize = resize
+        # False once the encoder stopped taking frames
+        self.open = True
+        self._ended = False
+
+    def frames(self):
+        while True:
+            frame = self.queue.get()
+            if frame is _END or frame is _CANCEL:
+                self._ended = True
+                if frame is _CANCEL:
+                    raise PrefetchCancelled()
+                return
+            yield self.resize.apply(frame) if self.resize else frame
+
+    def close(self):
+        # An encoder that stops early (done or failed) must not leave the
+        # decoding thread blocked on its full queue, so discard the rest.
+        self.open = False
+        while not self._ended:
+            self._ended = self.queue.get() in (_END, _CANCEL)
+
+
+def _fan_out(encoder, jobs, should_stop, on_frame):
+    source = jobs[0]
+    branches = [_Branch(job.resize) for job in jobs]
+    results = [False] * len(jobs)
+
+    def run(i):
+        try:
+            results[i] = encoder.encode_frames(jobs[i], branches[i].frames(), should_stop, on_frame)
+        finally:
+            branches[i].close()
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(len(jobs))]
+    for t in threads:
+        t.start()
+    end = _END
+    error = None
+    try:
+        for frame in FramePrefetcher(source.frame_paths(), load=source.loader(resize=False),
+                                     workers=source.decode_workers,
+                                     lookahead=source.lookahead, should_stop=should_stop):
+            live = [b for b in branches if b.open]
+            if not live:
+                break
+            for branch in live:
+                branch.queue.put(frame)
+    except PrefetchCancelled:
+        end = _CANCEL
+    except Exception as e:
+        end = _CANCEL
+        error = e
+    finally:
+        for branch in branches:
+            branch.queue.put(end)
+        for t in threads:
+            t.join()
+    if error:
+        raise error
+    return results
+
+
+def _run_subprocesses(encoder, jobs, should_stop, on_frame):
+    source = jobs[0]
+    scratch_dir = tempfile.mkdtemp(prefix="webp_variants_")
+    try:
+        jobs = [copy.copy(job) for job in jobs]
+        targets = []
+        unscaled = None
+        for i, job in enumerate(jobs):
+            if job.resize:
+                job.folder_path = os.path.join(scratch_dir, str(i))
+                targets.append((job.resize, job.folder_path))
+            elif job.clean_alpha or in_archive(source.folder_path):
+                # Unscaled variants share one copy of the cleaned (or, from
+                # an archive, extracted) frames
+                if unscaled is None:
+                    unscaled = os.path.join(scratch_dir, "frames")
+                    targets.append((None, unscaled))
+                job.folder_path = unscaled
+            job.resize = None
+            job.clean_alpha = False
+        if targets:
+            scale_frames_multi(targets, source.folder_path, source.png_files, should_stop=should_stop,
+                               load=source.loader(resize=False))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            return list(executor.map(lambda job: encoder.encode(job, should_stop, on_frame), jobs))
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def encode_variants(encoder, jobs, should_stop=None, on_frame=None):
+    """Encode jobs that share their frames (same folder and png_files) and
+    return a success flag per job. Each job's resize is applied here."""
+    if not jobs:
+        return []
+    if hasattr(encoder, "encode_frames"):
+        return _fan_out(encoder, jobs, should_stop, on_frame)
+    return _run_subprocesses(encoder, jobs, should_stop, on_frame)
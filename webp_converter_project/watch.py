@@ -0,0 +1,168 @@
+"""Watch drop folders and convert PNG sequences once renders finish.
+
+A sequence folder counts as complete once its signature (directory mtime,
+frame count and the size of the last few frames) has not changed for
+`settle` seconds. Renderers write frames in order, so only the newest frames
+can still be growing; stat-ing just those keeps each scan cheap even for
+folders with tens of thousands of files. A folder is only listed again when
+its directory mtime moves.
+
+Folders already complete when watching starts are taken to be converted
+(skip_existing), so pointing a watch at a root full of finished renders does
+not re-encode all of them; only folders that appear or change afterwards
+are handed out.
+"""
+import os
+import time
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+# How many of the newest frames are stat-ed to detect files still being written
+TAIL_FRAMES = 2
+
+
+class _FolderState:
+    def __init__(self, dir_mtime, signature, now):
+        self.dir_mtime = dir_mtime
+        self.signature = signature
+        self.changed_at = now
+        self.converted = None  # signature that was last handed out as ready
+
+
+class FolderWatcher:
+    def __init__(self, roots, settle=10.0, min_frames=1, skip_existing=True):
+        self.roots = list(roots)
+        self.settle = settle
+        self.min_frames = min_frames
+        self.skip_existing = skip_existing
+        self._states = {}
+        self._scanned = False
+
+    def _candidates(self):
+        for root in self.roots:
+            yield root
+            try:
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            yield entry.path
+            except OSError as e:
+                log.warning("Cannot scan %s: %s", root, e)
+
+    def _signature(self, folder):
+        names = []
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.name.lower().endswith(".png"):
+                    names.append(entry.name)
+        if len(names) < self.min_frames:
+            return None
+        names.sort()
+        return self._restat(folder, len(names), names[-TAIL_FRAMES:])
+
+    def _restat(self, folder, count, tail_names):
+        tail = []
+        for name in tail_names:
+            st = os.stat(os.path.join(folder, name))
+            tail.append((name, st.st_size, st.st_mtime_ns))
+        return (count, tuple(tail))
+
+    def poll(self, now=None):
+        """Scan once; return the folders that have just become complete."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        seen = set()
+        for folder in self._candidates():
+            seen.add(folder)
+            try:
+                dir_mtime = os.stat(folder).st_mtime_ns
+                state = self._states.get(folder)
+                if state and state.dir_mtime == dir_mtime:
+                    # No files added or removed, so no need to list it again;
+                    # re-stat the newest frames in case they are still growing
+                    # (or were re-rendered in place).
+                    if state.signature is None:
+                        continue
+                    count, tail = state.signature
+                    signature = self._restat(folder, count, [name for name, _, _ in tail])
+                else:
+                    signature = self._signature(folder)
+            except OSError:
+                continue
+            if state is None:
+                state = self._states[folder] = _FolderState(dir_mtime, signature, now)
+                if self.skip_existing and not self._scanned:
+                    state.converted = signature
+                continue
+            if signature != state.signature or dir_mtime != state.dir_mtime:
+                state.signature = signature
+                state.dir_mtime = dir_mtime
+                state.changed_at = now
+                continue
+            if signature is not None and signature != state.converted and now - state.changed_at >= self.settle:
+                state.converted = signature
+                ready.append(folder)
+        for folder in list(self._states):
+            if folder not in seen:
+                del self._states[folder]
+        self._scanned = True
+        return ready
+
+
+class WatchService:
+    """Runs a FolderWatcher in the background and converts what it finds.
+
+    With no output_dir each sequence is written next to its folder.
+    on_ready(folders) and on_result(result, completed, total) are called
+    from the watch thread.
+    """
+    def __init__(self, engine, roots, output_dir, fps, quality, loop=False,
+                 settle=10.0, interval=2.0, min_frames=1, on_ready=None, on_result=None,
+                 skip_existing=True):
+        self.engine = engine
+        self.watcher = FolderWatcher(roots, settle=settle, min_frames=min_frames, skip_existing=skip_existing)
+        self.output_dir = output_dir
+        self.fps = fps
+        self.quality = quality
+        self.loop = loop
+        self.interval = interval
+        self.on_ready = on_ready
+        self.on_result = on_result
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            ready = self.watcher.poll()
+            if ready:
+                if self.on_ready:
+                    self.on_ready(ready)
+                self.convert(ready)
+            self._stop.wait(self.interval)
+
+    def convert(self, folders):
+        if self.output_dir:
+            groups = {self.output_dir: folders}
+        else:
+            groups = {}
+            for folder in folders:
+                groups.setdefault(os.path.dirname(folder.rstrip("/\\")), []).append(folder)
+        loops = {f: self.loop for f in folders}
+        results = []
+        for output_dir, group in groups.items():
+            try:
+                results += self.engine.convert(group, output_dir, self.fps, self.quality,
+                                               folder_loops=loops, on_result=self.on_result)
+            except Exception as e:
+                log.error("Watch conversion failed for %s: %s", group, e)
+        return results